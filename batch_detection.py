@@ -0,0 +1,234 @@
+"""Object detection over a whole folder of images.
+
+Images go through a pipeline: decoded on a thread pool, run through the
+model BATCH_SIZE at a time, then annotated and written on a second pool
+while the next batch is already decoding. Results go to one JSONL or CSV
+file in the output directory, annotated images to its ANNOTATED_DIR. A
+checkpoint next to the results lets a cancelled or crashed run resume
+where it stopped. Images the detector's result cache has are annotated
+from there without going through the model.
+"""
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detection_cache import content_digest
+
+BATCH_SIZE = 8 # Images per model call
+IO_WORKERS = os.cpu_count() or 1 # Threads decoding, and threads annotating and writing; OpenCV releases the GIL
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif') # Same as the Load Image dialog
+RESULTS_FILES = {'jsonl': 'detections.jsonl', 'csv': 'detections.csv'}
+CSV_FIELDS = ['path', 'label', 'class', 'confidence', 'x1', 'y1', 'x2', 'y2', 'error']
+CHECKPOINT_FILE = 'checkpoint.txt'
+ANNOTATED_DIR = 'annotated'
+
+
+def folder_images(folder):
+    """Image files directly in folder, sorted by name."""
+    with os.scandir(folder) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_image(path):
+    """(decoded BGR image, content digest) of an image file; the image is None if it cannot be decoded."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), content_digest(data)
+
+
+def result_data(result):
+    """x1 y1 x2 y2 confidence class of each box of one ultralytics result, as float32 rows.
+
+    The boxes tensor is copied off once for all of them, instead of once
+    per value. These rows are also what the DetectionCache keeps.
+    """
+    return result.boxes.data[:, [0, 1, 2, 3, -2, -1]].cpu().numpy() # Without the track id column, if any
+
+
+def detection_arrays(data):
+    """(boxes, confidences, classes) of result_data() rows; boxes are rounded to int32 pixel corners."""
+    return np.rint(data[:, :4]).astype(np.int32), data[:, 4], data[:, 5].astype(np.int32)
+
+
+def inference_ms(result):
+    """Milliseconds the model took for one result, as reported by ultralytics."""
+    return result.speed['preprocess'] + result.speed['inference'] + result.speed['postprocess']
+
+
+def detections_of(arrays, names):
+    """Detections from detection_arrays() as plain dicts, for results files and counts."""
+    boxes, confidences, classes = arrays
+    return [{'label': names[cls], 'class': cls, 'confidence': round(conf, 4), 'box': box}
+            for box, conf, cls in zip(boxes.tolist(), confidences.tolist(), classes.tolist())]
+
+
+def annotate(image, arrays, names):
+    """Draws the boxes and labels of detection_arrays() on image in place."""
+    boxes, confidences, classes = arrays
+    for (x1, y1, x2, y2), conf, cls in zip(boxes.tolist(), np.round(confidences, 2).tolist(), classes.tolist()):
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(image, f"{names[cls]} {conf}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    return image
+
+
+def write_annotated(image, arrays, names, path):
+    if not cv2.imwrite(path, annotate(image, arrays, names)):
+        raise OSError(f"cannot write {path}")
+
+
+def result_bytes(record, results_format):
+    """The lines of one image's record in the results file."""
+    if results_format == 'jsonl':
+        return (json.dumps(record) + '\n').encode('utf-8')
+    out = io.StringIO()
+    writer = csv.DictWriter(out, CSV_FIELDS)
+    if 'error' in record:
+        writer.writerow({'path': record['path'], 'error': record['error']})
+    elif not record['detections']:
+        writer.writerow({'path': record['path']}) # So every image done is in the file
+    for detection in record.get('detections', ()):
+        x1, y1, x2, y2 = detection['box']
+        writer.writerow({'path': record['path'], 'label': detection['label'], 'class': detection['class'],
+                         'confidence': detection['confidence'], 'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2})
+    return out.getvalue().encode('utf-8')
+
+
+def read_checkpoint(path):
+    """Paths already done, the size of the results file after the last of them, and of the checkpoint up to its line.
+
+    Each checkpoint line is written after the results of its image, so a
+    line cut short by a crash is ignored, and both files are cut back to
+    the last complete one before a resumed run appends to them.
+    """
+    done = set()
+    size = 0
+    checkpoint_size = 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset, image_path = line[:-1].decode('utf-8').split('\t', 1)
+                done.add(image_path)
+                size = int(offset)
+                checkpoint_size += len(line)
+    except FileNotFoundError:
+        pass
+    return done, size, checkpoint_size
+
+
+def decoded(paths, pool, ahead):
+    """(path, (image or None, content digest or None)) in order, decoding at most `ahead` images in advance."""
+    pending = deque()
+    for path in paths:
+        pending.append((path, pool.submit(read_image, path)))
+        if len(pending) >= ahead:
+            path, future = pending.popleft()
+            yield path, future.result()
+    while pending:
+        path, future = pending.popleft()
+        yield path, future.result()
+
+
+def batches(decoded_images, size):
+    """Lists of up to size (path, (image, digest)), each of images of one shape.
+
+    The model letterboxes a batch of mixed sizes to one common square,
+    which costs more than it saves, so a batch ends where the shape changes.
+    """
+    batch = []
+    for path, (image, digest) in decoded_images:
+        shape = None if image is None else image.shape
+        if batch and (len(batch) == size or shape != batch_shape):
+            yield batch
+            batch = []
+        batch.append((path, (image, digest)))
+        batch_shape = shape
+    if batch:
+        yield batch
+
+
+def detect_folder(detector, paths, output_dir, batch_size=None, results_format='jsonl', resume=False,
+                  cancelled=None, progress=None):
+    """Runs a loaded detection_core.Detector over paths, writing results and annotated images to output_dir.
+
+    With resume, images in the checkpoint are skipped and the results
+    appended to; otherwise both start over. cancelled() is checked before each batch, and progress(done, total,
+    images_per_second) is called as each image's results are written, in
+    the order of paths. Returns the number of images done by this run and
+    the seconds it took.
+    """
+    batch_size = BATCH_SIZE if batch_size is None else batch_size
+    os.makedirs(os.path.join(output_dir, ANNOTATED_DIR), exist_ok=True)
+    results_path = os.path.join(output_dir, RESULTS_FILES[results_format])
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if resume:
+        done, size, checkpoint_size = read_checkpoint(checkpoint_path)
+    else:
+        done, size, checkpoint_size = set(), 0, 0
+        for path in (results_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    todo = [path for path in paths if path not in done]
+    total = len(paths)
+    finished = total - len(todo)
+    count = 0
+    start = time.perf_counter()
+
+    with open(results_path, 'ab') as results, open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        results.truncate(size)
+        checkpoint.truncate(checkpoint_size) # Else the next line would be appended to a torn one
+        if not size and results_format == 'csv':
+            results.write(','.join(CSV_FIELDS).encode('utf-8') + b'\r\n')
+        writes = deque() # (path, record, write future or None) in the order of paths
+
+        def record_writes(block):
+            # Results and checkpoint follow the annotated images, so a resumed run never misses one
+            nonlocal finished, count
+            while writes and (block or writes[0][2] is None or writes[0][2].done()):
+                path, record, future = writes.popleft()
+                if future is not None:
+                    future.result()
+                results.write(result_bytes(record, results_format))
+                results.flush()
+                checkpoint.write(f"{results.tell()}\t{path}\n")
+                checkpoint.flush()
+                finished += 1
+                count += 1
+                if progress is not None:
+                    progress(finished, total, count / (time.perf_counter() - start))
+
+        with ThreadPoolExecutor(IO_WORKERS) as decode_pool, ThreadPoolExecutor(IO_WORKERS) as write_pool:
+            for batch in batches(decoded(todo, decode_pool, 2 * batch_size), batch_size):
+                if cancelled is not None and cancelled():
+                    break
+                images = [image for _, (image, _) in batch if image is not None]
+                digests = [digest for _, (image, digest) in batch if image is not None]
+                rows = iter(detector.detect(images, digests)[0] if images else ())
+                for path, (image, digest) in batch:
+                    if image is None:
+                        writes.append((path, {'path': path, 'error': 'unreadable'}, None))
+                        continue
+                    arrays = detection_arrays(next(rows))
+                    detections = detections_of(arrays, detector.names)
+                    height, width = image.shape[:2]
+                    record = {'path': path, 'width': width, 'height': height, 'detections': detections}
+                    out_path = os.path.join(output_dir, ANNOTATED_DIR, os.path.basename(path))
+                    writes.append((path, record, write_pool.submit(write_annotated, image, arrays, detector.names, out_path)))
+                record_writes(False)
+                while len(writes) > 2 * batch_size: # Writing fell behind: wait instead of piling up images
+                    record_writes(True)
+            record_writes(True)
+    return count, time.perf_counter() - start
+
@@ -0,0 +1,95 @@
+"""Benchmark drawing detections and handing the frame to Qt, against the number of detections.
+
+Usage: python bench_annotation.py [--width 1280] [--height 720] [--counts 0 1 10 50 100 300] [--repeat 50]
+
+Builds ultralytics Boxes of random detections on a JPEG frame (a sample
+image that ships with ultralytics) and times, per frame, the way
+detect_objects() used to do it: cv2.imread again, a loop over r.boxes
+converting each tensor element on its own, then a Format_RGB888 QImage
+and rgbSwapped(). It is timed with and without the read. Next to it, the
+way the worker does it now: one copy of the boxes tensor to NumPy
+arrays, the same drawing from them, and one conversion into a
+Format_RGB32 QImage. All include QPixmap.fromImage(), which converts the
+old image once more and takes the new one as it is.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+def median_ms(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280, help='frame width in pixels')
+    parser.add_argument('--height', type=int, default=720, help='frame height in pixels')
+    parser.add_argument('--counts', type=int, nargs='+', default=[0, 1, 10, 50, 100, 300], help='detections per frame')
+    parser.add_argument('--repeat', type=int, default=50, help='frames timed per count')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QImage, QPixmap
+    app = QApplication(sys.argv)
+    import cv2
+    import numpy as np
+    import torch
+    from ultralytics.engine.results import Boxes
+    from batch_detection import result_data, detection_arrays, annotate
+    from detection_worker import frame_image
+
+    from ultralytics.utils import ASSETS
+
+    names = {i: f"class{i}" for i in range(80)}
+    rng = np.random.default_rng(0)
+    fd, path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    cv2.imwrite(path, cv2.resize(cv2.imread(str(ASSETS / 'bus.jpg')), (args.width, args.height)))
+    decoded = cv2.imread(path)
+
+    def before(result, read=True):
+        image = cv2.imread(path) if read else decoded.copy()
+        for r in [result]:
+            for box in r.boxes:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                conf = round(float(box.conf[0]), 2)
+                cls = int(box.cls[0])
+                label = names[cls]
+                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(image, f"{label} {conf}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+        h, w, ch = image.shape
+        QPixmap.fromImage(QImage(image.data, w, h, ch * w, QImage.Format_RGB888).rgbSwapped())
+
+    def now(result):
+        image = decoded.copy() # The frame the model was given is drawn on in place, so each run needs a fresh one
+        QPixmap.fromImage(frame_image(annotate(image, detection_arrays(result_data(result)), names)))
+
+    try:
+        print(f"{args.width}x{args.height} frame, median of {args.repeat} frames; "
+              f"'now' and 'without the read' include {median_ms(lambda: decoded.copy(), args.repeat):.2f} ms "
+              f"of copying the frame")
+        print(f"{'detections':>10} {'before':>10} {'without the read':>17} {'now':>10}")
+        for count in args.counts:
+            corners = rng.uniform(0, 1, (count, 4)) * [args.width, args.height, args.width, args.height]
+            data = np.column_stack([np.minimum(corners[:, :2], corners[:, 2:]), np.maximum(corners[:, :2], corners[:, 2:]),
+                                    rng.uniform(0.25, 1, count), rng.integers(0, 80, count)])
+            result = SimpleNamespace(boxes=Boxes(torch.tensor(data, dtype=torch.float32), (args.height, args.width)))
+            print(f"{count:>10} {median_ms(lambda: before(result), args.repeat):>7.2f} ms "
+                  f"{median_ms(lambda: before(result, False), args.repeat):>14.2f} ms "
+                  f"{median_ms(lambda: now(result), args.repeat):>7.2f} ms")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark detecting objects in a folder of images on the CPU.
+
+Usage: python bench_batch_detection.py [--images 200] [--batch-sizes 1 4 8 16] [--model yolov8n.pt]
+
+Fills a folder with copies of the sample images that ship with
+ultralytics and times, in images/sec: the way the app handled one image
+per click (model call on the path, cv2.imread again, draw, write) over a
+sample, then detect_folder() at each batch size. Finally a run is
+cancelled halfway and resumed, and the results file is checked to hold
+every image exactly once.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+SAMPLE_IMAGES = 20
+
+
+def make_folder(folder, count):
+    from ultralytics.utils import ASSETS
+    sources = sorted(path for path in ASSETS.iterdir() if path.suffix == '.jpg')
+    for i in range(count):
+        shutil.copyfile(sources[i % len(sources)], os.path.join(folder, f"IMG_{i:06d}.jpg"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=200, help='number of images in the folder')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16], help='batch sizes to time')
+    parser.add_argument('--model', default='yolov8n.pt', help='YOLO weights')
+    args = parser.parse_args()
+
+    import cv2
+    from batch_detection import detect_folder, folder_images, RESULTS_FILES
+    from detection_core import Detector
+
+    work_dir = tempfile.mkdtemp(prefix='batch_detection_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        output_dir = os.path.join(work_dir, 'output')
+        os.makedirs(folder)
+        make_folder(folder, args.images)
+        paths = folder_images(folder)
+        detector = Detector(args.model, cache=False) # Every run goes through the model
+        detector.load()
+        model = detector.model
+        print(f"{len(paths)} images, {args.model}, {os.cpu_count()} CPUs")
+
+        os.makedirs(output_dir)
+        start = time.perf_counter()
+        for path in paths[:SAMPLE_IMAGES]:
+            results = model(path, verbose=False)
+            image = cv2.imread(path)
+            for box in results[0].boxes:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(image, f"{model.names[int(box.cls[0])]} {round(float(box.conf[0]), 2)}", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+            cv2.imwrite(os.path.join(output_dir, os.path.basename(path)), image)
+        print(f"  one image per call, as before: {SAMPLE_IMAGES / (time.perf_counter() - start):.1f} images/s")
+
+        for batch_size in args.batch_sizes:
+            count, elapsed = detect_folder(detector, paths, output_dir, batch_size)
+            print(f"  detect_folder, batch {batch_size}: {count / elapsed:.1f} images/s")
+
+        done = []
+
+        def progress(finished, total, rate):
+            done.append(finished)
+
+        first, _ = detect_folder(detector, paths, output_dir, args.batch_sizes[-1],
+                                 cancelled=lambda: done and done[-1] >= len(paths) // 2, progress=progress)
+        second, _ = detect_folder(detector, paths, output_dir, args.batch_sizes[-1], resume=True)
+        with open(os.path.join(output_dir, RESULTS_FILES['jsonl']), encoding='utf-8') as f:
+            recorded = [json.loads(line)['path'] for line in f]
+        print(f"  cancelled after {first} images, resumed with {second}: "
+              f"{len(set(recorded))}/{len(paths)} images in the results, {len(recorded) - len(set(recorded))} twice")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark repeated detections with and without the detection result cache.
+
+Usage: python bench_detection_cache.py [--images 200] [--repeat 20] [--model yolov8n.pt]
+
+The DetectionWorker behind Detect Objects is given a sample image that
+ships with ultralytics --repeat times, as clicking the button again
+would, and the time from request to annotated image is printed for the
+first and the others. Then a folder is filled with distinct images (the
+sample images, each with one pixel changed) and detect_folder() runs
+over it three times: without a cache, with the worker's and again with
+it filled, checking the last two wrote the same results. Finally its
+results are put into a cache with a tenth of the budget, to show
+eviction keeping the newest within budget. The caches live in a
+temporary folder. Weights from a .yaml are random and never cached, so
+they are saved once to a .pt first.
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def make_folder(folder, count):
+    import cv2
+    from ultralytics.utils import ASSETS
+    sources = [cv2.imread(str(path)) for path in sorted(ASSETS.iterdir()) if path.suffix == '.jpg']
+    for i in range(count):
+        image = sources[i % len(sources)].copy()
+        image[0, 0] = (i % 256, i // 256 % 256, i // 65536) # A different file each time, for the content hash
+        cv2.imwrite(os.path.join(folder, f"IMG_{i:06d}.png"), image)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=200, help='number of images in the folder')
+    parser.add_argument('--repeat', type=int, default=20, help='detections of the same image')
+    parser.add_argument('--model', default='yolov8n.pt', help='YOLO weights')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import numpy as np
+    import detection_cache
+    from batch_detection import detect_folder, folder_images, RESULTS_FILES
+    from detection_cache import DetectionCache
+    from detection_worker import DetectionWorker
+    from ultralytics.utils import ASSETS
+
+    work_dir = tempfile.mkdtemp(prefix='detection_cache_bench_')
+    try:
+        detection_cache.CACHE_PATH = os.path.join(work_dir, 'cache.sqlite') # Not the user's cache
+        weights = args.model
+        if weights.endswith('.yaml'):
+            import torch
+            from ultralytics import YOLO
+            torch.manual_seed(0)
+            weights = os.path.join(work_dir, os.path.splitext(os.path.basename(weights))[0] + '.pt')
+            YOLO(args.model).save(weights)
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        make_folder(folder, args.images)
+        paths = folder_images(folder)
+
+        worker = DetectionWorker(weights)
+        worker.start()
+        detector = worker.detector
+        while detector.model is None:
+            app.processEvents()
+            time.sleep(0.001)
+        cache = detector.cache
+        print(f"{len(paths)} images, {args.model}")
+
+        latencies = []
+        worker.result_signal.connect(lambda request_id, image, detections, timings: latencies.append(sum(timings.values())))
+        for _ in range(args.repeat):
+            count = len(latencies)
+            worker.request(str(ASSETS / 'bus.jpg'))
+            while len(latencies) == count:
+                app.processEvents()
+                time.sleep(0.001)
+        print(f"  Detect Objects on one image {args.repeat} times: first {latencies[0]:.1f} ms, "
+              f"then {percentile(latencies[1:], 0.5):.1f} ms p50 / {percentile(latencies[1:], 0.95):.1f} ms p95")
+
+        outputs = []
+        for label, run_cache in (("no cache", None), ("empty cache", cache), ("filled cache", cache)):
+            outputs.append(os.path.join(work_dir, f"output{len(outputs)}"))
+            hits = cache.hits
+            detector.cache = run_cache # The worker is idle meanwhile
+            count, elapsed = detect_folder(detector, paths, outputs[-1])
+            print(f"  detect_folder, {label}: {count / elapsed:.1f} images/s, {cache.hits - hits} hits")
+        same = filecmp.cmp(os.path.join(outputs[1], RESULTS_FILES['jsonl']),
+                           os.path.join(outputs[2], RESULTS_FILES['jsonl']), shallow=False)
+        print(f"    results from the cache {'match' if same else 'DIFFER FROM'} those of the model")
+        print(f"  {cache.stats()}")
+        size = cache.size
+        worker.stop() # Closes the cache
+
+        # The same results put, oldest first, into a cache with a tenth of the room
+        small = DetectionCache(cache.model_key, os.path.join(work_dir, 'small.sqlite'),
+                               budget_mb=size / 10 / (1024 * 1024))
+        db = sqlite3.connect(detection_cache.CACHE_PATH)
+        results = db.execute("SELECT key, boxes, inference_ms FROM results ORDER BY used").fetchall()
+        db.close()
+        for key, boxes, inference_ms in results:
+            small.put(key[len(cache.model_key):], np.frombuffer(boxes, np.float32).reshape(-1, 6), inference_ms)
+        kept = small.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        newest = small.get(results[-1][0][len(cache.model_key):]) is not None
+        print(f"  a tenth of the budget: {kept} of {len(results)} results kept, {small.size} of "
+              f"{small.budget:.0f} bytes, newest {'kept' if newest else 'EVICTED'}")
+        small.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
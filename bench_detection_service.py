@@ -0,0 +1,149 @@
+"""Benchmark the local detection service's throughput and latency against the number of concurrent clients.
+
+Usage: python bench_detection_service.py [--concurrency 1 2 4 8 16] [--max-batch 1 8] [--seconds 10] [--model yolov8n.pt] [--backend pytorch] [--threads N]
+
+detection_service.py is started once per --max-batch, with --no-cache so
+every request goes through the model, on a free port. For each
+concurrency, that many client threads then POST the sample images that
+ship with ultralytics in a closed loop (each sends its next request when
+its last is answered) for --seconds, over one kept-alive connection
+each. Printed for each: requests per second, client latency p50/p99, and
+the mean batch size per model call from the service's /metrics. Max
+batch 1 is the service without micro-batching. Last, the command line
+(detect_cli.py) is timed on one image, model load included, against one
+request to the warm service. A .yaml model has random weights, so it is
+saved once to a .pt that the service and the command line both load.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def get_json(port, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET' if body is None else 'POST', path, body)
+    response = connection.getresponse()
+    result = json.loads(response.read())
+    connection.close()
+    return result
+
+
+def load(port, images, concurrency, seconds):
+    """Client latencies in ms of the requests answered within seconds, and the count of failed ones."""
+    latencies = []
+    failures = []
+    stop = time.perf_counter() + seconds
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        i = offset
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            connection.request('POST', '/detect', images[i % len(images)])
+            response = connection.getresponse()
+            response.read()
+            (latencies if response.status == 200 else failures).append((time.perf_counter() - start) * 1000)
+            i += 1
+        connection.close()
+
+    clients = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return latencies, len(failures)
+
+
+def start_service(weights, max_batch, backend, threads):
+    """The service process and its port, once it has loaded the model."""
+    command = [sys.executable, os.path.join(HERE, 'detection_service.py'), '--port', '0', '--no-cache',
+               '--max-batch', str(max_batch), '--model', weights]
+    if backend:
+        command += ['--backend', backend]
+    if threads:
+        command += ['--threads', str(threads)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith('Serving'):
+            return process, int(line.rsplit(':', 1)[1])
+    raise RuntimeError(f"detection_service.py exited with {process.wait()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='concurrent clients')
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 8], help='service --max-batch values')
+    parser.add_argument('--seconds', type=float, default=10, help='load duration per concurrency')
+    parser.add_argument('--model', default='yolov8n.pt', help='YOLO weights')
+    parser.add_argument('--backend', help='inference backend (default: detection_core.MODEL_BACKEND)')
+    parser.add_argument('--threads', type=int, help='threads per inference')
+    args = parser.parse_args()
+
+    from ultralytics.utils import ASSETS
+    paths = sorted(str(path) for path in ASSETS.iterdir() if path.suffix == '.jpg')
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+
+    work_dir = tempfile.mkdtemp(prefix='detection_service_bench_')
+    try:
+        weights = args.model
+        if weights.endswith('.yaml'):
+            import torch
+            from ultralytics import YOLO
+            torch.manual_seed(0)
+            weights = os.path.join(work_dir, os.path.splitext(os.path.basename(weights))[0] + '.pt')
+            YOLO(args.model).save(weights)
+        print(f"{len(images)} images, {args.model}, {args.seconds:.0f} s per level, {os.cpu_count()} CPUs")
+        print(f"{'max batch':>9} {'clients':>7} {'requests/s':>10} {'p50':>9} {'p99':>9} {'mean batch':>10}")
+        warm_ms = None
+        for max_batch in args.max_batch:
+            process, port = start_service(weights, max_batch, args.backend, args.threads)
+            try:
+                get_json(port, '/detect', images[0]) # Not timed, like a client's first request
+                for concurrency in args.concurrency:
+                    before = get_json(port, '/metrics')
+                    latencies, failures = load(port, images, concurrency, args.seconds)
+                    after = get_json(port, '/metrics')
+                    calls = after['model_calls'] - before['model_calls']
+                    mean_batch = (after['requests'] - before['requests']) / calls if calls else 0
+                    failed = f"  {failures} failed" if failures else ''
+                    print(f"{max_batch:>9} {concurrency:>7} {len(latencies) / args.seconds:>10.1f} "
+                          f"{percentile(latencies, 0.5):>6.1f} ms {percentile(latencies, 0.99):>6.1f} ms "
+                          f"{mean_batch:>10.2f}{failed}")
+                if warm_ms is None:
+                    start = time.perf_counter()
+                    get_json(port, '/detect', images[0])
+                    warm_ms = (time.perf_counter() - start) * 1000
+            finally:
+                process.terminate()
+                process.wait()
+
+        command = [sys.executable, os.path.join(HERE, 'detect_cli.py'), paths[0], '--no-cache', '--model', weights]
+        if args.backend:
+            command += ['--backend', args.backend]
+        start = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        print(f"One image: detect_cli.py {time.perf_counter() - start:.1f} s with the model load, "
+              f"warm service {warm_ms:.1f} ms")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
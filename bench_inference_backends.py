@@ -0,0 +1,161 @@
+"""Benchmark the inference backends of the object detection app on a fixed set of local images.
+
+Usage: python bench_inference_backends.py [--models yolov8n.pt] [--backends pytorch onnx onnx-int8 openvino] [--sizes 320 640] [--threads N] [--images FOLDER] [--repeat 10]
+
+Every model is first exported for every backend and input size with
+inference_backend.export_model() (not timed; kept in its EXPORT_DIR).
+Then each combination runs in a fresh Python process, so that its memory
+is its own: load_model() with --threads threads, one warm-up, then every
+image detected --repeat times, one at a time. Printed for each: load
+time, latency p50/p95/p99 per image, throughput, peak resident memory
+of the process and size of the model on disk. Detections are checked
+against PyTorch at the same model and size: a box agrees when the other
+side has one of the same class with IoU >= --iou and a confidence within
+--conf-tolerance, and the share of boxes on both sides that agree is
+printed. Without --images, the sample images that ship with ultralytics
+are used. A .yaml model has random weights, so it is saved once to a .pt
+that all backends are exported from, into the temporary folder; pass a low --conf for it, since
+its scores are all close to zero.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def disk_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def peak_rss_mb():
+    # VmHWM starts over with each program; ru_maxrss would carry the parent's peak over the exec
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+
+
+def agreement(reference, detections, iou, conf_tolerance):
+    """Share of the boxes of both, image by image, that match one of the other; rows are x1 y1 x2 y2 conf cls."""
+    import numpy as np
+    matched = total = 0
+    for a, b in zip(reference, detections):
+        a, b = np.array(a).reshape(-1, 6), np.array(b).reshape(-1, 6)
+        total += len(a) + len(b)
+        if not len(a) or not len(b):
+            continue
+        top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+        bottom_right = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+        overlap = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+        area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+        area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+        ious = overlap / np.maximum(area_a[:, None] + area_b[None, :] - overlap, 1e-9)
+        same = ((a[:, None, 5] == b[None, :, 5]) & (ious >= iou)
+                & (np.abs(a[:, None, 4] - b[None, :, 4]) <= conf_tolerance))
+        matched += same.any(axis=1).sum() + same.any(axis=0).sum()
+    return matched / total if total else 1.0
+
+
+def run_child(spec):
+    """Times one model/backend/size in this process and prints the results as one JSON line."""
+    import cv2
+    import inference_backend
+    from inference_backend import load_model
+
+    inference_backend.EXPORT_DIR = spec['export_dir']
+    images = [cv2.imread(path) for path in spec['images']]
+    start = time.perf_counter()
+    model = load_model(spec['weights'], spec['backend'], spec['threads'], spec['size'])
+    model(images[0], imgsz=spec['size'], conf=spec['conf'], verbose=False)
+    load_seconds = time.perf_counter() - start
+    latencies = []
+    detections = []
+    for repeat in range(spec['repeat']):
+        for image in images:
+            start = time.perf_counter()
+            result = model(image, imgsz=spec['size'], conf=spec['conf'], verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            if repeat == 0:
+                detections.append(result.boxes.data[:, [0, 1, 2, 3, -2, -1]].cpu().numpy().round(4).tolist())
+    print(json.dumps({'load': load_seconds, 'latencies': latencies, 'detections': detections,
+                      'peak_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', default=['yolov8n.pt'], help='YOLO weights, .pt or .yaml')
+    parser.add_argument('--backends', nargs='+', default=None, help='backends to compare (default: all)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[320, 640], help='input sides in pixels')
+    parser.add_argument('--threads', type=int, default=os.cpu_count(), help='threads per inference')
+    parser.add_argument('--images', help='folder of images to detect')
+    parser.add_argument('--repeat', type=int, default=10, help='passes over the images')
+    parser.add_argument('--conf', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU for two boxes to agree')
+    parser.add_argument('--conf-tolerance', type=float, default=0.05, help='confidence difference for two boxes to agree')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    import inference_backend
+    from batch_detection import folder_images
+    from inference_backend import BACKENDS, export_model
+    from ultralytics.utils import ASSETS
+    backends = args.backends or list(BACKENDS)
+    backends = ['pytorch'] + [backend for backend in backends if backend != 'pytorch'] # The reference goes first
+    images = folder_images(args.images if args.images else str(ASSETS))
+
+    work_dir = tempfile.mkdtemp(prefix='inference_backends_bench_')
+    try:
+        print(f"{len(images)} images x {args.repeat}, {args.threads} threads, conf {args.conf}")
+        print(f"{'model':<14} {'size':>4} {'backend':<10} {'load':>6} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'images/s':>8} {'peak':>8} {'on disk':>8} {'agree':>6}")
+        export_dir = inference_backend.EXPORT_DIR
+        for weights in args.models:
+            name = os.path.basename(weights)
+            inference_backend.EXPORT_DIR = export_dir
+            if weights.endswith('.yaml'):
+                import torch
+                from ultralytics import YOLO
+                torch.manual_seed(0)
+                weights = os.path.join(work_dir, os.path.splitext(name)[0] + '.pt')
+                YOLO(name).save(weights)
+                inference_backend.EXPORT_DIR = os.path.join(work_dir, 'exports') # Not worth keeping
+            for size in args.sizes:
+                paths = {backend: export_model(weights, backend, size, images) for backend in backends}
+                reference = None
+                for backend in backends:
+                    spec = {'weights': weights, 'backend': backend, 'threads': args.threads, 'size': size,
+                            'images': images, 'repeat': args.repeat, 'conf': args.conf,
+                            'export_dir': inference_backend.EXPORT_DIR}
+                    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(spec)],
+                                           capture_output=True, text=True)
+                    if child.returncode != 0:
+                        print(f"{name:<14} {size:>4} {backend:<10} failed: {child.stderr.strip().splitlines()[-1]}")
+                        continue
+                    result = json.loads(child.stdout.strip().splitlines()[-1])
+                    latencies = result['latencies']
+                    if backend == 'pytorch':
+                        reference = result['detections']
+                    agree = (f"{agreement(reference, result['detections'], args.iou, args.conf_tolerance) * 100:5.1f}%"
+                             if reference is not None else '')
+                    print(f"{name:<14} {size:>4} {backend:<10} {result['load']:>5.1f}s "
+                          f"{percentile(latencies, 0.5):>5.1f} ms {percentile(latencies, 0.95):>5.1f} ms "
+                          f"{percentile(latencies, 0.99):>5.1f} ms {len(latencies) / sum(latencies) * 1000:>8.1f} "
+                          f"{result['peak_mb']:>5.0f} MB {disk_mb(paths[backend]):>5.1f} MB {agree:>6}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark live detection on a video file in the object detection app.
+
+Usage: python bench_video_stream.py [--seconds 10] [--fps 30] [--width 640] [--height 480] [--model yolov8n.pt]
+
+Generates a video with cv2.VideoWriter (a sample image that ships with
+ultralytics sliding over a moving background), then streams it through
+ObjectDetectionApp twice: in real time, as a camera would deliver it,
+and with every frame detected as fast as the model allows. For each run
+it prints the frames read, shown and dropped, the FPS shown, and the
+latency of each stage as reported by the worker, p50 and p95, with the
+time from a frame being read until its annotated image is ready. For
+comparison, it also prints how far behind the last frame of the real
+time run would have been if no frame had been dropped.
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def make_video(path, seconds, fps, width, height, sample_path):
+    import cv2
+    import numpy as np
+    sample = cv2.imread(sample_path)
+    scale = min(width / 2 / sample.shape[1], height / sample.shape[0])
+    sample = cv2.resize(sample, (int(sample.shape[1] * scale), int(sample.shape[0] * scale)))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    frames = int(seconds * fps)
+    for i in range(frames):
+        frame = np.full((height, width, 3), (40 + i % 60, 90, 140), np.uint8)
+        x = (width - sample.shape[1]) * i // max(1, frames - 1)
+        frame[:sample.shape[0], x:x + sample.shape[1]] = sample
+        writer.write(frame)
+    writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help='length of the video')
+    parser.add_argument('--fps', type=float, default=30, help='frame rate of the video')
+    parser.add_argument('--width', type=int, default=640, help='frame width in pixels')
+    parser.add_argument('--height', type=int, default=480, help='frame height in pixels')
+    parser.add_argument('--model', default='yolov8n.pt', help='YOLO weights')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import detection_core
+    from object_detection_app import ObjectDetectionApp
+    detection_core.MODEL_WEIGHTS = args.model
+    assets = os.path.join(importlib.util.find_spec('ultralytics').submodule_search_locations[0], 'assets')
+
+    work_dir = tempfile.mkdtemp(prefix='video_stream_bench_')
+    try:
+        video_path = os.path.join(work_dir, 'sample.mp4')
+        make_video(video_path, args.seconds, args.fps, args.width, args.height, os.path.join(assets, 'bus.jpg'))
+
+        window = ObjectDetectionApp()
+        window.show()
+        while window.detection_worker.detector.model is None:
+            app.processEvents()
+            time.sleep(0.001)
+        timings = []
+        window.detection_worker.result_signal.connect(lambda request_id, image, detections, stages: timings.append(stages))
+        print(f"{args.seconds:g} s video of {args.width}x{args.height} at {args.fps:g} FPS, {args.model}")
+
+        for realtime in (True, False):
+            timings.clear()
+            start = time.perf_counter()
+            window.start_stream(video_path, realtime)
+            reader = window.video_reader
+            dropped = window.detection_worker.dropped
+            while window.video_reader is not None or not window.detection_worker.idle():
+                app.processEvents()
+                time.sleep(0.001)
+            app.processEvents()
+            elapsed = time.perf_counter() - start
+            dropped = window.detection_worker.dropped - dropped
+            print(f"  {'real time' if realtime else 'every frame'}: {reader.frames_read} frames read, "
+                  f"{window.stream_shown} shown, {dropped} dropped, {window.stream_shown / elapsed:.1f} FPS shown")
+            totals = [sum(stages.values()) for stages in timings]
+            print("    " + ", ".join(f"{stage} {percentile([t[stage] for t in timings], 0.5):.1f}/"
+                                     f"{percentile([t[stage] for t in timings], 0.95):.1f} ms" for stage in timings[0])
+                  + f"; read to annotated {percentile(totals, 0.5):.0f}/{percentile(totals, 0.95):.0f} ms")
+            if realtime:
+                processing = sum(totals) / len(totals) - sum(t['wait'] for t in timings) / len(timings)
+                behind = reader.frames_read * processing / 1000 - args.seconds
+                print(f"    without dropping, the last frame would have been {max(0, behind):.1f} s behind")
+        window.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
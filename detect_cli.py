@@ -0,0 +1,110 @@
+"""Detect objects from the command line, without the window or a QApplication.
+
+Usage: python detect_cli.py PATH [PATH ...] [--output DIR] [--format jsonl] [--batch-size 8] [--resume] [--model yolov8n.pt] [--backend pytorch] [--threads N] [--no-cache] [--server URL]
+
+PATHs are image files or folders of them. With --output they go through
+the same pipeline as Detect Folder: results file, annotated images and a
+checkpoint in DIR, with progress on standard error. Without it, the
+record of each image is printed to standard output as a JSON line, as
+in a JSONL results file. With --server, images are sent to a running
+detection_service.py instead of loading the model here.
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_detection import (folder_images, decoded, batches, detection_arrays, detections_of, detect_folder,
+                             BATCH_SIZE, IO_WORKERS, RESULTS_FILES)
+from detection_core import Detector
+from inference_backend import BACKENDS
+
+
+def image_paths(paths):
+    """Image files of paths in order, folders replaced by the images directly in them."""
+    found = []
+    for path in paths:
+        found.extend(folder_images(path) if os.path.isdir(path) else [path])
+    return found
+
+
+def print_records(detector, paths, batch_size):
+    with ThreadPoolExecutor(IO_WORKERS) as pool:
+        for batch in batches(decoded(paths, pool, 2 * batch_size), batch_size):
+            images = [image for _, (image, _) in batch if image is not None]
+            digests = [digest for _, (image, digest) in batch if image is not None]
+            rows = iter(detector.detect(images, digests)[0] if images else ())
+            for path, (image, _) in batch:
+                if image is None:
+                    record = {'path': path, 'error': 'unreadable'}
+                else:
+                    height, width = image.shape[:2]
+                    record = {'path': path, 'width': width, 'height': height,
+                              'detections': detections_of(detection_arrays(next(rows)), detector.names)}
+                print(json.dumps(record), flush=True)
+
+
+def print_server_records(server, paths):
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                request = urllib.request.Request(server.rstrip('/') + '/detect', f.read(), method='POST')
+            with urllib.request.urlopen(request) as response:
+                record = {'path': path, **json.load(response)}
+        except OSError as e: # urllib's HTTPError and URLError included
+            record = {'path': path, 'error': str(e)}
+        record.pop('timings', None)
+        print(json.dumps(record), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='image files or folders of images')
+    parser.add_argument('--output', help='folder for the results file, annotated images and checkpoint')
+    parser.add_argument('--format', choices=sorted(RESULTS_FILES), default='jsonl', help='results file format')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='images per model call')
+    parser.add_argument('--resume', action='store_true', help='continue an unfinished run in --output')
+    parser.add_argument('--model', help='YOLO weights (default: detection_core.MODEL_WEIGHTS)')
+    parser.add_argument('--backend', choices=BACKENDS, help='inference backend (default: detection_core.MODEL_BACKEND)')
+    parser.add_argument('--threads', type=int, help='threads per inference')
+    parser.add_argument('--no-cache', action='store_true', help='neither use nor fill the result cache')
+    parser.add_argument('--server', help='URL of a running detection_service.py to send the images to')
+    args = parser.parse_args()
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"no such file or folder: {', '.join(missing)}")
+    paths = image_paths(args.paths)
+
+    if args.server:
+        if args.output:
+            parser.error("--output cannot be used with --server")
+        print_server_records(args.server, paths)
+        return
+    detector = Detector(args.model, args.backend, args.threads, cache=not args.no_cache)
+    try:
+        seconds = detector.load()
+    except Exception as e:
+        sys.exit(f"Cannot load the model: {e}")
+    print(f"Model loaded in {seconds:.1f} s ({detector.backend})", file=sys.stderr)
+    try:
+        if args.output is None:
+            print_records(detector, paths, args.batch_size)
+            return
+
+        def progress(done, total, images_per_second):
+            print(f"\r{done}/{total} images, {images_per_second:.1f} images/s", end='', file=sys.stderr, flush=True)
+
+        count, elapsed = detect_folder(detector, paths, args.output, args.batch_size, args.format, args.resume,
+                                       progress=progress)
+        print(f"\n{count} images in {elapsed:.1f} s, results in {os.path.join(args.output, RESULTS_FILES[args.format])}",
+              file=sys.stderr)
+    finally:
+        if detector.cache is not None:
+            print(detector.cache.stats(), file=sys.stderr)
+        detector.close()
+
+
+if __name__ == '__main__':
+    main()
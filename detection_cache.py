@@ -0,0 +1,128 @@
+"""Detection results kept on disk, keyed by image content and model configuration."""
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from hashlib import blake2b
+
+import numpy as np
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.detection_cache.sqlite')
+CACHE_MB = 64 # Disk budget for cached results; a result is some 100 bytes plus 24 per box
+ENTRY_OVERHEAD = 100 # Bytes counted per result on top of its boxes, for the key and the row
+MODEL_PARAMETERS = ('imgsz', 'conf', 'iou', 'max_det', 'classes', 'agnostic_nms', 'half') # Predictor arguments in the key
+
+
+def content_digest(data):
+    """Hash of the bytes of an image file."""
+    return blake2b(data, digest_size=16).hexdigest()
+
+
+def model_key(backend, model):
+    """Hash of the file model was loaded from, the backend and model's predictor arguments, or None without a file.
+
+    The file is model.ckpt_path, as ultralytics resolved it: weights like
+    'yolov8n.pt' found in its weights folder, or an exported model, whose
+    folder (OpenVINO) is hashed file by file. Weights built from a .yaml
+    have no file and are random on every load, so their results are never
+    cached. model must have run once, so its predictor is set up.
+    """
+    path = getattr(model, 'ckpt_path', None)
+    if not path or not os.path.exists(path):
+        return None
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(folder, name) for folder, _, names in os.walk(path) for name in names)
+    digest = blake2b(digest_size=16)
+    for file_path in files:
+        digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            for chunk in iter(partial(f.read, 1 << 20), b''):
+                digest.update(chunk)
+    args = model.predictor.args
+    digest.update(repr((backend, [getattr(args, name, None) for name in MODEL_PARAMETERS])).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """Boxes of each image seen by one model configuration, least recently used first out, bounded in bytes.
+
+    Results are the float32 rows of batch_detection.result_data() with the
+    milliseconds the model took for them, so a hit can count the time it
+    saved. One SQLite file holds all model configurations; the budget
+    covers all of them, and its total is kept in the file too, so that
+    processes sharing it (the window, detect_cli.py, detection_service.py)
+    evict against the same number. It may be used from several threads.
+    `hits`, `misses` and `saved_ms` count what happened since it was opened.
+    """
+
+    def __init__(self, model_key, path=None, budget_mb=None):
+        self.model_key = model_key
+        self.path = CACHE_PATH if path is None else path
+        self.budget = (CACHE_MB if budget_mb is None else budget_mb) * 1024 * 1024
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None) # Transactions are explicit
+        self.db.execute("PRAGMA synchronous = OFF") # A crash only loses results, which a rerun makes again
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, boxes BLOB, inference_ms REAL, "
+                            "size INTEGER, used INTEGER)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS total (size INTEGER)") # One row: the sum of results.size
+            self.db.execute("INSERT INTO total SELECT COALESCE(SUM(size), 0) FROM results "
+                            "WHERE NOT EXISTS (SELECT 1 FROM total)")
+
+    @property
+    def size(self):
+        """Bytes counted for the results of all model configurations, by all processes."""
+        with self.lock:
+            return self.db.execute("SELECT size FROM total").fetchone()[0]
+
+    def get(self, digest):
+        """(rows, inference_ms) cached for the image with this content digest, or None."""
+        key = self.model_key + digest
+        with self.lock:
+            row = self.db.execute("SELECT boxes, inference_ms FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_ms += row[1]
+            self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time_ns(), key))
+        return np.frombuffer(row[0], np.float32).reshape(-1, 6), row[1]
+
+    def put(self, digest, rows, inference_ms):
+        boxes = np.ascontiguousarray(rows, np.float32).tobytes()
+        size = len(boxes) + ENTRY_OVERHEAD
+        key = self.model_key + digest
+        with self.lock, self.db:
+            self.db.execute("BEGIN IMMEDIATE") # Other processes wait, so the total they see includes this result
+            old = self.db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            total = self.db.execute("SELECT size FROM total").fetchone()[0] + size - (old[0] if old else 0)
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                            (key, boxes, inference_ms, size, time.time_ns()))
+            while total > self.budget:
+                evicted = self.db.execute("SELECT key, size FROM results ORDER BY used LIMIT 100").fetchall()
+                if not evicted:
+                    break
+                for evicted_key, evicted_size in evicted:
+                    self.db.execute("DELETE FROM results WHERE key = ?", (evicted_key,))
+                    total -= evicted_size
+                    if total <= self.budget:
+                        break
+            self.db.execute("UPDATE total SET size = ?", (total,))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def stats(self):
+        size = self.size
+        looked_up = self.hits + self.misses
+        rate = self.hits / looked_up * 100 if looked_up else 0
+        return (f"Cache: {self.hits}/{looked_up} hits ({rate:.0f}%), {self.saved_ms / 1000:.1f} s of inference saved, "
+                f"{size / (1024 * 1024):.1f}/{self.budget / (1024 * 1024):.0f} MB")
@@ -0,0 +1,91 @@
+"""The object detector without the window: a model loaded once and kept warm, with its result cache.
+
+The window's worker thread, the folder pipeline, the command line
+(detect_cli.py) and the HTTP service (detection_service.py) all detect
+through a Detector, and none of this needs Qt.
+"""
+import sqlite3
+import time
+
+import numpy as np
+
+from batch_detection import result_data, inference_ms
+from detection_cache import DetectionCache, model_key
+from inference_backend import load_model
+
+MODEL_WEIGHTS = 'yolov8n.pt' # Pretrained YOLOv8n
+MODEL_BACKEND = 'pytorch' # One of inference_backend.BACKENDS; the others are exported from MODEL_WEIGHTS on first use
+INFERENCE_THREADS = None # Threads per inference, None for the backend's default
+WARMUP_SIZE = 640 # Side of the blank image run once after loading, so the first request is not the slow one
+
+
+class Detector:
+    """A YOLO model of weights on backend, and the DetectionCache of its results.
+
+    Nothing is loaded until load(), which takes seconds; model is None
+    until then. Results for images whose content digest is known are
+    kept in the cache, unless cache is False, the model was built from a
+    .yaml or the cache cannot be opened. A Detector is used by one thread
+    at a time.
+    """
+
+    def __init__(self, weights=None, backend=None, threads=None, cache=True):
+        self.weights = MODEL_WEIGHTS if weights is None else weights
+        self.backend = MODEL_BACKEND if backend is None else backend
+        self.threads = INFERENCE_THREADS if threads is None else threads
+        self.use_cache = cache
+        self.model = None
+        self.cache = None
+
+    def load(self):
+        """Loads (or exports) the model and warms it up; returns the seconds it took."""
+        start = time.perf_counter()
+        model = load_model(self.weights, self.backend, self.threads) # Imports ultralytics, which alone takes seconds
+        model(np.zeros((WARMUP_SIZE, WARMUP_SIZE, 3), np.uint8), verbose=False) # Sets up the predictor
+        if self.use_cache:
+            try:
+                key = model_key(self.backend, model)
+                self.cache = None if key is None else DetectionCache(key)
+            except (OSError, sqlite3.Error):
+                self.cache = None # Without a cache every image goes through the model
+        self.model = model
+        return time.perf_counter() - start
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def detect(self, images, digests=None):
+        """(rows, timings) for decoded BGR images: result_data() rows and stage -> ms for each image.
+
+        digests are the content digests of the images' files, None for an
+        image that should not be looked up, like a video frame. Images not
+        found in the cache go through the model in one call; timings hold
+        a cache stage if looked up, and ultralytics' preprocess, inference
+        and postprocess if not found.
+        """
+        digests = [None] * len(images) if digests is None else digests
+        rows = [None] * len(images)
+        timings = [{} for _ in images]
+        if self.cache is not None:
+            for i, digest in enumerate(digests):
+                if digest is not None:
+                    start = time.perf_counter()
+                    cached = self.cache.get(digest)
+                    timings[i]['cache'] = (time.perf_counter() - start) * 1000
+                    if cached is not None:
+                        rows[i] = cached[0]
+        todo = [i for i, row in enumerate(rows) if row is None]
+        if todo:
+            for i, result in zip(todo, self.model([images[i] for i in todo], verbose=False)):
+                rows[i] = result_data(result)
+                timings[i].update(result.speed)
+                if self.cache is not None and digests[i] is not None:
+                    start = time.perf_counter()
+                    self.cache.put(digests[i], rows[i], inference_ms(result))
+                    timings[i]['cache'] += (time.perf_counter() - start) * 1000
+        return rows, timings
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
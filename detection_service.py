@@ -0,0 +1,214 @@
+"""Object detection as a local HTTP service: the model stays loaded and warm, and concurrent requests share model calls.
+
+Usage: python detection_service.py [--host 127.0.0.1] [--port 8765] [--max-batch 8] [--batch-wait-ms 5] [--model yolov8n.pt] [--backend pytorch] [--threads N] [--no-cache]
+
+POST /detect with the bytes of an image file as the body answers with
+the image's record as JSON (width, height, detections, as a line of a
+results file) and the stage timings in ms. GET /metrics answers with
+request and model call counts, the mean batch size and latency p50/p99
+over the last METRICS_WINDOW requests; GET /health with the model.
+Requests are read and decoded on their own threads, then queued; one
+thread takes the first, waits up to --batch-wait-ms for more, up to
+--max-batch, and detects them in one model call per image shape. With
+--port 0 a free port is picked; the address is printed once the model
+is loaded.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from batch_detection import detection_arrays, detections_of
+from detection_cache import content_digest
+from detection_core import Detector
+from inference_backend import BACKENDS
+
+SERVICE_HOST = '127.0.0.1' # Local only; there is no authentication
+SERVICE_PORT = 8765
+MAX_BATCH = 8 # Requests per model call at most
+BATCH_WAIT_MS = 5 # How long a request may wait for others to share its model call
+METRICS_WINDOW = 1000 # Latest requests the latency percentiles are over
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+class DetectionService:
+    """Detects images submitted from any thread on one thread of its own, several per model call."""
+
+    def __init__(self, detector, max_batch=MAX_BATCH, batch_wait_ms=BATCH_WAIT_MS):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.model_calls = 0
+        self.batched = 0 # Images that went through the model calls
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, image, digest=None):
+        """Future of (rows, timings) of Detector.detect() for one decoded image; timings include the queue wait."""
+        future = Future()
+        self.queue.put((image, digest, future, time.perf_counter()))
+        return future
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None) # Stop after this batch
+                    break
+                batch.append(item)
+            self.detect(batch)
+
+    def detect(self, batch):
+        shapes = {}
+        for item in batch:
+            shapes.setdefault(item[0].shape, []).append(item) # The model letterboxes a batch to one shape
+        for items in shapes.values():
+            start = time.perf_counter()
+            try:
+                rows, timings = self.detector.detect([item[0] for item in items], [item[1] for item in items])
+            except Exception as e:
+                for _, _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            with self.lock:
+                self.model_calls += 1
+                self.batched += len(items)
+            for (_, _, future, queued), image_rows, image_timings in zip(items, rows, timings):
+                image_timings['queue'] = (start - queued) * 1000
+                future.set_result((image_rows, image_timings))
+
+    def record(self, latency_ms, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latencies.append(latency_ms)
+
+    def metrics(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            metrics = {'requests': self.requests, 'errors': self.errors, 'model_calls': self.model_calls,
+                       'mean_batch': self.batched / self.model_calls if self.model_calls else None}
+        metrics['latency_ms'] = {'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99),
+                                 'window': len(latencies)}
+        metrics['uptime_s'] = time.time() - self.started
+        metrics['cache'] = self.detector.cache.stats() if self.detector.cache is not None else None
+        return metrics
+
+
+class DetectionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64 # Connections waiting to be accepted; the default 5 drops some when many clients connect at once
+
+
+class DetectionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, so a client can reuse its connection
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/metrics':
+            self.send_json(200, service.metrics())
+        elif self.path == '/health':
+            detector = service.detector
+            self.send_json(200, {'status': 'ok', 'model': detector.weights, 'backend': detector.backend})
+        else:
+            self.send_json(404, {'error': f"no such path: {self.path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        service = self.server.service
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/detect':
+            self.send_json(404, {'error': f"no such path: {self.path}"})
+            return
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None
+        if image is None:
+            self.send_json(400, {'error': 'the body is not an image file'})
+            service.record((time.perf_counter() - start) * 1000, ok=False)
+            return
+        decoded = time.perf_counter()
+        try:
+            rows, timings = service.submit(image, content_digest(data)).result()
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            service.record((time.perf_counter() - start) * 1000, ok=False)
+            return
+        height, width = image.shape[:2]
+        timings['decode'] = (decoded - start) * 1000
+        self.send_json(200, {'width': width, 'height': height,
+                             'detections': detections_of(detection_arrays(rows), service.detector.names),
+                             'timings': timings})
+        service.record((time.perf_counter() - start) * 1000)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass # A line per request would cost more than some requests do; see /metrics instead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=SERVICE_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='port to listen on, 0 for any free one')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='requests per model call at most')
+    parser.add_argument('--batch-wait-ms', type=float, default=BATCH_WAIT_MS, help='wait for more requests per batch')
+    parser.add_argument('--model', help='YOLO weights (default: detection_core.MODEL_WEIGHTS)')
+    parser.add_argument('--backend', choices=BACKENDS, help='inference backend (default: detection_core.MODEL_BACKEND)')
+    parser.add_argument('--threads', type=int, help='threads per inference')
+    parser.add_argument('--no-cache', action='store_true', help='neither use nor fill the result cache')
+    args = parser.parse_args()
+
+    detector = Detector(args.model, args.backend, args.threads, cache=not args.no_cache)
+    seconds = detector.load()
+    service = DetectionService(detector, args.max_batch, args.batch_wait_ms)
+    server = DetectionServer((args.host, args.port), DetectionHandler)
+    server.service = service
+    print(f"Serving {detector.weights} ({detector.backend}, loaded in {seconds:.1f} s) "
+          f"on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        detector.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Object detection on Qt worker threads: a long-lived one for the window, and one per folder run."""
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from batch_detection import read_image, detection_arrays, detections_of, annotate, detect_folder
+from detection_core import Detector
+
+
+def frame_image(frame):
+    """A BGR frame as a QImage in the format of the screen, so QPixmap.fromImage() needs no conversion.
+
+    OpenCV converts the pixels straight into the QImage's own memory, one
+    pass instead of rgbSwapped() and then the pixmap's conversion.
+    """
+    height, width = frame.shape[:2]
+    image = QImage(width, height, QImage.Format_RGB32) # 0xffRRGGBB words: B G R 255 bytes on little-endian machines
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, np.frombuffer(bits, np.uint8).reshape(height, width, 4))
+    return image
+
+
+class DetectionWorker(QThread):
+    """Loads the model once, in the background, then runs detection requests one at a time.
+
+    A request is an image path or a decoded BGR frame. request() returns
+    an id and does not block unless asked to. Only the newest request
+    waits: one made while another is still waiting replaces it, and the
+    replaced one gets no result, so a video source that is faster than
+    the model has frames dropped instead of falling behind. result_signal
+    carries the id, so the caller can also ignore a result that was
+    already running when a newer request came. Detection goes through
+    a Detector, so an image path detected before is drawn from its
+    result cache without the model. The latency of each stage is reported
+    in milliseconds: wait (in the queue), read and cache (paths only),
+    then ultralytics' own preprocess, inference and postprocess (not on a
+    cache hit), then draw.
+    """
+
+    model_loaded_signal = pyqtSignal(float) # seconds to import ultralytics, load (or export) the model and warm up
+    result_signal = pyqtSignal(int, QImage, list, dict) # request id, annotated image, detections, stage -> ms
+    error_signal = pyqtSignal(int, str) # request id (0 if the model could not be loaded), message
+
+    def __init__(self, weights=None, backend=None, threads=None):
+        super().__init__()
+        self.detector = Detector(weights, backend, threads) # Its model is None until loaded
+        self.condition = threading.Condition()
+        self.next_request = None # (id, path or frame, time requested) waiting for the model
+        self.last_id = 0
+        self.busy = False
+        self.dropped = 0 # Requests replaced before they ran
+
+    def request(self, source, block=False):
+        """Queues source; with block, first waits for the previous request to be taken instead of replacing it."""
+        with self.condition:
+            while block and self.next_request is not None:
+                self.condition.wait()
+            if self.next_request is not None:
+                self.dropped += 1
+            self.last_id += 1
+            self.next_request = (self.last_id, source, time.perf_counter())
+            self.condition.notify_all()
+            return self.last_id
+
+    def idle(self):
+        """True when the model is loaded and nothing is running or waiting, so others may use it."""
+        with self.condition:
+            return self.detector.model is not None and not self.busy and self.next_request is None
+
+    def stop(self):
+        self.requestInterruption()
+        with self.condition:
+            self.condition.notify_all()
+        self.wait()
+
+    def run(self):
+        try:
+            seconds = self.detector.load() # Not before the window is up: importing ultralytics alone takes seconds
+        except Exception as e:
+            self.error_signal.emit(0, str(e))
+            return
+        self.model_loaded_signal.emit(seconds)
+
+        while True:
+            with self.condition:
+                while self.next_request is None and not self.isInterruptionRequested():
+                    self.condition.wait()
+                if self.isInterruptionRequested():
+                    self.detector.close()
+                    return
+                request_id, source, requested = self.next_request
+                self.next_request = None
+                self.busy = True
+                self.condition.notify_all() # A blocked request() may queue the next one now
+            try:
+                self.detect(request_id, source, requested)
+            except Exception as e:
+                self.error_signal.emit(request_id, str(e))
+            finally:
+                with self.condition:
+                    self.busy = False
+
+    def detect(self, request_id, source, requested):
+        start = time.perf_counter()
+        timings = {'wait': (start - requested) * 1000}
+        if isinstance(source, str):
+            image, digest = read_image(source)
+            if image is None:
+                raise OSError(f"cannot read {source}")
+            timings['read'] = (time.perf_counter() - start) * 1000
+        else:
+            image, digest = source, None # Video frames do not come twice, so they are not looked up
+        rows, stages = self.detector.detect([image], [digest]) # The decoded image, so it is read only once
+        timings.update(stages[0])
+        start = time.perf_counter()
+        arrays = detection_arrays(rows[0])
+        detections = detections_of(arrays, self.detector.names)
+        image = frame_image(annotate(image, arrays, self.detector.names)) # Drawn on in place, then converted once
+        timings['draw'] = (time.perf_counter() - start) * 1000
+        self.result_signal.emit(request_id, image, detections, timings)
+
+
+class BatchDetectionThread(QThread):
+    """Runs detect_folder() off the GUI thread; requestInterruption() cancels it after the current batch."""
+
+    progress_signal = pyqtSignal(int, int, float) # images done (earlier runs included), total, images/sec
+    done_signal = pyqtSignal(int, float) # images done by this run, seconds
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, detector, paths, output_dir, batch_size=None, results_format='jsonl', resume=False):
+        super().__init__()
+        self.detector = detector
+        self.paths = paths
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.results_format = results_format
+        self.resume = resume
+
+    def run(self):
+        try:
+            count, elapsed = detect_folder(self.detector, self.paths, self.output_dir, self.batch_size,
+                                           self.results_format, self.resume, self.isInterruptionRequested,
+                                           self.progress_signal.emit)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            return
+        self.done_signal.emit(count, elapsed)
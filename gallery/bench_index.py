@@ -0,0 +1,152 @@
+"""Benchmark building the gallery's metadata index for a folder.
+
+Usage: python bench_index.py [--images 10000] [--width 1600] [--height 1200] [--workers N]
+
+Writes a folder of synthetic JPEGs, each with an EXIF block holding a
+capture time and an orientation. They are made from DISTINCT_PICTURES
+pictures, each saved at two JPEG qualities, so the folder is full of
+exact and near duplicates. MetadataIndex then indexes it three times:
+into an empty index (cold: every file read by the process pool), again
+with a new index object (warm: nothing changed, answered from the
+database) and after touching one file in ten (only those read again).
+Paths are handed over in batches, as the folder scanner does. Throughput
+in images/sec is printed for each run, next to reading a sample in this
+process without a pool, and the index contents are checked against what
+was written.
+"""
+import argparse
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+SAMPLE_IMAGES = 100
+SCAN_BATCH = 1000
+DISTINCT_PICTURES = 8
+ORIENTATIONS = (1, 6, 3, 8)
+
+
+def exif_block(taken, orientation):
+    """APP1 segment with IFD0 (Orientation, Exif pointer) and an Exif IFD (DateTimeOriginal), little-endian."""
+    date = taken.encode('ascii') + b'\0'
+    ifd0 = struct.pack('<H', 2)
+    ifd0 += struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0)
+    ifd0 += struct.pack('<HHII', 0x8769, 4, 1, 8 + 2 + 2 * 12 + 4)
+    ifd0 += struct.pack('<I', 0)
+    exif_at = 8 + len(ifd0)
+    exif_ifd = struct.pack('<H', 1) + struct.pack('<HHII', 0x9003, 2, len(date), exif_at + 2 + 12 + 4) + struct.pack('<I', 0)
+    tiff = b'II*\0' + struct.pack('<I', 8) + ifd0 + exif_ifd + date
+    payload = b'Exif\0\0' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def make_folder(folder, count, width, height):
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt5.QtGui import QImage, QPainter, QColor
+    rng = random.Random(0)
+    sources = [] # sources[picture][quality]
+    for _ in range(DISTINCT_PICTURES):
+        image = QImage(width, height, QImage.Format_RGB32)
+        image.fill(QColor.fromHsv(rng.randrange(360), 120, rng.randrange(60, 230)))
+        painter = QPainter(image)
+        for _ in range(12): # Blocks of light and dark, so each picture has its own hash
+            painter.fillRect(rng.randrange(width), rng.randrange(height), rng.randrange(width // 2), rng.randrange(height // 2),
+                             QColor.fromHsv(rng.randrange(360), rng.randrange(256), rng.randrange(256)))
+        painter.end()
+        encoded = []
+        for quality in (90, 60):
+            data = QByteArray()
+            buffer = QBuffer(data)
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, 'JPEG', quality)
+            encoded.append(bytes(data))
+        sources.append(encoded)
+    expected = {}
+    for i in range(count):
+        taken = time.strftime('%Y:%m:%d %H:%M:%S', time.gmtime(1700000000 + i * 60))
+        orientation = ORIENTATIONS[i % len(ORIENTATIONS)]
+        data = sources[i % DISTINCT_PICTURES][i // DISTINCT_PICTURES % 2]
+        path = os.path.join(folder, f"IMG_{i:06d}.jpg")
+        with open(path, 'wb') as f:
+            f.write(data[:2] + exif_block(taken, orientation) + data[2:])
+        expected[path] = (taken.replace(':', '-', 2), orientation)
+    return expected
+
+
+def build(app, index, folder, paths):
+    done = []
+    index.idle.connect(lambda read, answered: done.append((read, answered)))
+    start = time.perf_counter()
+    index.open(folder)
+    for i in range(0, len(paths), SCAN_BATCH):
+        index.add(paths[i:i + SCAN_BATCH])
+    while not done or sum(done[-1]) < len(paths):
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - start, done[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=10000, help='number of images in the folder')
+    parser.add_argument('--width', type=int, default=1600, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=1200, help='image height in pixels')
+    parser.add_argument('--workers', type=int, default=None, help='index processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import metadata_index
+    from metadata_index import MetadataIndex, read_metadata
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_index_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        metadata_index.INDEX_DIR = os.path.join(work_dir, 'index')
+        start = time.perf_counter()
+        expected = make_folder(folder, args.images, args.width, args.height)
+        paths = sorted(expected)
+        print(f"{args.images} JPEGs of {args.width}x{args.height} written in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        for path in paths[:SAMPLE_IMAGES]:
+            read_metadata(path)
+        print(f"  one process, no pool: {SAMPLE_IMAGES / (time.perf_counter() - start):.0f} images/s")
+
+        index = MetadataIndex(args.workers)
+        elapsed, (read, answered) = build(app, index, folder, paths)
+        print(f"  cold: {elapsed:.2f} s, {len(paths) / elapsed:.0f} images/s "
+              f"({read} read on {index.workers} processes, {answered} from the index)")
+        wrong = [path for path in paths if path not in index.info
+                 or (index.info[path].taken, index.info[path].orientation) != expected[path]
+                 or (index.info[path].width, index.info[path].height) != (args.width, args.height)]
+        similar = index.similar(paths[0])
+        index.stop()
+
+        index = MetadataIndex(args.workers)
+        elapsed, (read, answered) = build(app, index, folder, paths)
+        print(f"  warm: {elapsed:.2f} s, {len(paths) / elapsed:.0f} images/s ({read} read, {answered} from the index)")
+        index.stop()
+
+        for path in paths[::10]:
+            os.utime(path, ns=(time.time_ns(), time.time_ns()))
+        index = MetadataIndex(args.workers)
+        elapsed, (read, answered) = build(app, index, folder, paths)
+        print(f"  one in ten touched: {elapsed:.2f} s, {len(paths) / elapsed:.0f} images/s "
+              f"({read} read, {answered} from the index)")
+        index.stop()
+
+        print(f"  {len(paths) - len(wrong)}/{len(paths)} indexed with the dimensions, capture time and "
+              f"orientation written; {len(similar)} near-duplicates of the first image "
+              f"(expected {len(paths[::DISTINCT_PICTURES]) - 1})")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark stepping through a folder of large photos in the gallery.
+
+Usage: python bench_navigation.py [--images 30] [--width 7296] [--height 5472] [--interval 1000] [--no-prefetch]
+
+Writes a folder of synthetic JPEGs (40 MP by default), opens it in
+ImageGalleryApp and presses "next" through all of them, pausing --interval
+ms on each image as a viewer would. Each step is timed until the full-size
+image is on screen; a rotate click is timed on every image as well. The
+ImageCache counters are printed at the end. --no-prefetch decodes only the
+image being shown, like the gallery did before prefetching.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=30, help='number of images in the folder')
+    parser.add_argument('--width', type=int, default=7296, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=5472, help='image height in pixels')
+    parser.add_argument('--interval', type=int, default=1000, help='ms spent looking at each image')
+    parser.add_argument('--no-prefetch', action='store_true', help='decode only the image being shown')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QFileDialog
+    app = QApplication(sys.argv)
+    import image_cache
+    import thumbnails
+    from bench_thumbnails import make_corpus
+    if args.no_prefetch:
+        image_cache.PREFETCH_DISTANCE = 0
+    from main import ImageGalleryApp
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_navigation_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        thumbnails.THUMBNAIL_DIR = os.path.join(work_dir, 'thumbnails')
+        make_corpus(folder, args.images, args.width, args.height)
+        QFileDialog.getExistingDirectory = staticmethod(lambda *args: folder)
+
+        window = ImageGalleryApp()
+        window.show()
+        window.open_folder()
+        while len(window.image_files) < args.images: # The folder is scanned in the background
+            app.processEvents()
+            time.sleep(0.001)
+        loader = window.image_loader
+
+        def wait_for_current(start):
+            path = window.image_files[window.current_image_index]
+            while path not in loader.cache and path not in loader.failed:
+                app.processEvents()
+                time.sleep(0.001)
+            return (time.perf_counter() - start) * 1000
+
+        def idle(ms):
+            end = time.perf_counter() + ms / 1000
+            while time.perf_counter() < end:
+                app.processEvents()
+                time.sleep(0.005)
+
+        wait_for_current(time.perf_counter())
+        steps, rotations = [], []
+        for _ in range(args.images - 1):
+            idle(args.interval)
+            start = time.perf_counter()
+            window.show_next_image()
+            steps.append(wait_for_current(start))
+            start = time.perf_counter()
+            window.rotate_image()
+            app.processEvents()
+            rotations.append((time.perf_counter() - start) * 1000)
+        window.close()
+
+        mode = "no prefetch" if args.no_prefetch else f"prefetch {image_cache.PREFETCH_DISTANCE} each side"
+        print(f"{args.images} images of {args.width}x{args.height}, {args.interval} ms per image, {mode}")
+        print(f"  next until full image shown: p50 {percentile(steps, 0.5):.1f} ms, "
+              f"p95 {percentile(steps, 0.95):.1f} ms, max {max(steps):.1f} ms")
+        print(f"  rotate: p50 {percentile(rotations, 0.5):.1f} ms, max {max(rotations):.1f} ms")
+        print(f"  {loader.cache.stats()}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark dragging the gallery window's edge over a large photo.
+
+Usage: python bench_resize.py [--steps 200] [--width 7296] [--height 5472] [--angle 90]
+
+Opens one synthetic JPEG (40 MP by default) in ImageGalleryApp, rotated by
+--angle, and resizes the window --steps times, from 800x600 up to 1400x1000
+and back, handling events after every step as during a mouse drag. Each
+step is timed, then the smooth redraw once the drag has settled, then
+settling again at a window size seen before (a cached rendition). For
+comparison, a few steps are also timed the way the gallery drew before:
+rotating the full-size image and smooth-scaling the result.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+LEGACY_SAMPLES = 5
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', type=int, default=200, help='resize events in the drag')
+    parser.add_argument('--width', type=int, default=7296, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=5472, help='image height in pixels')
+    parser.add_argument('--angle', type=int, default=90, help='rotation of the image during the drag')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QFileDialog
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QTransform
+    app = QApplication(sys.argv)
+    import thumbnails
+    from bench_thumbnails import make_corpus
+    from main import ImageGalleryApp, RESIZE_SETTLE_MS
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_resize_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        thumbnails.THUMBNAIL_DIR = os.path.join(work_dir, 'thumbnails')
+        path, = make_corpus(folder, 1, args.width, args.height)
+        QFileDialog.getExistingDirectory = staticmethod(lambda *args: folder)
+
+        window = ImageGalleryApp()
+        window.resize(800, 600)
+        window.show()
+        window.open_folder()
+        while path not in window.image_loader.cache:
+            app.processEvents()
+            time.sleep(0.001)
+        for _ in range(args.angle // 90 % 4):
+            window.rotate_image()
+        app.processEvents()
+        image = window.image_loader.cache.peek(path)
+
+        def settle(start):
+            # Time from the last resize until the smooth rendition is on screen, less the settle delay
+            while window.resize_timer.isActive():
+                app.processEvents()
+                time.sleep(0.001)
+            return (time.perf_counter() - start) * 1000 - RESIZE_SETTLE_MS
+
+        half = args.steps // 2
+        sizes = [(800 + 600 * i // half, 600 + 400 * i // half) for i in range(1, half + 1)]
+        sizes += sizes[-2::-1][:args.steps - half]
+        steps = []
+        drag_start = time.perf_counter()
+        for width, height in sizes:
+            start = time.perf_counter()
+            window.resize(width, height)
+            app.processEvents()
+            steps.append((time.perf_counter() - start) * 1000)
+        drag = time.perf_counter() - drag_start
+        settled = settle(start)
+        window.resize(*sizes[half // 2])
+        app.processEvents()
+        settle(time.perf_counter())
+        start = time.perf_counter()
+        window.resize(*sizes[-1])
+        app.processEvents()
+        resettled = settle(start)
+
+        legacy = []
+        label_size = window.image_label.size()
+        for _ in range(LEGACY_SAMPLES):
+            start = time.perf_counter()
+            rotated = image.transformed(QTransform().rotate(args.angle), Qt.SmoothTransformation)
+            rotated.scaled(label_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            legacy.append((time.perf_counter() - start) * 1000)
+        window.close()
+
+        print(f"{args.steps}-step resize drag over a {args.width}x{args.height} image rotated {args.angle} degrees")
+        print(f"  drag: {drag:.2f} s, per step p50 {percentile(steps, 0.5):.1f} ms, "
+              f"p95 {percentile(steps, 0.95):.1f} ms, max {max(steps):.1f} ms")
+        print(f"  smooth redraw after settling: {settled:.1f} ms, at a size seen before: {resettled:.1f} ms")
+        print(f"  before (rotate full size, then smooth scale): {percentile(legacy, 0.5):.1f} ms per step, "
+              f"~{percentile(legacy, 0.5) * args.steps / 1000:.1f} s for the drag")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
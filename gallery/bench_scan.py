@@ -0,0 +1,118 @@
+"""Benchmark opening a folder with many files in the gallery.
+
+Usage: python bench_scan.py [--images 100000] [--folders 1] [--others 0.1]
+
+Writes --images small PNGs spread over --folders folders (subfolders of
+the opened one when more than one, scanned with "Include Subfolders"),
+plus a share of --others non-image files; one image in a hundred has no
+file extension, and every non-image file has an image extension.
+ImageGalleryApp then opens the folder, and the time until the first image
+is shown, the time until the scan finishes and the longest stretch the
+GUI thread spent without handling events are reported. A file is then
+added to and removed from the folder to time the watcher. For comparison,
+the way the gallery used to list a folder (os.listdir, filter by
+extension, sort, all on the GUI thread) is timed on a single folder.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def make_folder(root, images, folders, others):
+    from PyQt5.QtGui import QImage, QColor
+    sample = QImage(64, 48, QImage.Format_RGB32)
+    sample.fill(QColor('#4a90d9'))
+    os.makedirs(root)
+    source = os.path.join(root, 'sample.png')
+    sample.save(source, 'PNG')
+    with open(source, 'rb') as f:
+        data = f.read()
+    folder_paths = [root] if folders <= 1 else [os.path.join(root, f"day_{i:04d}") for i in range(folders)]
+    for folder in folder_paths:
+        os.makedirs(folder, exist_ok=True)
+    for i in range(images):
+        name = f"IMG_{i:07d}" if i % 100 == 0 else f"IMG_{i:07d}.png"
+        with open(os.path.join(folder_paths[i % len(folder_paths)], name), 'wb') as f:
+            f.write(data)
+    for i in range(int(images * others)):
+        with open(os.path.join(folder_paths[i % len(folder_paths)], f"notes_{i:07d}.jpg"), 'wb') as f:
+            f.write(b"not an image\n")
+    os.remove(source)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=100000, help='number of images')
+    parser.add_argument('--folders', type=int, default=1, help='folders to spread them over')
+    parser.add_argument('--others', type=float, default=0.1, help='non-image files per image')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QFileDialog
+    app = QApplication(sys.argv)
+    import thumbnails
+    from main import ImageGalleryApp
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_scan_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        thumbnails.THUMBNAIL_DIR = os.path.join(work_dir, 'thumbnails')
+        start = time.perf_counter()
+        data = make_folder(folder, args.images, args.folders, args.others)
+        print(f"{args.images} images in {max(args.folders, 1)} folder(s) written in {time.perf_counter() - start:.1f} s")
+
+        if args.folders <= 1:
+            start = time.perf_counter()
+            listed = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                            if name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')))
+            print(f"  before: os.listdir + filter + sort blocked the GUI for "
+                  f"{(time.perf_counter() - start) * 1000:.0f} ms ({len(listed)} files, by extension)")
+
+        QFileDialog.getExistingDirectory = staticmethod(lambda *args: folder)
+        window = ImageGalleryApp()
+        window.show()
+        window.recursive_action.setChecked(args.folders > 1)
+        finished = []
+        window.folder_scanner.scan_finished.connect(lambda: finished.append(time.perf_counter()))
+
+        start = time.perf_counter()
+        window.open_folder()
+        first_image = None
+        longest_stall = 0
+        while not finished:
+            turn = time.perf_counter()
+            app.processEvents()
+            longest_stall = max(longest_stall, time.perf_counter() - turn)
+            if first_image is None and window.current_image_index >= 0:
+                first_image = time.perf_counter()
+            time.sleep(0.001)
+        print(f"  first image shown after {(first_image - start) * 1000:.1f} ms, scan finished after "
+              f"{finished[0] - start:.2f} s with {len(window.image_files)} images "
+              f"(expected {args.images}), longest GUI stall {longest_stall * 1000:.0f} ms")
+
+        added_path = os.path.join(folder, 'AAA_new_photo')
+        with open(added_path, 'wb') as f:
+            f.write(data)
+        start = time.perf_counter()
+        while window.thumbnail_model.row_of(added_path) is None and time.perf_counter() - start < 10:
+            app.processEvents()
+            time.sleep(0.001)
+        added = time.perf_counter() - start
+        os.remove(added_path)
+        start = time.perf_counter()
+        while window.thumbnail_model.row_of(added_path) is not None and time.perf_counter() - start < 10:
+            app.processEvents()
+            time.sleep(0.001)
+        print(f"  watcher: new file listed after {added * 1000:.0f} ms, "
+              f"removed file dropped after {(time.perf_counter() - start) * 1000:.0f} ms")
+        window.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
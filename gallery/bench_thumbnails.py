@@ -0,0 +1,111 @@
+"""Benchmark the gallery's thumbnail pipeline with a cold and a warm disk cache.
+
+Usage: python bench_thumbnails.py [--images 1000] [--width 4000] [--height 3000]
+
+Writes a folder of synthetic JPEGs, then times ThumbnailLoader making a
+thumbnail of every image into an empty cache (cold: scaled decode plus
+cache write) and again with a new loader over the filled cache (warm: cache
+reads only), as when the same folder is opened again. A small sample is
+also decoded on one thread both ways, to show what decoding the full-size
+image and scaling it down afterwards would cost.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SAMPLE_IMAGES = 20
+DISTINCT_IMAGES = 8 # The folder repeats these under different names; each name is its own cache entry
+
+
+def make_corpus(folder, count, width, height):
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage, QPainter, QColor, QLinearGradient
+    sources = []
+    for i in range(DISTINCT_IMAGES):
+        image = QImage(width, height, QImage.Format_RGB32)
+        painter = QPainter(image)
+        gradient = QLinearGradient(0, 0, width, height)
+        gradient.setColorAt(0, QColor.fromHsv(i * 45, 200, 230))
+        gradient.setColorAt(1, QColor.fromHsv((i * 45 + 120) % 360, 160, 90))
+        painter.fillRect(image.rect(), gradient)
+        painter.setPen(QColor(Qt.white))
+        for line in range(0, height, 37):
+            painter.drawLine(0, line, width, (line * 7 + i * 97) % height)
+        painter.end()
+        path = os.path.join(folder, f"source_{i}.jpg")
+        image.save(path, 'JPEG', 90)
+        sources.append(path)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"IMG_{i:06d}.jpg")
+        shutil.copyfile(sources[i % DISTINCT_IMAGES], path)
+        paths.append(path)
+    for path in sources:
+        os.remove(path)
+    return paths
+
+
+def fill(app, loader, paths):
+    done = []
+    loader.thumbnail_ready.connect(lambda path, image: done.append(image.isNull()))
+    start = time.perf_counter()
+    for path in paths:
+        loader.request(path)
+    while len(done) < len(paths):
+        app.processEvents()
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=1000, help='number of images in the folder')
+    parser.add_argument('--width', type=int, default=4000, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=3000, help='image height in pixels')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage, QImageReader
+    app = QApplication(sys.argv)
+    from thumbnails import ThumbnailCache, ThumbnailLoader, THUMBNAIL_SIZE
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_thumbnail_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        start = time.perf_counter()
+        paths = make_corpus(folder, args.images, args.width, args.height)
+        print(f"{args.images} JPEGs of {args.width}x{args.height} written in {time.perf_counter() - start:.1f} s")
+
+        sample = paths[:SAMPLE_IMAGES]
+        start = time.perf_counter()
+        for path in sample:
+            QImage(path).scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        full = (time.perf_counter() - start) * 1000 / len(sample)
+        start = time.perf_counter()
+        for path in sample:
+            reader = QImageReader(path)
+            reader.setScaledSize(reader.size().scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio))
+            reader.read()
+        scaled = (time.perf_counter() - start) * 1000 / len(sample)
+        print(f"one thread: full decode then scale {full:.1f} ms/image, scaled decode {scaled:.1f} ms/image")
+
+        cache_dir = os.path.join(work_dir, 'cache')
+        for name in ('cold', 'warm'):
+            loader = ThumbnailLoader(ThumbnailCache(cache_dir))
+            elapsed, failed = fill(app, loader, paths)
+            loader.stop()
+            print(f"{name} cache: {elapsed:.2f} s for {len(paths)} thumbnails "
+                  f"({len(paths) / elapsed:.0f}/s on {loader.pool.maxThreadCount()} threads, {failed} failed)")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
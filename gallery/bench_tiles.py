@@ -0,0 +1,144 @@
+"""Benchmark opening, zooming and panning a huge image in the gallery.
+
+Usage: python bench_tiles.py [--width 20000] [--height 20000] [--pans 20]
+
+Writes one synthetic JPEG (400 MP by default) from a separate process and
+opens its folder in ImageGalleryApp, which shows it in the tiled viewer.
+Timed are: the overview on screen, the view sharp at the fitted zoom,
+zooming to 100% at the centre until sharp, and --pans steps of panning
+down at 100%, each once the previous one's tiles and margin are in (the
+step itself, then until its new tiles are on screen). Peak memory of
+the gallery process is printed next to decoding the whole image with
+QImageReader, which is done in another separate process so it does not
+count against the gallery.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+PAN_STEP = 400 # Screen pixels per pan step
+
+
+def make_image(path, width, height):
+    from PyQt5.QtGui import QImage, QPainter, QColor
+    image = QImage(width, height, QImage.Format_RGB888)
+    image.fill(QColor(40, 90, 140))
+    painter = QPainter(image)
+    cell = 250
+    for y in range(0, height, cell):
+        for x in range(0, width, cell):
+            painter.fillRect(x, y, cell // 2, cell // 2, QColor((x // cell * 37) % 256, (y // cell * 53) % 256, 120))
+    painter.end()
+    image.save(path, 'JPEG', 85)
+
+
+def read_whole(path, results):
+    from PyQt5.QtGui import QImageReader
+    start = time.perf_counter()
+    image = QImageReader(path).read()
+    results.put((time.perf_counter() - start, image.sizeInBytes(), peak_mb()))
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=20000, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=20000, help='image height in pixels')
+    parser.add_argument('--pans', type=int, default=20, help='pan steps at 100%%')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='gallery_tiles_bench_')
+    try:
+        folder = os.path.join(work_dir, 'images')
+        os.makedirs(folder)
+        path = os.path.join(folder, 'huge.jpg')
+        context = multiprocessing.get_context('spawn') # Fresh processes, so their memory is not ours
+        start = time.perf_counter()
+        maker = context.Process(target=make_image, args=(path, args.width, args.height))
+        maker.start()
+        maker.join()
+        print(f"{args.width}x{args.height} JPEG of {os.path.getsize(path) / (1024 * 1024):.0f} MB "
+              f"written in {time.perf_counter() - start:.1f} s")
+
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication, QFileDialog
+        app = QApplication(sys.argv)
+        import metadata_index
+        import thumbnails
+        from main import ImageGalleryApp
+        metadata_index.INDEX_DIR = os.path.join(work_dir, 'index')
+        thumbnails.THUMBNAIL_DIR = os.path.join(work_dir, 'thumbnails')
+        QFileDialog.getExistingDirectory = staticmethod(lambda *args: folder)
+        baseline = peak_mb()
+
+        window = ImageGalleryApp()
+        window.resize(1400, 1000)
+        window.show()
+        view = window.tiled_view
+
+        def wait(done):
+            start = time.perf_counter()
+            while not done():
+                app.processEvents()
+                time.sleep(0.001)
+            return (time.perf_counter() - start) * 1000
+
+        def sharp():
+            # Every tile on screen decoded as of the last paint; the margin rows may still be coming
+            return bool(view.levels) and view.missing == 0
+
+        start = time.perf_counter()
+        window.open_folder()
+        wait(lambda: view.path == path and view.levels)
+        overview = (time.perf_counter() - start) * 1000
+        fitted = overview + wait(sharp)
+
+        start = time.perf_counter()
+        view.actual_size()
+        view.centerOn(view.sceneRect().center())
+        app.processEvents()
+        zoom_step = (time.perf_counter() - start) * 1000
+        zoomed = zoom_step + wait(sharp)
+
+        steps, settles = [], []
+        for _ in range(args.pans):
+            wait(lambda: not view.pending) # Looking at the picture for a moment between pans
+            start = time.perf_counter()
+            view.verticalScrollBar().setValue(view.verticalScrollBar().value() + PAN_STEP)
+            view.viewport().repaint()
+            steps.append((time.perf_counter() - start) * 1000)
+            settles.append(steps[-1] + wait(sharp))
+        steps.sort()
+        settles.sort()
+        tiles_mb = view.tiles.size / (1024 * 1024)
+        gallery_peak = peak_mb()
+        window.close()
+
+        results = context.Queue()
+        reader = context.Process(target=read_whole, args=(path, results))
+        reader.start()
+        whole_time, whole_bytes, whole_peak = results.get()
+        reader.join()
+
+        print(f"  overview on screen: {overview:.0f} ms, sharp at fit: {fitted:.0f} ms")
+        print(f"  zoom to 100%: {zoom_step:.0f} ms for the step, sharp after {zoomed:.0f} ms")
+        print(f"  {args.pans} pans of {PAN_STEP} px at 100%: step p50 {steps[len(steps) // 2]:.1f} ms, "
+              f"max {steps[-1]:.1f} ms; sharp p50 {settles[len(settles) // 2]:.0f} ms, max {settles[-1]:.0f} ms")
+        print(f"  gallery peak memory: {gallery_peak:.0f} MB ({gallery_peak - baseline:.0f} MB over the bare app), "
+              f"tiles cached: {tiles_mb:.0f} MB")
+        print(f"  whole decode for comparison: {whole_time:.2f} s, {whole_bytes / (1024 * 1024):.0f} MB image, "
+              f"peak memory {whole_peak:.0f} MB")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
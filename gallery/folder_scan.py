@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal
+from PyQt5.QtGui import QImageReader
+
+SCAN_BATCH = 1000 # Images found before a batch is handed to the GUI at the latest
+SCAN_FLUSH_S = 0.1 # ... or seconds since the last batch, whichever comes first
+RESCAN_DELAY_MS = 200 # Quiet time after a folder changes before it is listed again
+
+
+def image_format(path):
+    """The image format of a file judged by its first bytes, or None for anything else."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith((b'II*\0', b'MM\0*')):
+        return 'tiff'
+    return None
+
+
+def folder_entries(folder, formats, known=frozenset()):
+    """Yields (path, is_folder) for the images and subfolders directly in folder.
+
+    Files in known are taken to be images without reading them again.
+    Symbolic links to folders are left out, so a recursive walk cannot
+    loop. Raises OSError if the folder cannot be read.
+    """
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    yield entry.path, True
+                elif entry.is_file() and (entry.path in known or image_format(entry.path) in formats):
+                    yield entry.path, False
+            except OSError:
+                pass # Vanished or unreadable while listing
+
+
+class ScanSignals(QObject):
+    batch_found = pyqtSignal(int, list, list) # generation, image paths, folder paths
+    scan_done = pyqtSignal(int)
+    folder_listed = pyqtSignal(int, str, object, list) # generation, folder, image paths (None if gone), subfolders
+
+
+class ScanTask(QRunnable):
+    """Walks a folder (and its subfolders if recursive) and reports what it finds in batches.
+
+    The first image found goes out on its own, so the gallery can show it
+    while the rest of a big folder is still being read.
+    """
+
+    def __init__(self, folder, recursive, formats, generation, cancelled, signals):
+        super().__init__()
+        self.folder = folder
+        self.recursive = recursive
+        self.formats = formats
+        self.generation = generation
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        images, folders = [], [self.folder]
+        found_any = False
+        last_flush = time.monotonic()
+        pending = [self.folder]
+        while pending and not self.cancelled.is_set():
+            folder = pending.pop()
+            try:
+                for path, is_folder in folder_entries(folder, self.formats):
+                    if self.cancelled.is_set():
+                        return
+                    if is_folder:
+                        if self.recursive:
+                            pending.append(path)
+                            folders.append(path)
+                        continue
+                    images.append(path)
+                    if not found_any or len(images) >= SCAN_BATCH or time.monotonic() - last_flush >= SCAN_FLUSH_S:
+                        found_any = True
+                        self.signals.batch_found.emit(self.generation, images, folders)
+                        images, folders = [], []
+                        last_flush = time.monotonic()
+            except OSError:
+                pass # Unreadable folder: skip it like the files it would hold
+        if not self.cancelled.is_set():
+            if images or folders:
+                self.signals.batch_found.emit(self.generation, images, folders)
+            self.signals.scan_done.emit(self.generation)
+
+
+class ListTask(QRunnable):
+    """Lists one folder again after the watcher saw it change."""
+
+    def __init__(self, folder, formats, known, generation, cancelled, signals):
+        super().__init__()
+        self.folder = folder
+        self.formats = formats
+        self.known = known
+        self.generation = generation
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        images, folders = [], []
+        try:
+            for path, is_folder in folder_entries(self.folder, self.formats, self.known):
+                (folders if is_folder else images).append(path)
+        except OSError:
+            images, folders = None, []
+        self.signals.folder_listed.emit(self.generation, self.folder, images, folders)
+
+
+class FolderScanner(QObject):
+    """Finds the images of a folder on a worker thread and keeps following it.
+
+    scan() reports images through images_added in batches as they are
+    found, unsorted. Files are recognised by their first bytes, not by
+    their name. Every
+    folder scanned is watched, and a folder that changes is listed again
+    after RESCAN_DELAY_MS and compared with what was found before, giving
+    images_added and images_removed for the difference (and a scan of any
+    new subfolder in recursive mode). Results of an earlier scan() that
+    arrive late are dropped by their generation number.
+    """
+
+    images_added = pyqtSignal(list)
+    images_removed = pyqtSignal(list)
+    scan_finished = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.formats = {bytes(name).decode() for name in QImageReader.supportedImageFormats()}
+        self.folder = None
+        self.recursive = False
+        self.folder_images = {} # folder -> set of image paths directly in it
+        self.generation = 0
+        self.cancelled = threading.Event()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2) # One walk, plus listings of changed folders
+        self.signals = ScanSignals()
+        self.signals.batch_found.connect(self._on_batch_found)
+        self.signals.scan_done.connect(self._on_scan_done)
+        self.signals.folder_listed.connect(self._on_folder_listed)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+        self.changed_folders = set()
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(RESCAN_DELAY_MS)
+        self.rescan_timer.timeout.connect(self._rescan_changed)
+
+    def scan(self, folder, recursive=False):
+        self.cancel()
+        self.folder = folder
+        self.recursive = recursive
+        self.pool.start(ScanTask(folder, recursive, self.formats, self.generation, self.cancelled, self.signals))
+
+    def cancel(self):
+        """Stop the current scan and stop watching its folders."""
+        self.cancelled.set()
+        self.pool.clear()
+        self.cancelled = threading.Event() # Tasks already running keep the one that is set
+        self.generation += 1
+        self.folder_images.clear()
+        self.changed_folders.clear()
+        self.rescan_timer.stop()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+
+    def stop(self):
+        self.cancel()
+        self.pool.waitForDone()
+
+    def _add_folders(self, folders):
+        new = [folder for folder in folders if folder not in self.folder_images]
+        for folder in new:
+            self.folder_images[folder] = set()
+        if new:
+            self.watcher.addPaths(new)
+
+    def _on_batch_found(self, generation, images, folders):
+        if generation != self.generation:
+            return
+        self._add_folders(folders)
+        added = []
+        for path in images:
+            known = self.folder_images.setdefault(os.path.dirname(path), set())
+            if path not in known: # A listing after a change may have found it first
+                known.add(path)
+                added.append(path)
+        if added:
+            self.images_added.emit(added)
+
+    def _on_scan_done(self, generation):
+        if generation == self.generation:
+            self.scan_finished.emit()
+
+    def _on_directory_changed(self, folder):
+        self.changed_folders.add(folder)
+        self.rescan_timer.start()
+
+    def _rescan_changed(self):
+        for folder in self.changed_folders:
+            known = frozenset(self.folder_images.get(folder, ())) # Only new files need their first bytes read
+            self.pool.start(ListTask(folder, self.formats, known, self.generation, self.cancelled, self.signals))
+        self.changed_folders.clear()
+
+    def _on_folder_listed(self, generation, folder, images, folders):
+        if generation != self.generation or folder not in self.folder_images:
+            return
+        if images is None: # The folder itself is gone
+            self._forget_folder(folder)
+            return
+        known = self.folder_images[folder]
+        images = set(images)
+        removed = [path for path in known if path not in images]
+        added = [path for path in images if path not in known]
+        known.difference_update(removed)
+        known.update(added)
+        if self.recursive:
+            present = set(folders)
+            prefix = folder + os.sep
+            for subfolder in [f for f in self.folder_images if f.startswith(prefix) and os.sep not in f[len(prefix):]]:
+                if subfolder not in present:
+                    self._forget_folder(subfolder)
+            for subfolder in folders:
+                if subfolder not in self.folder_images:
+                    self._add_folders([subfolder]) # Before its scan reports, so it is not scanned twice
+                    self.pool.start(ScanTask(subfolder, True, self.formats, self.generation,
+                                             self.cancelled, self.signals))
+        if removed:
+            self.images_removed.emit(removed)
+        if added:
+            self.images_added.emit(added)
+
+    def _forget_folder(self, folder):
+        """Drop a folder that is gone, with everything found in and under it."""
+        prefix = folder + os.sep
+        gone = [f for f in self.folder_images if f == folder or f.startswith(prefix)]
+        removed = []
+        for f in gone:
+            removed.extend(self.folder_images.pop(f))
+        watched = set(self.watcher.directories())
+        gone_watched = [f for f in gone if f in watched]
+        if gone_watched:
+            self.watcher.removePaths(gone_watched)
+        if removed:
+            self.images_removed.emit(removed)
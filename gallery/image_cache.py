@@ -0,0 +1,190 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QTransform
+
+IMAGE_CACHE_MB = 1024 # Memory budget for decoded full-size images
+PREFETCH_DISTANCE = 2 # Images decoded ahead on each side of the current one
+RENDITION_CACHE_MB = 64 # Memory budget for images already scaled and rotated for display
+LARGE_IMAGE_PIXELS = 100 * 1000 * 1000 # Larger images are never decoded whole; the gallery shows them tiled
+
+
+class ImageCache:
+    """Images by key, least recently used first out, bounded in bytes.
+
+    Keys are paths for decoded images and (path, angle, width, height) for
+    renditions made by render_image(). An image larger than the whole
+    budget is not kept at all. `hits`, `misses` and `evictions` count what
+    happened since the cache was made.
+    """
+
+    def __init__(self, budget_mb=None):
+        self.budget = (IMAGE_CACHE_MB if budget_mb is None else budget_mb) * 1024 * 1024
+        self.images = OrderedDict() # path -> QImage
+        self.size = 0 # Bytes of all cached images
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, path):
+        return path in self.images
+
+    def peek(self, path):
+        """Like get(), but neither counted nor marked as recently used."""
+        return self.images.get(path)
+
+    def get(self, path):
+        image = self.images.get(path)
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.images.move_to_end(path)
+        return image
+
+    def put(self, path, image):
+        size = image.sizeInBytes()
+        if size > self.budget:
+            return
+        if path in self.images:
+            self.size -= self.images.pop(path).sizeInBytes()
+        while self.images and self.size + size > self.budget:
+            self.size -= self.images.popitem(last=False)[1].sizeInBytes()
+            self.evictions += 1
+        self.images[path] = image
+        self.size += size
+
+    def clear(self):
+        self.images.clear()
+        self.size = 0
+
+    def stats(self):
+        return (f"Cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                f"{self.size / (1024 * 1024):.0f}/{self.budget / (1024 * 1024):.0f} MB")
+
+
+def render_image(image, angle, size, transformation=Qt.SmoothTransformation):
+    """image rotated by angle (a multiple of 90) and scaled to fit size.
+
+    The image is scaled first and rotated afterwards, so the rotation only
+    moves the pixels that are shown; a quarter turn just swaps the box the
+    image is scaled into.
+    """
+    box = QSize(size.height(), size.width()) if angle % 180 else size
+    scaled = image.scaled(box, Qt.KeepAspectRatio, transformation)
+    if angle % 360:
+        scaled = scaled.transformed(QTransform().rotate(angle))
+    return scaled
+
+
+class DecodeSignals(QObject):
+    decode_done = pyqtSignal(str, QImage, bool) # path, image (null if unreadable), False if skipped
+
+
+class DecodeTask(QRunnable):
+    """Decodes one full-size image, unless the loader stopped wanting it while queued.
+
+    Images over LARGE_IMAGE_PIXELS come back null, like unreadable ones.
+    """
+
+    def __init__(self, path, loader, signals):
+        super().__init__()
+        self.path = path
+        self.loader = loader
+        self.signals = signals
+
+    def run(self):
+        if self.path not in self.loader.wanted: # The user moved on before this started
+            self.signals.decode_done.emit(self.path, QImage(), False)
+            return
+        reader = QImageReader(self.path)
+        size = reader.size()
+        if size.isValid() and size.width() * size.height() > LARGE_IMAGE_PIXELS:
+            self.signals.decode_done.emit(self.path, QImage(), True)
+            return
+        self.signals.decode_done.emit(self.path, reader.read(), True)
+
+
+class ImageLoader(QObject):
+    """Full-size images for the gallery, from an ImageCache or decoded on worker threads.
+
+    image() never blocks: on a miss it queues the decode at the highest
+    priority and returns None, and image_ready is emitted once the image is
+    in the cache. prefetch() queues the neighbours of the current image,
+    nearest (and next before previous) first, as far as PREFETCH_DISTANCE
+    and the cache budget allow. Queued decodes of images that are no longer
+    wanted are skipped when they come up.
+    """
+
+    image_ready = pyqtSignal(str)
+
+    def __init__(self, budget_mb=None, prefetch_distance=None, parent=None):
+        super().__init__(parent)
+        self.cache = ImageCache(budget_mb)
+        self.prefetch_distance = PREFETCH_DISTANCE if prefetch_distance is None else prefetch_distance
+        self.pending = set()
+        self.failed = set()
+        self.wanted = frozenset() # Read by worker threads; replaced, never changed in place
+        self.priority = 0
+        self.pool = QThreadPool(self)
+        self.signals = DecodeSignals()
+        self.signals.decode_done.connect(self._on_decode_done)
+
+    def image(self, path):
+        """The decoded image, a null QImage if it cannot be read, or None while it decodes."""
+        image = self.cache.get(path)
+        if image is not None:
+            return image
+        if path in self.failed:
+            return QImage()
+        self.wanted = self.wanted | {path}
+        self.priority += 100
+        self._request(path, self.priority + 99)
+        return None
+
+    def prefetch(self, paths, index):
+        if not paths:
+            return
+        current = self.cache.images.get(paths[index])
+        distance = self.prefetch_distance
+        if current is not None and current.sizeInBytes():
+            # Keep the current image and its neighbours within the budget together
+            distance = min(distance, (self.cache.budget // current.sizeInBytes() - 1) // 2)
+        neighbours = []
+        for step in range(1, distance + 1):
+            for offset in (step, -step):
+                path = paths[(index + offset) % len(paths)]
+                if path not in neighbours and path != paths[index]:
+                    neighbours.append(path)
+        self.wanted = frozenset(neighbours) | {paths[index]}
+        self.priority += 100
+        for rank, path in enumerate(neighbours):
+            if path not in self.cache:
+                self._request(path, self.priority + 50 - rank)
+
+    def _request(self, path, priority):
+        if path in self.pending or path in self.failed:
+            return
+        self.pending.add(path)
+        self.pool.start(DecodeTask(path, self, self.signals), priority)
+
+    def clear(self):
+        """Forget everything, e.g. when another folder is opened."""
+        self.wanted = frozenset()
+        self.cache.clear()
+        self.failed.clear()
+
+    def stop(self):
+        self.wanted = frozenset()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _on_decode_done(self, path, image, decoded):
+        self.pending.discard(path)
+        if not decoded:
+            return
+        if image.isNull():
+            self.failed.add(path)
+        else:
+            self.cache.put(path, image)
+        self.image_ready.emit(path)
@@ -1,8 +1,15 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QAction, QFileDialog
-from PyQt5.QtGui import QPixmap, QTransform
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QAction, QFileDialog, QListView, QAbstractItemView, QStackedWidget
+from PyQt5.QtGui import QPixmap, QImageReader
+from PyQt5.QtCore import Qt, QSize, QTimer, QItemSelection, QItemSelectionModel
 import os
+from thumbnails import ThumbnailLoader, ThumbnailModel
+from image_cache import ImageCache, ImageLoader, render_image, RENDITION_CACHE_MB, LARGE_IMAGE_PIXELS
+from folder_scan import FolderScanner
+from metadata_index import MetadataIndex
+from tiled_viewer import TiledImageView
+
+RESIZE_SETTLE_MS = 150 # Quiet time after the last resize event before the smooth redraw
 
 class ImageGalleryApp(QMainWindow):
     def __init__(self):
@@ -10,9 +17,24 @@ class ImageGalleryApp(QMainWindow):
         self.setWindowTitle("Image Gallery")
         self.setGeometry(100, 100, 800, 600)
 
-        self.image_files = []
         self.current_image_index = -1
-        self.rotation_angle = 0 # Initialize rotation angle
+        self.rotation_angle = 0 # Turn on top of the EXIF orientation, set with the Rotate button
+        self.thumbnail_loader = ThumbnailLoader(parent=self)
+        self.thumbnail_model = ThumbnailModel(self.thumbnail_loader, self)
+        self.image_files = self.thumbnail_model.image_files # Sorted, kept up to date by the model
+        self.folder_scanner = FolderScanner(self) # Finds images in the background and watches the folder
+        self.folder_scanner.images_added.connect(self.on_images_added)
+        self.folder_scanner.images_removed.connect(self.on_images_removed)
+        self.folder_scanner.scan_finished.connect(self.on_scan_finished)
+        self.image_loader = ImageLoader(parent=self) # Decoded images, with the neighbours prefetched
+        self.image_loader.image_ready.connect(self.on_image_ready)
+        self.metadata_index = MetadataIndex(parent=self) # Dimensions, capture time, orientation, perceptual hash
+        self.metadata_index.info_ready.connect(self.on_info_ready)
+        self.renditions = ImageCache(RENDITION_CACHE_MB) # Scaled and rotated images, by (path, angle, width, height)
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_SETTLE_MS)
+        self.resize_timer.timeout.connect(self.display_image)
 
         self.init_ui()
 
@@ -35,7 +57,13 @@ class ImageGalleryApp(QMainWindow):
         # Image Display
         self.image_label = QLabel("No Image Loaded")
         self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_nav_layout.addWidget(self.image_label, 1) # Stretch factor for image label
+        self.image_label.setMinimumSize(1, 1) # Otherwise the shown pixmap keeps the window from shrinking
+        self.tiled_view = TiledImageView() # Images over LARGE_IMAGE_PIXELS, with zoom and pan
+        self.tiled_view.failed.connect(self.statusBar().showMessage)
+        self.image_stack = QStackedWidget()
+        self.image_stack.addWidget(self.image_label)
+        self.image_stack.addWidget(self.tiled_view)
+        self.image_nav_layout.addWidget(self.image_stack, 1) # Stretch factor for image display
 
         self.next_button = QPushButton(">")
         self.next_button.clicked.connect(self.show_next_image)
@@ -50,8 +78,25 @@ class ImageGalleryApp(QMainWindow):
         self.rotate_button_layout.addWidget(self.rotate_button)
         self.rotate_button_layout.addStretch(1) # Add stretch to center the button
 
+        # Thumbnail Strip
+        thumbnail_size = self.thumbnail_loader.size
+        self.thumbnail_view = QListView()
+        self.thumbnail_view.setViewMode(QListView.IconMode)
+        self.thumbnail_view.setFlow(QListView.LeftToRight)
+        self.thumbnail_view.setWrapping(False)
+        self.thumbnail_view.setMovement(QListView.Static)
+        self.thumbnail_view.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.thumbnail_view.setGridSize(QSize(thumbnail_size + 16, thumbnail_size + 32))
+        self.thumbnail_view.setUniformItemSizes(True) # Lays out 20k items without asking each for its size
+        self.thumbnail_view.setLayoutMode(QListView.Batched)
+        self.thumbnail_view.setFixedHeight(thumbnail_size + 56)
+        self.thumbnail_view.setSelectionMode(QAbstractItemView.ExtendedSelection) # Similar images are selected together
+        self.thumbnail_view.setModel(self.thumbnail_model)
+        self.thumbnail_view.clicked.connect(self.on_thumbnail_clicked)
+
         # Add sub-layouts to main layout
         self.main_layout.addLayout(self.image_nav_layout)
+        self.main_layout.addWidget(self.thumbnail_view)
         self.main_layout.addLayout(self.rotate_button_layout)
 
         self.central_widget.setLayout(self.main_layout)
@@ -67,53 +112,192 @@ class ImageGalleryApp(QMainWindow):
         open_folder_action.triggered.connect(self.open_folder)
         file_menu.addAction(open_folder_action)
 
+        self.recursive_action = QAction("Include Subfolders", self)
+        self.recursive_action.setCheckable(True)
+        file_menu.addAction(self.recursive_action)
+
+        view_menu = menubar.addMenu("View")
+
+        self.sort_by_date_action = QAction("Sort by Date Taken", self)
+        self.sort_by_date_action.setCheckable(True)
+        self.sort_by_date_action.toggled.connect(self.on_sort_by_date)
+        view_menu.addAction(self.sort_by_date_action)
+
+        similar_action = QAction("Select Similar Images", self)
+        similar_action.setShortcut("Ctrl+D")
+        similar_action.triggered.connect(self.select_similar_images)
+        view_menu.addAction(similar_action)
+
     def open_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Image Folder")
         if folder_path:
-            self.image_files = []
-            valid_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
-            for file_name in os.listdir(folder_path):
-                if file_name.lower().endswith(valid_extensions):
-                    self.image_files.append(os.path.join(folder_path, file_name))
-            
-            self.image_files.sort() # Sort files for consistent order
-
-            if self.image_files:
-                self.current_image_index = 0
-                self.rotation_angle = 0 # Reset rotation when opening new folder
-                self.display_image()
-            else:
-                self.image_label.setText("No images found in selected folder.")
+            # Images arrive through on_images_added while the folder is scanned
+            self.thumbnail_model.set_image_files([])
+            self.image_loader.clear()
+            self.renditions.clear()
+            self.current_image_index = -1
+            self.rotation_angle = 0 # Back to the EXIF orientation when opening new folder
+            self.image_label.setText("Scanning folder...")
+            self.metadata_index.open(folder_path)
+            self.folder_scanner.scan(folder_path, self.recursive_action.isChecked())
+
+    def current_path(self):
+        if 0 <= self.current_image_index < len(self.image_files):
+            return self.image_files[self.current_image_index]
+        return None
+
+    def on_images_added(self, paths):
+        current_path = self.current_path()
+        self.thumbnail_model.insert_image_files(paths)
+        self.metadata_index.add(paths)
+        if current_path is None:
+            self.current_image_index = 0 # The first image found is shown right away
+            self.display_image()
+        else:
+            self.current_image_index = self.thumbnail_model.row_of(current_path)
+
+    def on_images_removed(self, paths):
+        current_path = self.current_path()
+        replacement = current_path
+        removed = set(paths)
+        if current_path in removed:
+            # The shown image is going: the next one left takes its place, else the previous one
+            index = self.current_image_index
+            following = (path for path in self.image_files[index + 1:] if path not in removed)
+            preceding = (path for path in reversed(self.image_files[:index]) if path not in removed)
+            replacement = next(following, None) or next(preceding, None)
+        self.thumbnail_model.remove_image_files(paths)
+        self.metadata_index.remove(paths)
+        if replacement is None:
+            if current_path is not None:
                 self.current_image_index = -1
+                self.image_label.setText("No images found in selected folder.")
+            return
+        self.current_image_index = self.thumbnail_model.row_of(replacement)
+        if replacement != current_path:
+            self.rotation_angle = 0
+            self.display_image()
 
-    def display_image(self):
+    def on_info_ready(self, infos):
+        current_path = self.current_path()
+        if self.sort_by_date_action.isChecked():
+            self.thumbnail_model.resort([info.path for info in infos]) # Their capture times are known now
+            if current_path is not None:
+                self.current_image_index = self.thumbnail_model.row_of(current_path)
+        if any(info.path == current_path and info.orientation != 1 for info in infos):
+            self.display_image() # Turn it upright
+
+    def on_sort_by_date(self, checked):
+        current_path = self.current_path()
+        self.thumbnail_model.set_sort_key(self.metadata_index.date_key if checked else None)
+        if current_path is not None:
+            self.current_image_index = self.thumbnail_model.row_of(current_path)
+            self.display_image()
+
+    def select_similar_images(self):
+        current_path = self.current_path()
+        if current_path is None:
+            return
+        similar = self.metadata_index.similar(current_path)
+        selection = QItemSelection()
+        for path in [current_path] + similar:
+            row = self.thumbnail_model.row_of(path)
+            if row is not None:
+                selection.select(self.thumbnail_model.index(row), self.thumbnail_model.index(row))
+        self.thumbnail_view.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+        self.statusBar().showMessage(f"{len(similar)} similar images selected"
+                                     if similar else "No similar images found among the indexed ones")
+
+    def on_scan_finished(self):
+        if not self.image_files:
+            self.image_label.setText("No images found in selected folder.")
+
+    def display_image(self, fast=False):
+        # fast: redraw for a resize in progress, without the smooth scaling and bookkeeping
         if 0 <= self.current_image_index < len(self.image_files):
             image_path = self.image_files[self.current_image_index]
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                # Apply rotation
-                transform = QTransform().rotate(self.rotation_angle)
-                rotated_pixmap = pixmap.transformed(transform, Qt.SmoothTransformation)
-
-                # Scale pixmap to fit label while maintaining aspect ratio
-                scaled_pixmap = rotated_pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.image_label.setPixmap(scaled_pixmap)
+            if fast:
+                if self.image_stack.currentWidget() is self.tiled_view:
+                    return # It follows resizes by itself
+                image = self.image_loader.cache.peek(image_path)
+            else:
+                index = self.thumbnail_model.index(self.current_image_index)
+                if self.thumbnail_view.currentIndex() != index:
+                    self.thumbnail_view.setCurrentIndex(index)
+                    self.thumbnail_view.scrollTo(index)
+                size = self.image_size(image_path)
+                if size.width() * size.height() > LARGE_IMAGE_PIXELS:
+                    self.image_stack.setCurrentWidget(self.tiled_view)
+                    self.tiled_view.show_image(image_path, size, self.display_angle(image_path))
+                    self.image_loader.prefetch(self.image_files, self.current_image_index)
+                    self.statusBar().showMessage(f"{size.width()}x{size.height()}: scroll to zoom, drag to pan, "
+                                                 f"double-click for 100%")
+                    return
+                self.image_stack.setCurrentWidget(self.image_label)
+                self.tiled_view.clear() # Its tiles are of no use to other images
+                image = self.image_loader.image(image_path)
+                self.image_loader.prefetch(self.image_files, self.current_image_index)
+                self.statusBar().showMessage(self.image_loader.cache.stats())
+            if image is None:
+                # Still decoding: show the thumbnail scaled up until on_image_ready
+                thumbnail = self.thumbnail_model.pixmaps.get(image_path)
+                if thumbnail is not None:
+                    # Thumbnails are decoded upright already, so only the user's turn applies
+                    self.image_label.setPixmap(QPixmap.fromImage(render_image(
+                        thumbnail.toImage(), self.rotation_angle, self.image_label.size(), Qt.FastTransformation)))
+                elif not fast:
+                    self.image_label.setText(f"Loading {os.path.basename(image_path)}...")
+            elif not image.isNull():
+                self.image_label.setPixmap(QPixmap.fromImage(self.rendition(image_path, image, fast)))
                 self.image_label.setText("") # Clear "No Image Loaded" text
             else:
                 self.image_label.setText(f"Could not load image: {os.path.basename(image_path)}")
         else:
             self.image_label.setText("No Image Loaded")
 
+    def image_size(self, path):
+        # From the index when it has it, otherwise from the file header
+        info = self.metadata_index.info.get(path)
+        if info is not None and info.width:
+            return QSize(info.width, info.height)
+        return QImageReader(path).size()
+
+    def display_angle(self, path):
+        return (self.metadata_index.orientation_angle(path) + self.rotation_angle) % 360
+
+    def rendition(self, path, image, fast=False):
+        # Smooth renditions are cached, so rotating back or returning to a window size is free
+        size = self.image_label.size()
+        angle = self.display_angle(path)
+        key = (path, angle, size.width(), size.height())
+        rendered = self.renditions.get(key)
+        if rendered is None:
+            if fast:
+                return render_image(image, angle, size, Qt.FastTransformation)
+            rendered = render_image(image, angle, size)
+            self.renditions.put(key, rendered)
+        return rendered
+
+    def on_image_ready(self, path):
+        if 0 <= self.current_image_index < len(self.image_files) and self.image_files[self.current_image_index] == path:
+            self.display_image()
+
+    def on_thumbnail_clicked(self, index):
+        if index.row() != self.current_image_index:
+            self.current_image_index = index.row()
+            self.rotation_angle = 0 # Back to the EXIF orientation when changing image
+            self.display_image()
+
     def show_previous_image(self):
         if self.image_files:
             self.current_image_index = (self.current_image_index - 1) % len(self.image_files)
-            self.rotation_angle = 0 # Reset rotation when changing image
+            self.rotation_angle = 0 # Back to the EXIF orientation when changing image
             self.display_image()
 
     def show_next_image(self):
         if self.image_files:
             self.current_image_index = (self.current_image_index + 1) % len(self.image_files)
-            self.rotation_angle = 0 # Reset rotation when changing image
+            self.rotation_angle = 0 # Back to the EXIF orientation when changing image
             self.display_image()
 
     def rotate_image(self):
@@ -121,10 +305,20 @@ class ImageGalleryApp(QMainWindow):
         self.display_image()
 
     def resizeEvent(self, event):
-        # Recalculate and display image when window is resized
-        self.display_image()
+        # Redraw cheaply on every resize event, and smoothly once resizing has stopped
+        self.display_image(fast=True)
+        self.resize_timer.start()
         super().resizeEvent(event)
 
+    def closeEvent(self, event):
+        self.resize_timer.stop()
+        self.folder_scanner.stop()
+        self.metadata_index.stop()
+        self.tiled_view.stop()
+        self.thumbnail_loader.stop()
+        self.image_loader.stop()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     gallery_app = ImageGalleryApp()
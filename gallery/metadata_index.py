@@ -0,0 +1,327 @@
+import multiprocessing
+import os
+import queue
+import sqlite3
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from hashlib import blake2b
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+INDEX_DIR = os.path.join(os.path.expanduser('~'), '.gallery_index')
+INDEX_WORKERS = os.cpu_count() or 1 # Processes reading image files for the index; 0 reads them in the indexing thread
+INDEX_BATCH = 200 # Files indexed between database commits and reports to the GUI
+EXIF_READ_BYTES = 128 * 1024 # The EXIF block sits at the start of a JPEG
+SIMILAR_DISTANCE = 6 # Differing perceptual hash bits up to which two images count as near-duplicates
+
+ORIENTATION_ANGLES = {3: 180, 4: 180, 5: 90, 6: 90, 7: 270, 8: 270} # EXIF orientation -> clockwise turn; mirroring is ignored
+
+# One image as indexed; width and height are 0 and phash None if the file could not be decoded
+ImageInfo = namedtuple('ImageInfo', 'path mtime_ns size width height taken orientation phash')
+
+
+def _read_ifd(data, order, offset):
+    """Tags of one TIFF directory that hold a short, long or text value."""
+    tags = {}
+    count, = struct.unpack_from(order + 'H', data, offset)
+    for i in range(count):
+        tag, kind, length = struct.unpack_from(order + 'HHI', data, offset + 2 + i * 12)
+        value_at = offset + 2 + i * 12 + 8
+        if kind == 3 and length == 1: # SHORT
+            tags[tag], = struct.unpack_from(order + 'H', data, value_at)
+        elif kind == 4 and length == 1: # LONG
+            tags[tag], = struct.unpack_from(order + 'I', data, value_at)
+        elif kind == 2: # ASCII, inline up to 4 bytes
+            if length > 4:
+                value_at, = struct.unpack_from(order + 'I', data, value_at)
+            tags[tag] = data[value_at:value_at + length].split(b'\0', 1)[0].decode('ascii', 'replace')
+    return tags
+
+
+def read_exif(path):
+    """(capture time as 'YYYY-MM-DD HH:MM:SS' or None, EXIF orientation 1-8) of a JPEG file.
+
+    Other files, and JPEGs without a readable EXIF block, give (None, 1).
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(EXIF_READ_BYTES)
+    except OSError:
+        return None, 1
+    if not head.startswith(b'\xff\xd8'):
+        return None, 1
+    pos = 2
+    tiff = None
+    while pos + 4 <= len(head) and head[pos] == 0xFF:
+        marker = head[pos + 1]
+        if marker == 0xDA: # Start of the compressed data: no EXIF block ahead
+            break
+        length, = struct.unpack_from('>H', head, pos + 2)
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b'Exif\0\0':
+            tiff = head[pos + 10:pos + 2 + length]
+            break
+        pos += 2 + length
+    if tiff is None or tiff[:2] not in (b'II', b'MM'):
+        return None, 1
+    order = '<' if tiff[:2] == b'II' else '>'
+    try:
+        tags = _read_ifd(tiff, order, struct.unpack_from(order + 'I', tiff, 4)[0])
+        taken = None
+        if 0x8769 in tags: # Exif sub-directory, where DateTimeOriginal lives
+            taken = _read_ifd(tiff, order, tags[0x8769]).get(0x9003)
+    except struct.error:
+        return None, 1
+    taken = taken or tags.get(0x0132) # DateTime, when the original time is missing
+    try:
+        taken = datetime.strptime(taken, '%Y:%m:%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S') if taken else None
+    except ValueError:
+        taken = None
+    orientation = tags.get(0x0112, 1)
+    return taken, orientation if 1 <= orientation <= 8 else 1
+
+
+def perceptual_hash(image):
+    """64-bit difference hash of an image already scaled to 9x8: one bit per brighter-to-the-right pair."""
+    gray = image.convertToFormat(QImage.Format_Grayscale8)
+    bits = gray.constBits()
+    bits.setsize(gray.sizeInBytes())
+    pixels = bytes(bits)
+    line = gray.bytesPerLine()
+    value = 0
+    for y in range(8):
+        row = pixels[y * line:y * line + 9]
+        for x in range(8):
+            value = value << 1 | (row[x] < row[x + 1])
+    return value
+
+
+def read_metadata(path):
+    """ImageInfo of one file; runs in the worker processes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    taken, orientation = read_exif(path)
+    reader = QImageReader(path)
+    size = reader.size()
+    reader.setScaledSize(QSize(9, 8)) # JPEGs decode at 1/8 scale, the rest is a small smooth scale
+    image = reader.read()
+    phash = None if image.isNull() else perceptual_hash(image)
+    width, height = (size.width(), size.height()) if size.isValid() else (0, 0)
+    return ImageInfo(path, stat.st_mtime_ns, stat.st_size, width, height, taken, orientation, phash)
+
+
+def index_path(folder):
+    key = blake2b(os.path.abspath(folder).encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+    return os.path.join(INDEX_DIR, key + '.sqlite')
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return None if value is None else value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return None if value is None else value + (1 << 64) if value < 0 else value
+
+
+class IndexSignals(QObject):
+    indexed = pyqtSignal(int, list) # generation, ImageInfo records
+    idle = pyqtSignal(int, int, int) # generation, files read this session, files answered from the index
+
+
+class IndexTask(QRunnable):
+    """Keeps one folder's index up to date; runs for as long as the folder is open.
+
+    Paths come in through a queue. A file whose size and mtime match its
+    row is answered from the database; the others are read by a process
+    pool, written back and answered in batches of INDEX_BATCH.
+    """
+
+    def __init__(self, db_path, workers, generation, requests, cancelled, signals):
+        super().__init__()
+        self.db_path = db_path
+        self.workers = workers
+        self.generation = generation
+        self.requests = requests
+        self.cancelled = cancelled
+        self.signals = signals
+        self.executor = None
+
+    def run(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        db = sqlite3.connect(self.db_path)
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                       "width INTEGER, height INTEGER, taken TEXT, orientation INTEGER, phash INTEGER)")
+            known = {row[0]: ImageInfo(*row[:7], _to_unsigned(row[7]))
+                     for row in db.execute("SELECT path, mtime_ns, size, width, height, taken, orientation, phash "
+                                           "FROM images")}
+            read = answered = 0
+            while not self.cancelled.is_set():
+                try:
+                    action, paths = self.requests.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if action == 'stop':
+                    break
+                if action == 'remove':
+                    db.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in paths])
+                    db.commit()
+                    for path in paths:
+                        known.pop(path, None)
+                    continue
+                fresh, stale = [], []
+                for path in paths:
+                    info = known.get(path)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if info is not None and info.mtime_ns == stat.st_mtime_ns and info.size == stat.st_size:
+                        fresh.append(info)
+                    else:
+                        stale.append(path)
+                if fresh:
+                    self.signals.indexed.emit(self.generation, fresh)
+                    answered += len(fresh)
+                read += self._index(db, known, stale)
+                if self.requests.empty():
+                    self.signals.idle.emit(self.generation, read, answered)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+            db.close()
+
+    def _index(self, db, known, paths):
+        if not paths:
+            return 0
+        if self.workers and self.executor is None: # Started on the first file that needs reading
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        batch = []
+        done = read = 0
+        try:
+            results = self.executor.map(read_metadata, paths, chunksize=16) if self.workers else map(read_metadata, paths)
+            for info in results:
+                read += 1
+                if self.cancelled.is_set():
+                    break
+                if info is not None:
+                    batch.append(info)
+                if len(batch) >= INDEX_BATCH:
+                    done += self._store(db, known, batch)
+                    batch = []
+        except BrokenProcessPool:
+            # A worker died or processes cannot be started here: carry on in this thread
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.workers = 0
+            done += self._store(db, known, batch)
+            return done + self._index(db, known, paths[read:])
+        return done + self._store(db, known, batch)
+
+    def _store(self, db, known, batch):
+        if not batch:
+            return 0
+        db.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       [info[:7] + (_to_signed(info.phash),) for info in batch])
+        db.commit()
+        for info in batch:
+            known[info.path] = info
+        self.signals.indexed.emit(self.generation, batch)
+        return len(batch)
+
+
+class MetadataIndex(QObject):
+    """Dimensions, capture time, orientation and perceptual hash of the open folder's images.
+
+    The index of each folder is a SQLite file in INDEX_DIR, named after the
+    folder, so opening a folder again only reads the files that changed
+    since. add() queues paths; their ImageInfo lands in `info` and is
+    announced by info_ready as batches come back. Results of a folder
+    opened earlier are dropped by their generation number.
+    """
+
+    info_ready = pyqtSignal(list) # ImageInfo records just added to `info`
+    idle = pyqtSignal(int, int) # files read, files answered from the index, since open()
+
+    def __init__(self, workers=None, parent=None):
+        super().__init__(parent)
+        self.workers = INDEX_WORKERS if workers is None else workers
+        self.info = {} # path -> ImageInfo
+        self.generation = 0
+        self.requests = None
+        self.cancelled = threading.Event()
+        self.pool = QThreadPool(self)
+        self.signals = IndexSignals()
+        self.signals.indexed.connect(self._on_indexed)
+        self.signals.idle.connect(self._on_idle)
+
+    def open(self, folder):
+        self.close()
+        self.requests = queue.Queue()
+        self.pool.start(IndexTask(index_path(folder), self.workers, self.generation,
+                                  self.requests, self.cancelled, self.signals))
+
+    def add(self, paths):
+        if self.requests is not None:
+            self.requests.put(('add', list(paths)))
+
+    def remove(self, paths):
+        for path in paths:
+            self.info.pop(path, None)
+        if self.requests is not None:
+            self.requests.put(('remove', list(paths)))
+
+    def close(self):
+        """Stop indexing the open folder; what was indexed so far is kept on disk."""
+        if self.requests is not None:
+            self.requests.put(('stop', None))
+            self.requests = None
+        self.cancelled.set()
+        self.cancelled = threading.Event() # The running task keeps the one that is set
+        self.generation += 1
+        self.info.clear()
+
+    def stop(self):
+        self.close()
+        self.pool.waitForDone()
+
+    def orientation_angle(self, path):
+        """Clockwise turn that shows the image upright, from its EXIF orientation."""
+        info = self.info.get(path)
+        return 0 if info is None else ORIENTATION_ANGLES.get(info.orientation, 0)
+
+    def date_key(self, path):
+        """Sort key by capture time, falling back to the file's mtime; unindexed files go last."""
+        info = self.info.get(path)
+        if info is None:
+            return ('~', path)
+        date = info.taken or datetime.fromtimestamp(info.mtime_ns / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+        return (date, path)
+
+    def similar(self, path, distance=None):
+        """Paths of the indexed images whose perceptual hash is within distance bits of path's."""
+        distance = SIMILAR_DISTANCE if distance is None else distance
+        info = self.info.get(path)
+        if info is None or info.phash is None:
+            return []
+        phash = info.phash
+        return [other.path for other in self.info.values()
+                if other.phash is not None and other.path != path and bin(phash ^ other.phash).count('1') <= distance]
+
+    def _on_indexed(self, generation, infos):
+        if generation != self.generation:
+            return
+        for info in infos:
+            self.info[info.path] = info
+        self.info_ready.emit(infos)
+
+    def _on_idle(self, generation, read, answered):
+        if generation == self.generation:
+            self.idle.emit(read, answered)
@@ -0,0 +1,294 @@
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from hashlib import blake2b
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QColor
+
+THUMBNAIL_SIZE = 128 # Longest side of a thumbnail, in pixels
+THUMBNAIL_DIR = os.path.join(os.path.expanduser('~'), '.gallery_thumbnails')
+MEMORY_THUMBNAILS = 1000 # Decoded thumbnails the strip keeps as pixmaps; the rest are re-read from disk
+
+
+def thumbnail_key(path, stat):
+    """Cache key of an image file: changes whenever the file is replaced or edited."""
+    source = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    return blake2b(source.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class ThumbnailCache:
+    """Thumbnails on disk, one file per (path, mtime, size) key.
+
+    Files are spread over 256 subdirectories by the first two characters of
+    the key and written to a temporary name first, so a reader never sees a
+    half-written thumbnail. Opaque images are stored as JPEG and images with
+    transparency as PNG; readers detect the format from the content.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or THUMBNAIL_DIR
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def load(self, key):
+        reader = QImageReader(self.path_for(key))
+        reader.setDecideFormatFromContent(True)
+        image = reader.read()
+        return None if image.isNull() else image
+
+    def store(self, key, image):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if image.hasAlphaChannel():
+            saved = image.save(temp_path, 'PNG')
+        else:
+            saved = image.save(temp_path, 'JPEG', 85)
+        if saved:
+            os.replace(temp_path, path)
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ThumbnailSignals(QObject):
+    thumbnail_done = pyqtSignal(str, QImage) # path, thumbnail (null if the image could not be read)
+
+
+class ThumbnailTask(QRunnable):
+    """Produces one thumbnail: from the disk cache, or by a downscaling decode."""
+
+    def __init__(self, path, size, cache, signals):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.cache = cache
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        try:
+            key = thumbnail_key(self.path, os.stat(self.path))
+        except OSError:
+            self.signals.thumbnail_done.emit(self.path, image)
+            return
+        cached = self.cache.load(key)
+        if cached is not None:
+            self.signals.thumbnail_done.emit(self.path, cached)
+            return
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(True)
+        full_size = reader.size()
+        if full_size.isValid() and (full_size.width() > self.size or full_size.height() > self.size):
+            # JPEG decoders scale while decoding, so the full-size pixels never exist
+            reader.setScaledSize(full_size.scaled(self.size, self.size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if not image.isNull():
+            try:
+                self.cache.store(key, image)
+            except OSError:
+                pass # A read-only or full cache only costs the next run a decode
+        self.signals.thumbnail_done.emit(self.path, image)
+
+
+class ThumbnailLoader(QObject):
+    """Hands out thumbnail requests to a thread pool and reports the results.
+
+    The latest request gets the highest priority, so while the strip scrolls
+    the thumbnails coming into view are made before the ones scrolled past.
+    cancel() drops everything not yet started, e.g. when another folder opens.
+    """
+
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, cache=None, size=THUMBNAIL_SIZE, parent=None):
+        super().__init__(parent)
+        self.cache = cache or ThumbnailCache()
+        self.size = size
+        self.pending = set()
+        self.priority = 0
+        self.pool = QThreadPool(self)
+        self.signals = ThumbnailSignals()
+        self.signals.thumbnail_done.connect(self._on_thumbnail_done)
+
+    def request(self, path):
+        if path in self.pending:
+            return
+        self.pending.add(path)
+        self.priority += 1
+        self.pool.start(ThumbnailTask(path, self.size, self.cache, self.signals), self.priority)
+
+    def cancel(self):
+        self.pool.clear()
+        self.pending.clear()
+
+    def stop(self):
+        self.cancel()
+        self.pool.waitForDone()
+
+    def _on_thumbnail_done(self, path, image):
+        if path in self.pending: # Otherwise it was cancelled while running
+            self.pending.discard(path)
+            self.thumbnail_ready.emit(path, image)
+
+
+class ThumbnailModel(QAbstractListModel):
+    """Image files of the open folder, in order, shown with their thumbnails.
+
+    Files are sorted by path, or by sort_key(path) once set_sort_key() is
+    called: a tuple ending with the path, taken when the file is added and
+    again when resort() is told it changed.
+    Files can be added and removed while the folder is being scanned; they
+    are merged into place, as inserted rows when they land together and as
+    one re-sorted layout otherwise. A thumbnail is requested the first time
+    the view asks for it while painting, so only the visible part of a
+    large folder is ever decoded. At most MEMORY_THUMBNAILS of them are
+    kept as pixmaps, least recently shown first out; an evicted one comes
+    back from the disk cache.
+    """
+
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self.image_files = [] # In order; changed in place, so holders of the list see the changes
+        self.sort_key = None # None sorts by path
+        self.keys = [] # Sort key of each row, for bisecting
+        self.key_of = {} # path -> sort key, while sort_key is set
+        self.pixmaps = OrderedDict() # path -> QPixmap, least recently shown first
+        self.failed = set()
+        self.placeholder = QPixmap(loader.size, loader.size)
+        self.placeholder.fill(QColor('#e0e0e0'))
+
+    def set_image_files(self, image_files):
+        self.beginResetModel()
+        self.loader.cancel()
+        self.key_of.clear()
+        self.image_files[:], self.keys[:] = self._sorted(image_files)
+        self.pixmaps.clear()
+        self.failed.clear()
+        self.endResetModel()
+
+    def set_sort_key(self, sort_key):
+        self.sort_key = sort_key
+        self.key_of.clear()
+        self._relayout(*self._sorted(self.image_files))
+
+    def resort(self, paths):
+        """Take the sort keys of paths again, after what sort_key reads for them has changed."""
+        if self.sort_key is None:
+            return
+        for path in paths:
+            if path in self.key_of:
+                self.key_of[path] = self.sort_key(path)
+        keys = sorted(self.key_of[path] for path in self.image_files) # Mostly in order already
+        self._relayout([key[-1] for key in keys], keys)
+
+    def _sorted(self, paths):
+        # (paths, keys), both in order
+        if self.sort_key is None:
+            paths = sorted(paths)
+            return paths, list(paths)
+        for path in paths:
+            self.key_of[path] = self.sort_key(path)
+        keys = sorted(self.key_of[path] for path in paths)
+        return [key[-1] for key in keys], keys
+
+    def row_of(self, path):
+        """Row of path, or None if it is not in the model."""
+        key = path if self.sort_key is None else self.key_of.get(path)
+        if key is None:
+            return None
+        row = bisect_left(self.keys, key)
+        if row < len(self.image_files) and self.image_files[row] == path:
+            return row
+        return None
+
+    def insert_image_files(self, paths):
+        new, keys = self._sorted({path for path in paths if self.row_of(path) is None})
+        if not new:
+            return
+        row = bisect_left(self.keys, keys[0])
+        if row == len(self.keys) or keys[-1] < self.keys[row]:
+            # All of them go between the same two neighbours, e.g. appended in order
+            self.beginInsertRows(QModelIndex(), row, row + len(new) - 1)
+            self.image_files[row:row] = new
+            self.keys[row:row] = keys
+            self.endInsertRows()
+        else:
+            self._relayout(*self._merged(new, keys))
+
+    def _merged(self, new, keys):
+        # Both parts are sorted, so sorting them together is a linear merge
+        if self.sort_key is None:
+            paths = sorted(self.image_files + new)
+            return paths, list(paths)
+        keys = sorted(self.keys + keys)
+        return [key[-1] for key in keys], keys
+
+    def remove_image_files(self, paths):
+        rows = sorted(row for row in map(self.row_of, set(paths)) if row is not None)
+        if not rows:
+            return
+        for path in paths:
+            self.pixmaps.pop(path, None)
+            self.failed.discard(path)
+        if rows[-1] - rows[0] == len(rows) - 1: # One contiguous range
+            self.beginRemoveRows(QModelIndex(), rows[0], rows[-1])
+            del self.image_files[rows[0]:rows[-1] + 1]
+            del self.keys[rows[0]:rows[-1] + 1]
+            self.endRemoveRows()
+        else:
+            removed = set(paths)
+            kept = [row for row, path in enumerate(self.image_files) if path not in removed]
+            self._relayout([self.image_files[row] for row in kept], [self.keys[row] for row in kept])
+        for path in paths:
+            self.key_of.pop(path, None)
+
+    def _relayout(self, image_files, keys):
+        # Persistent indexes (the current and selected thumbnails) follow their files
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        paths = [self.image_files[index.row()] for index in persistent]
+        self.image_files[:] = image_files
+        self.keys[:] = keys
+        for index, path in zip(persistent, paths):
+            row = self.row_of(path)
+            self.changePersistentIndex(index, QModelIndex() if row is None else self.index(row))
+        self.layoutChanged.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.image_files)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.image_files[index.row()]
+        if role == Qt.DecorationRole:
+            pixmap = self.pixmaps.get(path)
+            if pixmap is not None:
+                self.pixmaps.move_to_end(path)
+                return pixmap
+            if path not in self.failed:
+                self.loader.request(path)
+            return self.placeholder
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ToolTipRole:
+            return path
+        return None
+
+    def _on_thumbnail_ready(self, path, image):
+        row = self.row_of(path)
+        if row is None:
+            return
+        if image.isNull():
+            self.failed.add(path)
+        else:
+            self.pixmaps[path] = QPixmap.fromImage(image)
+            if len(self.pixmaps) > MEMORY_THUMBNAILS:
+                self.pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
@@ -0,0 +1,324 @@
+import math
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QRect, QRectF, QSize, pyqtSignal
+from PyQt5.QtGui import QImageReader, QImageIOHandler, QPainter, QTransform
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene
+
+from image_cache import ImageCache
+
+TILE_SIZE = 512 # Side of a tile, in pixels of its pyramid level
+TILE_CACHE_MB = 256 # Memory budget for decoded tiles
+OVERVIEW_PIXELS = 4 * 1024 * 1024 # The coarse levels, up to this size, are decoded in one piece and kept
+SOURCE_PIXELS = 64 * 1024 * 1024 # Largest image decoded whole, for formats that cannot be decoded in parts
+MAX_ZOOM = 8 # Screen pixels per image pixel at the closest zoom
+
+
+def level_size(size, level):
+    """Size of a pyramid level: level 0 is the full image, each next one half as wide and high."""
+    step = 1 << level
+    return QSize(max(1, (size.width() + step - 1) // step), max(1, (size.height() + step - 1) // step))
+
+
+class TileSignals(QObject):
+    overview_done = pyqtSignal(int, object, int, list) # generation, decoded source (or None), its level, coarse levels
+    overview_failed = pyqtSignal(int, str) # generation, why the image cannot be shown
+    strip_done = pyqtSignal(int, int, list, list) # generation, level, rows, their tiles by row (empty if skipped)
+
+
+class OverviewTask(QRunnable):
+    """Decodes the coarse levels of the pyramid: the overview level, then halvings down to one tile.
+
+    Formats whose decoder cannot read a scaled part of the image (Qt's JPEG
+    decoder can) are decoded whole once instead, and that image is handed
+    back as the source the finer tiles are cut from. Above SOURCE_PIXELS it
+    is decoded at the first level that fits, if the decoder can scale while
+    reading (Qt's PNG decoder can), and that level is the finest shown;
+    otherwise the image is refused rather than decoded at full size.
+    """
+
+    def __init__(self, path, size, overview_level, generation, signals):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.overview_level = overview_level
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        reader = QImageReader(self.path)
+        overview_size = level_size(self.size, self.overview_level)
+        source = None
+        source_level = 0
+        if reader.supportsOption(QImageIOHandler.ScaledClipRect):
+            if self.overview_level:
+                reader.setScaledSize(overview_size)
+            overview = reader.read()
+        else:
+            while self.size.width() * self.size.height() >> 2 * source_level > SOURCE_PIXELS:
+                source_level += 1
+            if source_level:
+                if not reader.supportsOption(QImageIOHandler.ScaledSize):
+                    self.signals.overview_failed.emit(
+                        self.generation, f"Too large to show: {bytes(reader.format()).decode().upper()} images over "
+                                         f"{SOURCE_PIXELS // (1024 * 1024)} MP cannot be decoded in parts")
+                    return
+                reader.setScaledSize(level_size(self.size, source_level))
+            source = reader.read()
+            overview = source.scaled(overview_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        levels = [] if overview.isNull() else [overview]
+        while levels and max(levels[-1].width(), levels[-1].height()) > TILE_SIZE:
+            half = QSize(max(1, (levels[-1].width() + 1) // 2), max(1, (levels[-1].height() + 1) // 2))
+            levels.append(levels[-1].scaled(half, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        self.signals.overview_done.emit(self.generation, None if source is None or source.isNull() else source,
+                                        source_level, levels)
+
+
+class StripTask(QRunnable):
+    """Decodes adjacent rows of tiles of a fine level, unless the view stopped wanting them while queued.
+
+    Whole rows, and several of them, are decoded at once because a JPEG
+    decoder has to go through every line above the part it returns: the
+    tiles next to and below the first cost little more than it.
+    """
+
+    def __init__(self, path, size, level, rows, source, source_level, view, generation, signals):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.level = level
+        self.rows = rows
+        self.source = source
+        self.source_level = source_level
+        self.view = view
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        if not any((self.level, row) in self.view.wanted for row in self.rows): # Scrolled or zoomed away
+            self.signals.strip_done.emit(self.generation, self.level, self.rows, [])
+            return
+        size = level_size(self.size, self.level)
+        top = self.rows[0] * TILE_SIZE
+        height = min(len(self.rows) * TILE_SIZE, size.height() - top)
+        if self.source is None:
+            reader = QImageReader(self.path)
+            if self.level:
+                reader.setScaledSize(size)
+            reader.setScaledClipRect(QRect(0, top, size.width(), height))
+            strip = reader.read()
+        else:
+            step = 1 << self.level - self.source_level
+            strip = self.source.copy(0, top * step, self.source.width(), height * step)
+            if self.level > self.source_level:
+                strip = strip.scaled(size.width(), height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        tiles = [] if strip.isNull() else [[strip.copy(x, y, min(TILE_SIZE, size.width() - x), min(TILE_SIZE, height - y))
+                                            for x in range(0, size.width(), TILE_SIZE)]
+                                           for y in range(0, height, TILE_SIZE)]
+        self.signals.strip_done.emit(self.generation, self.level, self.rows, tiles)
+
+
+class TiledImageView(QGraphicsView):
+    """Zoomable, pannable view of one image too large to decode whole.
+
+    The image is a pyramid of levels, each half the size of the one
+    before. The coarse levels, up to OVERVIEW_PIXELS, are decoded first and
+    kept, so something is always on screen. Finer levels are decoded on
+    worker threads, one row of tiles at a time and only where the view
+    shows them, and kept in an ImageCache of TILE_CACHE_MB. Each paint
+    draws the overview and then the tiles of the level that matches the
+    zoom; rows that are missing are requested, nearest to the centre first,
+    together with a row of margin above and below, and rows scrolled away
+    before their turn are skipped. An image only decodable whole is shown
+    from a source of at most SOURCE_PIXELS, see OverviewTask. The wheel zooms
+    around the pointer, dragging pans, and a double click switches between
+    fitting the window and 100%.
+    """
+    failed = pyqtSignal(str) # The image cannot be shown, and why
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate) # Every paint sees the whole view, see wanted
+        self.setRenderHint(QPainter.SmoothPixmapTransform)
+        self.tiles = ImageCache(TILE_CACHE_MB) # (level, row, column) -> QImage
+        self.pool = QThreadPool(self)
+        self.signals = TileSignals()
+        self.signals.overview_done.connect(self._on_overview_done)
+        self.signals.overview_failed.connect(self._on_overview_failed)
+        self.signals.strip_done.connect(self._on_strip_done)
+        self.generation = 0
+        self.path = None
+        self.image_size = QSize()
+        self.angle = 0
+        self.overview_level = 0
+        self.levels = [] # Coarse levels from overview_level on
+        self.source = None # The whole image, for formats that cannot be decoded in parts
+        self.source_level = 0 # Level of `source`, and the finest level shown
+        self.pending = set() # (level, row) queued or decoding
+        self.wanted = frozenset() # (level, row) the last paint needed; read by worker threads
+        self.priority = 0
+        self.fitted = True
+        self.missing = 0 # Tiles the last paint showed from the overview instead
+
+    def show_image(self, path, size, angle=0):
+        if path == self.path:
+            if angle != self.angle:
+                self.angle = angle
+                self.fit()
+            return
+        self.clear()
+        self.path = path
+        self.image_size = size
+        self.angle = angle
+        self.overview_level = 0
+        while size.width() * size.height() >> 2 * self.overview_level > OVERVIEW_PIXELS:
+            self.overview_level += 1
+        self.setSceneRect(QRectF(0, 0, size.width(), size.height()))
+        self.fit()
+        self.pool.start(OverviewTask(path, size, self.overview_level, self.generation, self.signals), 1 << 30)
+
+    def clear(self):
+        """Forget the image and its tiles."""
+        self.generation += 1
+        self.pool.clear()
+        self.pending.clear()
+        self.wanted = frozenset()
+        self.tiles.clear()
+        self.levels = []
+        self.source = None
+        self.source_level = 0
+        self.path = None
+        self.viewport().update()
+
+    def stop(self):
+        self.clear()
+        self.pool.waitForDone()
+
+    def fit(self):
+        self.fitted = True
+        self.setTransform(QTransform().rotate(self.angle))
+        if not self.sceneRect().isEmpty():
+            self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
+
+    def actual_size(self):
+        """Zoom to one screen pixel per image pixel."""
+        factor = 1 / self.zoom()
+        self.scale(factor, factor)
+        self.fitted = False
+
+    def zoom(self):
+        """Screen pixels per image pixel."""
+        return math.sqrt(abs(self.transform().determinant()))
+
+    def wheelEvent(self, event):
+        if self.path is None:
+            return
+        factor = 1.25 ** (event.angleDelta().y() / 120)
+        factor = min(factor, MAX_ZOOM / self.zoom())
+        self.scale(factor, factor)
+        self.fitted = False
+
+    def mouseDoubleClickEvent(self, event):
+        if self.path is None:
+            return
+        if self.fitted:
+            self.actual_size()
+        else:
+            self.fit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.fitted:
+            self.fit()
+
+    def drawBackground(self, painter, rect):
+        painter.fillRect(rect, self.palette().window())
+        if not self.levels:
+            return
+        width, height = self.image_size.width(), self.image_size.height()
+        image_rect = rect & self.sceneRect()
+        zoom = self.zoom()
+        level = 0 if zoom >= 1 else int(math.log2(1 / zoom)) # The finest level no sharper than the screen needs
+        level = max(level, self.source_level)
+        coarse = self.levels[min(max(level - self.overview_level, 0), len(self.levels) - 1)]
+        scale_x, scale_y = coarse.width() / width, coarse.height() / height
+        painter.drawImage(image_rect, coarse, QRectF(image_rect.x() * scale_x, image_rect.y() * scale_y,
+                                                    image_rect.width() * scale_x, image_rect.height() * scale_y))
+        if level >= self.overview_level:
+            self.missing = 0
+            return
+
+        size = level_size(self.image_size, level)
+        tile_width, tile_height = TILE_SIZE * width / size.width(), TILE_SIZE * height / size.height()
+        first_column, last_column = int(image_rect.left() // tile_width), int(image_rect.right() // tile_width)
+        first_row, last_row = int(image_rect.top() // tile_height), int(image_rect.bottom() // tile_height)
+        last_column = min(last_column, (size.width() - 1) // TILE_SIZE)
+        last_row = min(last_row, (size.height() - 1) // TILE_SIZE)
+        missing_rows = set()
+        missing = 0
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                tile = self.tiles.get((level, row, column))
+                if tile is None:
+                    missing_rows.add(row)
+                    missing += 1
+                    continue
+                painter.drawImage(QRectF(column * tile_width, row * tile_height,
+                                         tile.width() * width / size.width(), tile.height() * height / size.height()),
+                                  tile)
+        self.missing = missing
+        margin = [row for row in (first_row - 1, last_row + 1) # So a short scroll finds its tiles ready
+                  if 0 <= row <= (size.height() - 1) // TILE_SIZE and (level, row, first_column) not in self.tiles]
+        self._request_rows(level, size, sorted(missing_rows), margin, (first_row + last_row) / 2)
+
+    def _request_rows(self, level, size, rows, margin, centre):
+        # Runs of adjacent rows, each read at once within half the tile budget: the rows on screen
+        # nearest to the centre first, the margin added to a run next to it while there is room
+        self.wanted = frozenset((level, row) for row in rows + margin)
+        run_rows = max(1, self.tiles.budget // 2 // (size.width() * TILE_SIZE * 4))
+        runs = []
+        for row in rows:
+            if (level, row) in self.pending:
+                continue
+            if runs and runs[-1][-1] == row - 1 and len(runs[-1]) < run_rows:
+                runs[-1].append(row)
+            else:
+                runs.append([row])
+        runs.sort(key=lambda run: min(abs(row - centre) for row in run))
+        for row in margin:
+            if (level, row) in self.pending:
+                continue
+            run = next((run for run in runs if len(run) < run_rows and row in (run[0] - 1, run[-1] + 1)), None)
+            if run is None:
+                runs.append([row])
+            else:
+                run.insert(0 if row < run[0] else len(run), row)
+        self.priority += 100
+        for rank, run in enumerate(runs):
+            self.pending.update((level, row) for row in run)
+            self.pool.start(StripTask(self.path, self.image_size, level, run, self.source, self.source_level, self,
+                                      self.generation, self.signals), self.priority - rank)
+
+    def _on_overview_done(self, generation, source, source_level, levels):
+        if generation != self.generation:
+            return
+        self.source = source
+        self.source_level = source_level
+        self.levels = levels
+        self.viewport().update()
+
+    def _on_overview_failed(self, generation, message):
+        if generation == self.generation:
+            self.failed.emit(message)
+
+    def _on_strip_done(self, generation, level, rows, tiles):
+        if generation != self.generation:
+            return
+        self.pending.difference_update((level, row) for row in rows)
+        for row, row_tiles in zip(rows, tiles):
+            for column, tile in enumerate(row_tiles):
+                self.tiles.put((level, row, column), tile)
+        if tiles:
+            self.viewport().update()
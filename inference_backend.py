@@ -0,0 +1,149 @@
+"""Inference backends for the YOLO detector: PyTorch, ONNX Runtime (float or INT8) and OpenVINO.
+
+export_model() converts PyTorch weights once and keeps the result in
+EXPORT_DIR; load_model() returns an ultralytics YOLO object for any backend, so
+callers keep calling model(images) and reading model.names as before.
+ONNX Runtime and OpenVINO are optional: they are only imported, by
+ultralytics or here, when their backend is used.
+"""
+import glob
+import os
+import shutil
+import tempfile
+from functools import partial
+from hashlib import blake2b
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+BACKENDS = ('pytorch', 'onnx', 'onnx-int8', 'openvino')
+EXPORT_SIZE = 640 # Input side of exported models; they take no other size
+EXPORT_SUFFIXES = {'onnx': '.onnx', 'onnx-int8': '_int8.onnx', 'openvino': '_openvino_model'} # ultralytics picks the runtime by suffix
+EXPORT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'yolo_exports') # Exports of all weights, whatever folder they are in
+ULTRALYTICS_TESTED = '8.4' # The ultralytics release whose runtime attributes load_model() replaces to set threads
+
+
+def exported_path(weights, backend, imgsz=EXPORT_SIZE):
+    """Where export_model() keeps weights converted for backend at imgsz, named after the weights' content."""
+    digest = blake2b(digest_size=8)
+    with open(weights, 'rb') as f:
+        for chunk in iter(partial(f.read, 1 << 20), b''):
+            digest.update(chunk)
+    name = os.path.splitext(os.path.basename(weights))[0]
+    return os.path.join(EXPORT_DIR, f"{name}_{digest.hexdigest()}_{imgsz}{EXPORT_SUFFIXES[backend]}")
+
+
+def export_model(weights, backend, imgsz=EXPORT_SIZE, calibration_images=None):
+    """Path of weights converted for backend, converting them first unless EXPORT_DIR has them.
+
+    Weights that are no file, like 'yolov8n.pt', are downloaded by
+    ultralytics first. INT8 quantization is calibrated on
+    calibration_images (paths), by default the sample images that ship
+    with ultralytics; a few images like the ones to be detected calibrate
+    it better. Raises RuntimeError if the conversion fails.
+    """
+    if backend == 'pytorch':
+        return weights
+    from ultralytics import YOLO
+    if not os.path.isfile(weights):
+        weights = YOLO(weights).ckpt_path
+    path = exported_path(weights, backend, imgsz)
+    if os.path.exists(path):
+        return path
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    try:
+        # Converted in a folder of its own, so that the weights' folder may be read-only and a failure leaves nothing
+        with tempfile.TemporaryDirectory(dir=EXPORT_DIR) as work_dir:
+            if backend == 'onnx-int8':
+                exported = os.path.join(work_dir, os.path.basename(path))
+                quantize_onnx(export_model(weights, 'onnx', imgsz), exported, imgsz, calibration_images)
+            else:
+                copy = shutil.copy(weights, work_dir)
+                exported = YOLO(copy).export(format=backend, imgsz=imgsz).rstrip('/\\')
+            if os.path.isdir(path):
+                shutil.rmtree(path) # Another process exported it meanwhile
+            os.replace(exported, path)
+    except Exception as e:
+        raise RuntimeError(f"cannot export {weights} for {backend} at {imgsz}: {e}") from e
+    return path
+
+
+def quantize_onnx(onnx_path, path, imgsz, calibration_images=None):
+    """Writes an INT8 copy of a YOLO ONNX model to path, with activation ranges measured on calibration_images.
+
+    The convolutions are quantized; the decoding at the end of the head is
+    not, since it concatenates pixel coordinates with class scores below 1
+    and one 8-bit scale cannot hold both.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from ultralytics.data.augment import LetterBox
+    from ultralytics.utils import ASSETS
+
+    if not calibration_images:
+        calibration_images = sorted(glob.glob(os.path.join(str(ASSETS), '*.jpg')))
+    graph = onnx.load(onnx_path).graph
+    modules = [node.name.split('/') for node in graph.node] # '/model.22/cv2.0/...' -> ['', 'model.22', 'cv2.0', ...]
+    head = max(int(parts[1].split('.')[1]) for parts in modules if len(parts) > 2 and parts[1].startswith('model.'))
+    # The head's box (cv2) and class (cv3) convolution branches stay quantized; everything else in it does not
+    decoding = [node.name for node, parts in zip(graph.node, modules)
+                if len(parts) > 2 and parts[1] == f"model.{head}" and not parts[2].startswith(('cv2', 'cv3'))]
+    letterbox = LetterBox((imgsz, imgsz), auto=False) # The same padding the predictor uses for a fixed-size model
+
+    def inputs():
+        for image_path in calibration_images:
+            image = cv2.imread(image_path)
+            if image is not None:
+                image = letterbox(image=image)[:, :, ::-1].transpose(2, 0, 1) # BGR HWC -> RGB CHW
+                yield {graph.input[0].name: (image[None] / 255).astype(np.float32)}
+
+    reader = SimpleNamespace(get_next=partial(next, inputs(), None)) # All quantize_static() asks of a data reader
+    quantize_static(onnx_path, path, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, nodes_to_exclude=decoding)
+
+
+def load_model(weights, backend='pytorch', threads=None, imgsz=EXPORT_SIZE):
+    """A YOLO model of weights running on backend with threads threads (None: the backend's default).
+
+    Exported models are exported first if needed, which takes seconds the
+    first time. For PyTorch, the thread count is set for the whole process.
+    """
+    from ultralytics import YOLO
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    path = export_model(weights, backend, imgsz)
+    if backend == 'pytorch':
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return YOLO(path)
+    model = YOLO(path, task='detect')
+    if threads:
+        # ultralytics creates the runtime with the predictor, on the first call, and has no option for its threads
+        model(np.zeros((imgsz, imgsz, 3), np.uint8), verbose=False)
+        if backend == 'openvino':
+            import openvino
+            runtime = ultralytics_runtime(model, 'compile_model', 'ov_compiled_model')
+            config = {'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': threads}
+            runtime.compile_model = partial(openvino.Core().compile_model, device_name='CPU', config=config)
+            runtime.ov_compiled_model = runtime.compile_model(glob.glob(os.path.join(path, '*.xml'))[0])
+        else:
+            import onnxruntime
+            runtime = ultralytics_runtime(model, 'session')
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            runtime.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    return model
+
+
+def ultralytics_runtime(model, *attributes):
+    """The backend object holding model's runtime, checked to have attributes, which are not public ultralytics API."""
+    import ultralytics
+    runtime = getattr(getattr(model.predictor, 'model', None), 'backend', None)
+    missing = [name for name in attributes if not hasattr(runtime, name)]
+    if missing:
+        raise RuntimeError(f"setting threads for this backend needs ultralytics {ULTRALYTICS_TESTED}.x, whose runtime "
+                           f"has {', '.join(attributes)}; ultralytics {ultralytics.__version__} has no "
+                           f"{', '.join(missing)}. Leave threads unset to use the backend's default.")
+    return runtime
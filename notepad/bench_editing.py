@@ -0,0 +1,79 @@
+"""Benchmark status-bar and modified-state updates while editing in the notepad.
+
+Usage: python bench_editing.py [--keys 10000] [--paste-mb 50]
+
+The keystroke burst sends real key events and runs the event loop after each
+one, the way typing does. The paste inserts one large string and is followed
+by an undo back to the saved state, which must clear the tab's '*'.
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=10000, help='number of keystrokes to send')
+    parser.add_argument('--paste-mb', type=int, default=50, help='size of the pasted text in MB')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtTest import QTest
+    from PyQt5.QtCore import Qt
+    app = QApplication(sys.argv)
+    from notepad_app import NotepadApp
+
+    window = NotepadApp()
+    window.show()
+    app.processEvents()
+
+    updates = 0
+    update_status_bar = window.update_status_bar
+
+    def counting_update_status_bar():
+        nonlocal updates
+        updates += 1
+        update_status_bar()
+    window.update_status_bar = counting_update_status_bar
+
+    text_edit = window.current_text_edit()
+    keys = [Qt.Key_A + i % 26 for i in range(args.keys)]
+    start = time.perf_counter()
+    for i, key in enumerate(keys):
+        QTest.keyClick(text_edit, key)
+        if i % 80 == 79:
+            QTest.keyClick(text_edit, Qt.Key_Return)
+        app.processEvents()
+    time.sleep(0.05)
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    print(f"keystroke burst: {args.keys} keys in {elapsed:.2f} s "
+          f"({elapsed / args.keys * 1e6:.0f} us/key), {updates} status updates, modified={text_edit.modified}")
+
+    window.new_tab()
+    text_edit = window.current_text_edit()
+    line = "2025-07-04 09:00:00 INFO pasted line with some payload text\n"
+    payload = line * (args.paste_mb * 1024 * 1024 // len(line))
+    app.clipboard().setText(payload)
+    updates = 0
+    start = time.perf_counter()
+    text_edit.paste()
+    inserted = time.perf_counter() - start
+    time.sleep(0.05)
+    app.processEvents()
+    updated = time.perf_counter() - start
+    print(f"{args.paste_mb} MB paste: insert {inserted:.2f} s, until status updated {updated:.2f} s, "
+          f"{updates} status updates, modified={text_edit.modified}")
+
+    start = time.perf_counter()
+    text_edit.undo()
+    time.sleep(0.05)
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    print(f"undo to saved state: {elapsed:.2f} s, modified={text_edit.modified}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark scrolling latency of the notepad's syntax highlighting.
+
+Usage: python bench_highlight.py [--lines 200000] [--steps 300] [--naive]
+
+Opens a generated Python file with the given number of lines, measures the
+time until the first highlighted paint, then scrolls through the file in
+page steps and random jumps, repainting after each one, and reports the
+latency percentiles. --naive also times a plain QSyntaxHighlighter over the
+same text, which tokenizes every block when the document is set.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+SNIPPET = '''def handler_{i}(request, retries=3):
+    """Handle one request.
+
+    Returns the response body or None.
+    """
+    for attempt in range(retries):  # retry loop
+        body = request.get("body", b"") or 'empty'
+        if len(body) > 0x100:
+            return body[:256]
+    return None
+
+'''
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200000, help='number of lines in the file')
+    parser.add_argument('--steps', type=int, default=300, help='number of scroll steps')
+    parser.add_argument('--naive', action='store_true', help='also time a whole-document QSyntaxHighlighter')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import session
+    from notepad_app import NotepadApp
+
+    snippet_lines = SNIPPET.count('\n')
+    content = ''.join(SNIPPET.format(i=i) for i in range(args.lines // snippet_lines + 1))
+    work_dir = tempfile.mkdtemp(prefix='notepad_highlight_bench_')
+    session.SESSION_DIR = os.path.join(work_dir, 'session')
+    path = os.path.join(work_dir, 'generated.py')
+
+    window = NotepadApp()
+    window.resize(1000, 800)
+    window.show()
+    app.processEvents()
+
+    start = time.perf_counter()
+    text_edit = window.new_tab(path, content)
+    text_edit.viewport().repaint()
+    app.processEvents()
+    print(f"{text_edit.blockCount()} lines: first highlighted paint {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    highlighter = text_edit.highlighter
+    scroll_bar = text_edit.verticalScrollBar()
+    random.seed(0)
+    for name, next_value in (
+            ('page down', lambda value: min(scroll_bar.maximum(), value + scroll_bar.pageStep())),
+            ('random jump', lambda value: random.randint(0, scroll_bar.maximum()))):
+        scroll_bar.setValue(0)
+        app.processEvents()
+        latencies = []
+        for _ in range(args.steps):
+            start = time.perf_counter()
+            scroll_bar.setValue(next_value(scroll_bar.value()))
+            text_edit.viewport().repaint()
+            latencies.append((time.perf_counter() - start) * 1000)
+            app.processEvents()
+        print(f"{name}: p50 {percentile(latencies, 0.5):.2f} ms, p95 {percentile(latencies, 0.95):.2f} ms, "
+              f"max {max(latencies):.2f} ms")
+
+    start = time.perf_counter()
+    highlighter.pool.waitForDone()
+    app.processEvents()
+    print(f"background state scan finished {(time.perf_counter() - start) * 1000:.1f} ms after scrolling, "
+          f"lexer state known for {highlighter.valid_upto} of {text_edit.blockCount()} lines")
+
+    scroll_bar.setValue(scroll_bar.maximum() // 2)
+    app.processEvents()
+    cursor = text_edit.cursorForPosition(text_edit.viewport().rect().center())
+    start = time.perf_counter()
+    cursor.insertText('"""')
+    text_edit.viewport().repaint()
+    app.processEvents()
+    print(f"opening a triple-quoted string mid-file: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if args.naive:
+        from PyQt5.QtGui import QSyntaxHighlighter, QTextDocument
+        from highlighter import FORMATS, tokenize_python
+
+        class NaiveHighlighter(QSyntaxHighlighter):
+            def highlightBlock(self, text):
+                spans, state = tokenize_python(text, max(self.previousBlockState(), 0))
+                for start, length, kind in spans:
+                    self.setFormat(start, length, FORMATS[kind])
+                self.setCurrentBlockState(state)
+
+        document = QTextDocument()
+        document.setPlainText(content)
+        start = time.perf_counter()
+        NaiveHighlighter(document).rehighlight()
+        print(f"naive QSyntaxHighlighter on load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark opening generated log files in the notepad's large-file mode.
+
+Usage: python bench_large_file.py [--dir DIR] [--sizes 100M,1G,4G]
+
+Each size is opened in a fresh process so peak RSS is measured per file.
+Time-to-first-paint covers mmap, widget creation and the first synchronous
+repaint of the viewer; the line index keeps building in the background and
+its total time is reported separately.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def generate_file(path, size):
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return
+    lines = []
+    for i in range(20000):
+        lines.append(f"2025-07-04 09:00:{i % 60:02d}.{i % 1000:03d} INFO worker-{i % 16} request {i} handled in {i % 500} ms\n")
+    block = ''.join(lines).encode('utf-8')
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            data = block[:size - written]
+            f.write(data)
+            written += len(data)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(path):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    from notepad_app import NotepadApp
+
+    window = NotepadApp()
+    window.show()
+    app.processEvents()
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    viewer = window.open_large_file(path)
+    viewer.viewport().repaint()
+    first_paint = time.perf_counter() - start
+
+    while not viewer.indexer.isFinished():
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+    indexed = time.perf_counter() - start
+
+    # Jump to the last line to make sure random access works once indexed
+    viewer.verticalScrollBar().setValue(viewer.verticalScrollBar().maximum())
+    viewer.viewport().repaint()
+
+    print(f"{first_paint * 1000:.1f} {indexed:.2f} {viewer.document.line_count()} {rss_before:.1f} {peak_rss_mb():.1f}")
+    viewer.close_document()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='where to generate the test files')
+    parser.add_argument('--sizes', default='100M,1G,4G', help='comma separated file sizes')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    print(f"{'size':>6} {'first paint':>12} {'index built':>12} {'lines':>12} {'base RSS':>9} {'peak RSS':>9}")
+    for size_text in args.sizes.split(','):
+        size = parse_size(size_text)
+        path = os.path.join(args.dir, f"notepad_bench_{size_text.strip()}.log")
+        generate_file(path, size)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.split()
+        first_paint, indexed, lines, rss_before, rss_peak = output[-5:]
+        print(f"{size_text:>6} {first_paint:>9} ms {indexed:>10} s {int(lines):>12,} {rss_before:>6} MB {rss_peak:>6} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark notepad startup with a large restored session.
+
+Usage: python bench_session_restore.py [--tabs 60] [--file-kb 512] [--unsaved 10]
+
+Writes a session with the given number of file-backed tabs (some of them
+with unsaved snapshots) into a temporary session directory, then measures
+how long NotepadApp takes until its first paint, and how long activating
+a restored tab takes. Startup is compared against STARTUP_TARGET_MS.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+STARTUP_TARGET_MS = 300
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tabs', type=int, default=60, help='number of restored tabs')
+    parser.add_argument('--file-kb', type=int, default=512, help='size of each file in KB')
+    parser.add_argument('--unsaved', type=int, default=10, help='tabs restored from unsaved snapshots')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import session
+    from edit_tracking import content_hash
+    from notepad_app import NotepadApp
+
+    work_dir = tempfile.mkdtemp(prefix='notepad_session_bench_')
+    session.SESSION_DIR = os.path.join(work_dir, 'session')
+    store = session.SessionStore()
+    line = "2025-07-04 09:00:00 INFO restored tab content line\n"
+    content = line * (args.file_kb * 1024 // len(line))
+    entries = []
+    for i in range(args.tabs):
+        path = os.path.join(work_dir, f"file_{i}.log")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        entry = {'file_path': path, 'cursor': len(content) // 2}
+        if i < args.unsaved:
+            entry['snapshot'] = store.write_snapshot(f"tab{i}", content + "unsaved edit\n")
+            entry['saved_length'] = len(content) + 1
+            entry['saved_hash'] = content_hash(content).hex()
+        entries.append(entry)
+    store.save(entries, args.tabs - 1)
+
+    start = time.perf_counter()
+    window = NotepadApp()
+    window.show()
+    window.repaint()
+    startup = (time.perf_counter() - start) * 1000
+    verdict = "OK" if startup <= STARTUP_TARGET_MS else "over target"
+    print(f"startup with {window.tab_widget.count()} restored tabs: {startup:.1f} ms "
+          f"(target {STARTUP_TARGET_MS} ms, {verdict})")
+
+    for index, kind in ((0, 'snapshot'), (args.tabs // 2, 'file')):
+        start = time.perf_counter()
+        window.tab_widget.setCurrentIndex(index)
+        window.wait_for_io(window.tab_widget.widget(index))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"activating a {kind} tab: {elapsed:.1f} ms")
+
+    start = time.perf_counter()
+    window.load_all_tabs()
+    print(f"loading every remaining tab eagerly: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    window.save_session()
+    print(f"session save: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import hashlib
+
+from PyQt5.QtCore import QObject, QTimer
+
+UPDATE_INTERVAL = 16 # ms, at most one status/title update per frame
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class UpdateScheduler(QObject):
+    """Coalesces bursts of editor signals into one callback per interval."""
+
+    def __init__(self, callback, interval=UPDATE_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(callback)
+
+    def schedule(self):
+        # Restarting an active timer would postpone updates forever while typing
+        if not self.timer.isActive():
+            self.timer.start()
+
+
+class ModifiedTracker:
+    """Decides whether a document differs from the text it was last saved with.
+
+    Only the length and a hash of the saved text are kept. A length mismatch
+    answers the question without touching the text, so the hash is computed
+    only when the lengths match again, e.g. after undoing back to the saved
+    state, and at most once per document revision, however often the
+    question is asked in between.
+    """
+
+    def __init__(self):
+        self.saved_length = 1 # QTextDocument.characterCount() of an empty document
+        self.saved_hash = content_hash('')
+        self.hashed_revision = None # Document revision the last hash comparison was made at
+        self.hashed_result = False
+
+    def mark_saved(self, length, digest):
+        self.saved_length = length
+        self.saved_hash = digest
+        self.hashed_revision = None
+
+    def mark_document_saved(self, document):
+        self.mark_saved(document.characterCount(), content_hash(document.toPlainText()))
+
+    def is_modified(self, document):
+        if document.characterCount() != self.saved_length:
+            return True
+        revision = document.revision() # Grows with every edit, undo and redo included
+        if revision != self.hashed_revision:
+            self.hashed_revision = revision
+            self.hashed_result = content_hash(document.toPlainText()) != self.saved_hash
+        return self.hashed_result
@@ -0,0 +1,111 @@
+import codecs
+import hashlib
+import os
+import tempfile
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+READ_CHUNK_SIZE = 1024 * 1024 # Bytes decoded per chunk when loading
+WRITE_CHUNK_SIZE = 1024 * 1024 # Characters encoded per write when saving
+
+
+class FileLoadThread(QThread):
+    chunk_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, file_path, encoding='utf-8'):
+        super().__init__()
+        self.file_path = file_path
+        self.encoding = encoding
+
+    def run(self):
+        try:
+            total = os.path.getsize(self.file_path) or 1
+            decoder = codecs.getincrementaldecoder(self.encoding)()
+            done = 0
+            with open(self.file_path, 'rb') as f:
+                while not self.isInterruptionRequested():
+                    data = f.read(READ_CHUNK_SIZE)
+                    # The incremental decoder keeps multi-byte characters split across chunks
+                    text = decoder.decode(data, final=not data)
+                    if text:
+                        self.chunk_signal.emit(text)
+                    if not data:
+                        break
+                    done += len(data)
+                    self.progress_signal.emit(done * 100 // total)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
+class FileSaveThread(QThread):
+    """Encodes a snapshot of a QTextDocument and writes it atomically.
+
+    The snapshot is a clone owned by this thread, so the editor stays usable
+    while the save runs. Data goes to a temporary file in the target directory
+    that only replaces the original once it is completely written and synced.
+    The length and hash of the saved text are kept for modified tracking.
+    """
+
+    progress_signal = pyqtSignal(int)
+    saved_signal = pyqtSignal(str)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, document, file_path, encoding='utf-8'):
+        super().__init__()
+        self.document = document
+        self.file_path = file_path
+        self.encoding = encoding
+        self.content_length = document.characterCount()
+        self.content_hash = None
+
+    def run(self):
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.file_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if not self._write_blocks(f):
+                    raise InterruptedError
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.file_path):
+                os.chmod(temp_path, os.stat(self.file_path).st_mode & 0o7777)
+            os.replace(temp_path, self.file_path)
+            self.saved_signal.emit(self.file_path)
+        except InterruptedError:
+            os.remove(temp_path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.error_signal.emit(str(e))
+
+    def _write_blocks(self, f):
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        hasher = hashlib.blake2b(digest_size=16) # Same digest as edit_tracking.content_hash
+        total = self.document.blockCount()
+        parts = []
+        size = 0
+        block = self.document.begin()
+        while block.isValid():
+            # Same conversions as QTextDocument.toPlainText(), with the line
+            # separator written the way text-mode open() would
+            text = block.text().replace('\u2028', '\n').replace('\xa0', ' ')
+            block = block.next()
+            hasher.update(text.encode('utf-8', 'surrogatepass'))
+            parts.append(text.replace('\n', os.linesep))
+            if block.isValid():
+                hasher.update(b'\n')
+                parts.append(os.linesep)
+            size += len(text)
+            if size >= WRITE_CHUNK_SIZE or not block.isValid():
+                if self.isInterruptionRequested():
+                    return False
+                f.write(encoder.encode(''.join(parts)))
+                parts = []
+                size = 0
+                done = block.blockNumber() if block.isValid() else total
+                self.progress_signal.emit(done * 100 // total)
+        f.write(encoder.encode('', final=True))
+        self.content_hash = hasher.digest()
+        return True
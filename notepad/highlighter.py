@@ -0,0 +1,368 @@
+import builtins
+import keyword
+import os
+import re
+
+from PyQt5.QtGui import QTextCharFormat, QTextLayout, QColor, QFont
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+VIEWPORT_MARGIN = 20 # Blocks tokenized above and below the visible ones
+SYNC_SCAN_LIMIT = 2000 # Larger gaps of unknown lexer state are scanned on a worker
+
+LANGUAGE_EXTENSIONS = {
+    '.py': 'python', '.pyw': 'python',
+    '.json': 'json',
+    '.yaml': 'yaml', '.yml': 'yaml',
+    '.log': 'log',
+}
+
+
+def language_for_path(file_path):
+    if not file_path:
+        return None
+    return LANGUAGE_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+
+
+# Lexers take a line and the state left by the previous line and return
+# ([(start, length, kind)], end_state). State 0 means "nothing open".
+
+PY_KEYWORDS = set(keyword.kwlist)
+PY_BUILTINS = set(dir(builtins)) - PY_KEYWORDS
+PY_TOKEN = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<triple>(?:\b[rRbBuUfF]{1,2})?(?:\'\'\'|"""))
+  | (?P<string>(?:\b[rRbBuUfF]{1,2})?(?:'(?:\\.|[^'\\])*'?|"(?:\\.|[^"\\])*"?))
+  | (?P<number>\b(?:0[xXoObB][\da-fA-F_]+|\d[\d_]*(?:\.[\d_]*)?(?:[eE][+-]?\d+)?j?)\b)
+  | (?P<decorator>@[\w.]+)
+  | (?P<word>\b[A-Za-z_]\w*)
+''', re.X)
+PY_TRIPLE_QUOTES = {1: "'''", 2: '"""'}
+
+
+def tokenize_python(text, state):
+    spans = []
+    pos = 0
+    if state:
+        end = text.find(PY_TRIPLE_QUOTES[state])
+        if end == -1:
+            return [(0, len(text), 'string')], state
+        pos = end + 3
+        spans.append((0, pos, 'string'))
+        state = 0
+    for match in PY_TOKEN.finditer(text, pos):
+        kind = match.lastgroup
+        start = match.start()
+        if kind == 'triple':
+            quote = match.group()[-3:]
+            end = text.find(quote, match.end())
+            if end == -1:
+                spans.append((start, len(text) - start, 'string'))
+                return spans, 1 if quote == "'''" else 2
+            spans.append((start, end + 3 - start, 'string'))
+            # Continue after the closing quotes
+            rest, state = tokenize_python(text[end + 3:], 0)
+            spans.extend((s + end + 3, length, k) for s, length, k in rest)
+            return spans, state
+        if kind == 'word':
+            word = match.group()
+            if word in PY_KEYWORDS:
+                spans.append((start, len(word), 'keyword'))
+            elif word in PY_BUILTINS:
+                spans.append((start, len(word), 'builtin'))
+            continue
+        spans.append((start, match.end() - start, kind))
+    return spans, 0
+
+
+JSON_TOKEN = re.compile(r'''
+    (?P<key>"(?:\\.|[^"\\])*"(?=\s*:))
+  | (?P<string>"(?:\\.|[^"\\])*"?)
+  | (?P<number>-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b)
+  | (?P<keyword>\b(?:true|false|null)\b)
+''', re.X)
+
+
+def tokenize_json(text, state):
+    return [(m.start(), m.end() - m.start(), m.lastgroup) for m in JSON_TOKEN.finditer(text)], 0
+
+
+YAML_KEY = re.compile(r'^(\s*(?:-\s+)?)([^\s#:\'"][^#:]*?|"[^"]*"|\'[^\']*\')\s*:(?=\s|$)')
+YAML_TOKEN = re.compile(r'''
+    (?P<comment>(?:^|(?<=\s))\#.*)
+  | (?P<string>"(?:\\.|[^"\\])*"?|'(?:''|[^'])*'?)
+  | (?P<keyword>(?<![\w.-])(?:true|false|yes|no|on|off|null|~)(?![\w.-]))
+  | (?P<number>(?<![\w.-])-?\d+(?:\.\d+)?(?![\w.-]))
+  | (?P<decorator>[&*][\w-]+|^---$|^\.\.\.$)
+''', re.X | re.I)
+YAML_BLOCK_SCALAR = re.compile(r':\s*[|>][+-]?\d*\s*(?:#.*)?$')
+
+
+def tokenize_yaml(text, state):
+    # State is the indentation of the key that opened a block scalar, plus one
+    indent = len(text) - len(text.lstrip())
+    if state and (not text.strip() or indent >= state):
+        return [(0, len(text), 'string')], state
+    spans = []
+    pos = 0
+    key = YAML_KEY.match(text)
+    if key:
+        spans.append((key.start(2), key.end(2) - key.start(2), 'key'))
+        pos = key.end()
+    for match in YAML_TOKEN.finditer(text, pos):
+        spans.append((match.start(), match.end() - match.start(), match.lastgroup))
+    if key and YAML_BLOCK_SCALAR.search(text, key.end() - 1):
+        return spans, indent + 1
+    return spans, 0
+
+
+LOG_TOKEN = re.compile(r'''
+    (?P<timestamp>^\[?\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\]?)
+  | (?P<error>\b(?:ERROR|FATAL|CRITICAL|SEVERE|Exception|Traceback)\b)
+  | (?P<warning>\bWARN(?:ING)?\b)
+  | (?P<info>\bINFO\b)
+  | (?P<debug>\b(?:DEBUG|TRACE)\b)
+  | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+''', re.X)
+
+
+def tokenize_log(text, state):
+    return [(m.start(), m.end() - m.start(), m.lastgroup) for m in LOG_TOKEN.finditer(text)], 0
+
+
+LEXERS = {
+    'python': tokenize_python,
+    'json': tokenize_json,
+    'yaml': tokenize_yaml,
+    'log': tokenize_log,
+}
+STATEFUL_LANGUAGES = {'python', 'yaml'}
+
+
+def _char_format(color, bold=False, italic=False):
+    char_format = QTextCharFormat()
+    char_format.setForeground(QColor(color))
+    if bold:
+        char_format.setFontWeight(QFont.Bold)
+    char_format.setFontItalic(italic)
+    return char_format
+
+
+FORMATS = {
+    'keyword': _char_format('#0033b3', bold=True),
+    'builtin': _char_format('#7b1fa2'),
+    'string': _char_format('#067d17'),
+    'comment': _char_format('#8c8c8c', italic=True),
+    'number': _char_format('#1750eb'),
+    'key': _char_format('#871094'),
+    'decorator': _char_format('#9e880d'),
+    'timestamp': _char_format('#8c8c8c'),
+    'error': _char_format('#d32f2f', bold=True),
+    'warning': _char_format('#e65100', bold=True),
+    'info': _char_format('#1565c0'),
+    'debug': _char_format('#757575'),
+}
+
+
+class ScanSignals(QObject):
+    states_ready = pyqtSignal(int, int, list) # revision, first block, end states
+
+
+class StateScanTask(QRunnable):
+    """Computes lexer end states for a run of lines, without any formatting."""
+
+    def __init__(self, tokenize, lines, first, start_state, revision, signals):
+        super().__init__()
+        self.tokenize = tokenize
+        self.lines = lines
+        self.first = first
+        self.start_state = start_state
+        self.revision = revision
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        states = []
+        state = self.start_state
+        tokenize = self.tokenize
+        for line in self.lines:
+            if self.cancelled:
+                return
+            state = tokenize(line, state)[1]
+            states.append(state)
+        self.signals.states_ready.emit(self.revision, self.first, states)
+
+
+class ViewportHighlighter(QObject):
+    """Highlights only the blocks around the viewport of a QPlainTextEdit.
+
+    End states are cached per block in `states`, and `valid_upto` marks how
+    many leading blocks have trustworthy states. An edit invalidates the
+    states from the edited block on, but once a recomputed state matches the
+    cached one again, everything below is valid without being re-tokenized.
+    Long runs of unknown state are scanned on a worker thread.
+    """
+
+    def __init__(self, editor, language, line_index):
+        super().__init__(editor)
+        self.editor = editor
+        self.document = editor.document()
+        self.language = language
+        self.tokenize = LEXERS[language]
+        self.line_index = line_index # search.BufferIndex of the editor
+        self.states = [None] * self.document.blockCount()
+        self.valid_upto = 0
+        self.converge_until = 0 # Old states below an edit may still match up to here
+        self.formatted = set()
+        self.provisional = set() # Formatted with a guessed state while a scan runs
+        self.scan_task = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.scan_signals = ScanSignals()
+        self.scan_signals.states_ready.connect(self._apply_scanned_states)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.highlight_viewport)
+        self.document.contentsChange.connect(self._on_contents_change)
+        self.editor.verticalScrollBar().valueChanged.connect(self.highlight_viewport)
+        self.editor.updateRequest.connect(self._on_update_request)
+        self.highlight_viewport()
+
+    def stop(self):
+        """Cancel a running state scan and wait for the worker to return."""
+        self.timer.stop()
+        if self.scan_task is not None:
+            self.scan_task.cancelled = True
+        self.pool.waitForDone()
+
+    def detach(self):
+        self.document.contentsChange.disconnect(self._on_contents_change)
+        self.editor.verticalScrollBar().valueChanged.disconnect(self.highlight_viewport)
+        self.editor.updateRequest.disconnect(self._on_update_request)
+        self.stop()
+        block = self.document.begin()
+        while block.isValid():
+            if block.layout().formats():
+                block.layout().clearFormats()
+                self.document.markContentsDirty(block.position(), block.length())
+            block = block.next()
+
+    def _on_update_request(self, rect, dy):
+        # Resizes and wrapping changes can reveal blocks without scrolling
+        if not self.timer.isActive():
+            self.timer.start(0)
+
+    def _on_contents_change(self, position, removed, added):
+        doc = self.document
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + added).blockNumber()
+        if first == -1:
+            first = doc.blockCount() - 1
+        if last == -1:
+            last = doc.blockCount() - 1
+        delta = doc.blockCount() - len(self.states)
+        self.states[first:last + 1 - delta] = [None] * (last - first + 1)
+        if self.valid_upto > first:
+            self.converge_until = self.valid_upto + delta
+            self.valid_upto = first
+        elif self.converge_until > first:
+            self.converge_until = first
+        self.formatted.clear()
+        self.provisional.clear()
+        self.timer.start(0)
+
+    def _visible_range(self):
+        first = self.editor.firstVisibleBlock().blockNumber()
+        visible = self.editor.viewport().height() // max(1, self.editor.fontMetrics().lineSpacing()) + 1
+        count = self.document.blockCount()
+        return max(0, first - VIEWPORT_MARGIN), min(count, first + visible + VIEWPORT_MARGIN)
+
+    def _extend_states(self, upto):
+        """Compute end states of blocks [valid_upto, upto) on this thread."""
+        lines = self.line_index.lines
+        tokenize = self.tokenize
+        state = self.states[self.valid_upto - 1] if self.valid_upto else 0
+        number = self.valid_upto
+        while number < upto:
+            state = tokenize(lines[number], state)[1]
+            if number < self.converge_until and self.states[number] == state:
+                # Same state as before the edit, so the old states below still hold
+                self.valid_upto = self.converge_until
+                return
+            self.states[number] = state
+            number += 1
+        self.valid_upto = number
+
+    def highlight_viewport(self):
+        if len(self.states) != self.document.blockCount() or len(self.line_index.lines) != len(self.states):
+            self.timer.start(0) # Called in the middle of an edit
+            return
+        first, end = self._visible_range()
+        provisional = False
+        if self.valid_upto < first:
+            if self.language not in STATEFUL_LANGUAGES:
+                self.valid_upto = first # No lexer state to carry between lines
+            elif first - self.valid_upto <= SYNC_SCAN_LIMIT:
+                self._extend_states(first)
+            else:
+                self._start_scan()
+                provisional = True
+        if self.valid_upto < first:
+            provisional = True
+
+        block = self.document.findBlockByNumber(first)
+        state = self.states[first - 1] if first and not provisional else 0
+        for number in range(first, end):
+            if number in self.formatted or (provisional and number in self.provisional):
+                state = self.states[number]
+                block = block.next()
+                continue
+            spans, state = self.tokenize(block.text(), state or 0)
+            self._apply_formats(block, spans)
+            if not provisional:
+                if number >= self.valid_upto:
+                    if number < self.converge_until and self.states[number] == state:
+                        self.valid_upto = self.converge_until
+                    else:
+                        self.states[number] = state
+                        self.valid_upto = number + 1
+                self.formatted.add(number)
+            else:
+                self.provisional.add(number)
+            block = block.next()
+
+    def _apply_formats(self, block, spans):
+        ranges = []
+        for start, length, kind in spans:
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = FORMATS[kind]
+            ranges.append(format_range)
+        layout = block.layout()
+        if ranges or layout.formats():
+            layout.setFormats(ranges)
+            self.document.markContentsDirty(block.position(), block.length())
+
+    def _start_scan(self):
+        if self.scan_task is not None:
+            return
+        first = self.valid_upto
+        start_state = self.states[first - 1] if first else 0
+        lines = self.line_index.lines[first:]
+        self.scan_task = StateScanTask(self.tokenize, lines, first, start_state,
+                                       self.document.revision(), self.scan_signals)
+        self.pool.start(self.scan_task)
+
+    def _apply_scanned_states(self, revision, first, states):
+        self.scan_task = None
+        if revision != self.document.revision() or first > self.valid_upto:
+            self.timer.start(0) # The text changed meanwhile, scan again from the new state
+            return
+        # States computed on this thread while the scan ran are identical, so they can be overwritten
+        self.states[first:first + len(states)] = states
+        self.valid_upto = max(self.valid_upto, first + len(states))
+        self.converge_until = 0
+        self.formatted.clear()
+        self.provisional.clear()
+        self.highlight_viewport()
@@ -0,0 +1,302 @@
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+
+from PyQt5.QtWidgets import QAbstractScrollArea, QApplication
+from PyQt5.QtGui import QPainter, QPalette, QKeySequence
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+
+LARGE_FILE_THRESHOLD = 32 * 1024 * 1024 # Files at least this big open in the large-file viewer
+INDEX_BLOCK_SIZE = 64 * 1024 # Bytes covered by one line-index checkpoint
+INDEX_CHUNK_SIZE = 64 * INDEX_BLOCK_SIZE # Bytes copied out of the map per indexing step
+MAX_LINE_BYTES = 16 * 1024 # Longer lines are truncated for display
+MAX_COPY_LINES = 100000 # Upper bound for a single copy from the viewer
+
+
+class LargeFileDocument:
+    """Read-only, memory-mapped file addressed by line number.
+
+    Instead of one offset per line, the index stores how many newlines come
+    before each INDEX_BLOCK_SIZE block of the file. It stays a few hundred KB
+    even for multi-GB files, and a line is located by jumping to its block and
+    scanning at most one block forward.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.size = os.path.getsize(file_path)
+        self._file = open(file_path, 'rb')
+        if self.size:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.mm = b''
+        # block_newlines[i] is the number of newlines before block i
+        self.block_newlines = array('q', [0])
+        self.indexed_bytes = 0
+        self.index_complete = self.size == 0
+
+    def line_count(self):
+        # Every indexed newline starts a new line, like QTextDocument blocks
+        return self.block_newlines[-1] + 1
+
+    def line_offset(self, line):
+        """Return the byte offset where `line` starts, or None if not indexed yet."""
+        if line <= 0:
+            return 0
+        if line >= self.line_count():
+            return None
+        block = bisect_right(self.block_newlines, line - 1) - 1
+        pos = block * INDEX_BLOCK_SIZE
+        for _ in range(line - self.block_newlines[block]):
+            pos = self.mm.find(b'\n', pos) + 1
+        return pos
+
+    def lines(self, first, count):
+        """Decode up to `count` lines starting at line `first`."""
+        pos = self.line_offset(first)
+        if pos is None:
+            return []
+        result = []
+        while len(result) < count and pos <= self.size:
+            end = self.mm.find(b'\n', pos)
+            if end == -1:
+                end = self.size
+            raw = self.mm[pos:min(end, pos + MAX_LINE_BYTES)]
+            result.append(raw.decode('utf-8', errors='replace').rstrip('\r'))
+            pos = end + 1
+        return result
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self._file.close()
+
+
+class LineIndexer(QThread):
+    progress_signal = pyqtSignal(int) # Bytes indexed so far
+
+    def __init__(self, document):
+        super().__init__()
+        self.document = document
+
+    def run(self):
+        doc = self.document
+        newlines = 0
+        pos = 0
+        while pos < doc.size and not self.isInterruptionRequested():
+            chunk = doc.mm[pos:pos + INDEX_CHUNK_SIZE]
+            for start in range(0, len(chunk), INDEX_BLOCK_SIZE):
+                newlines += chunk.count(b'\n', start, start + INDEX_BLOCK_SIZE)
+                doc.block_newlines.append(newlines)
+            pos += len(chunk)
+            doc.indexed_bytes = pos
+            self.progress_signal.emit(pos)
+        doc.index_complete = pos >= doc.size
+
+
+class LargeFileViewer(QAbstractScrollArea):
+    """Read-mostly viewer that only decodes the lines currently on screen."""
+
+    cursorPositionChanged = pyqtSignal()
+    index_progress = pyqtSignal(int, int) # Indexed bytes, total bytes
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.modified = False
+        self.document = LargeFileDocument(file_path)
+
+        self.cursor_line = 0
+        self.cursor_column = 0
+        self.anchor_line = 0
+        self._window = None # (first line, lines) decoded for the last paint
+        self._pending_position = None # Requested position beyond the indexed lines
+        self._content_width = 0
+
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.verticalScrollBar().setSingleStep(1)
+
+        self.indexer = LineIndexer(self.document)
+        self.indexer.progress_signal.connect(self._on_index_progress)
+        self.indexer.finished.connect(self._on_index_finished)
+        self.indexer.start()
+        self._update_scroll_ranges()
+
+    # QPlainTextEdit-compatible surface used by the notepad's actions
+    def undo(self):
+        pass
+
+    def redo(self):
+        pass
+
+    def cut(self):
+        self.copy()
+
+    def paste(self):
+        pass
+
+    def setLineWrapMode(self, mode):
+        pass # Lines are never wrapped in the large-file viewer
+
+    def copy(self):
+        first = min(self.anchor_line, self.cursor_line)
+        last = max(self.anchor_line, self.cursor_line)
+        count = min(last - first + 1, MAX_COPY_LINES)
+        QApplication.clipboard().setText('\n'.join(self.document.lines(first, count)))
+
+    def cursor_position(self):
+        return self.cursor_line, self.cursor_column
+
+    def go_to_line(self, line, column=0):
+        if line >= self.document.line_count() and not self.document.index_complete:
+            self._pending_position = (line, column)
+        else:
+            self._move_cursor(line, column)
+
+    def close_document(self):
+        self.indexer.requestInterruption()
+        self.indexer.wait()
+        self.document.close()
+
+    def _on_index_progress(self, indexed_bytes):
+        self._update_scroll_ranges()
+        self._apply_pending_position()
+        self.index_progress.emit(indexed_bytes, self.document.size)
+
+    def _on_index_finished(self):
+        self._update_scroll_ranges()
+        self._apply_pending_position()
+        self.index_progress.emit(self.document.indexed_bytes, self.document.size)
+
+    def _apply_pending_position(self):
+        if self._pending_position is not None:
+            line, column = self._pending_position
+            if line < self.document.line_count() or self.document.index_complete:
+                self._pending_position = None
+                self._move_cursor(line, column)
+
+    def _visible_line_count(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def _update_scroll_ranges(self):
+        visible = self._visible_line_count()
+        vbar = self.verticalScrollBar()
+        vbar.setPageStep(visible)
+        vbar.setRange(0, max(0, self.document.line_count() - visible))
+        hbar = self.horizontalScrollBar()
+        hbar.setPageStep(self.viewport().width())
+        hbar.setRange(0, max(0, self._content_width - self.viewport().width()))
+
+    def _visible_lines(self):
+        first = self.verticalScrollBar().value()
+        count = self._visible_line_count() + 1
+        if self._window is None or self._window[0] != first or len(self._window[1]) < count:
+            lines = [line.expandtabs(4) for line in self.document.lines(first, count)]
+            self._window = (first, lines)
+        return self._window
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scroll_ranges()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == event.FontChange:
+            self._content_width = 0
+            self._update_scroll_ranges()
+            self.viewport().update()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.Base))
+
+        fm = self.fontMetrics()
+        line_height = fm.lineSpacing()
+        first, lines = self._visible_lines()
+        x = 4 - self.horizontalScrollBar().value()
+        width = self.viewport().width()
+        sel_first = min(self.anchor_line, self.cursor_line)
+        sel_last = max(self.anchor_line, self.cursor_line)
+
+        for i, text in enumerate(lines):
+            line = first + i
+            top = i * line_height
+            if sel_first != sel_last and sel_first <= line <= sel_last:
+                painter.fillRect(0, top, width, line_height, palette.color(QPalette.Highlight))
+                painter.setPen(palette.color(QPalette.HighlightedText))
+            else:
+                if line == self.cursor_line:
+                    painter.fillRect(0, top, width, line_height, palette.color(QPalette.AlternateBase))
+                painter.setPen(palette.color(QPalette.Text))
+            painter.drawText(x, top + fm.ascent(), text)
+            self._content_width = max(self._content_width, fm.horizontalAdvance(text) + 8)
+        painter.end()
+        self.horizontalScrollBar().setRange(0, max(0, self._content_width - width))
+
+    def _position_at(self, point):
+        first, lines = self._visible_lines()
+        index = max(0, point.y()) // self.fontMetrics().lineSpacing()
+        line = min(first + index, self.document.line_count() - 1)
+        text = lines[index] if index < len(lines) else ''
+        # Binary search the column whose prefix width reaches the click position
+        target = point.x() - 4 + self.horizontalScrollBar().value()
+        fm = self.fontMetrics()
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fm.horizontalAdvance(text[:mid + 1]) <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return line, lo
+
+    def _move_cursor(self, line, column=0, keep_anchor=False):
+        self.cursor_line = max(0, min(line, self.document.line_count() - 1))
+        self.cursor_column = column
+        if not keep_anchor:
+            self.anchor_line = self.cursor_line
+        vbar = self.verticalScrollBar()
+        visible = self._visible_line_count()
+        if self.cursor_line < vbar.value():
+            vbar.setValue(self.cursor_line)
+        elif self.cursor_line >= vbar.value() + visible:
+            vbar.setValue(self.cursor_line - visible + 1)
+        self.viewport().update()
+        self.cursorPositionChanged.emit()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            line, column = self._position_at(event.pos())
+            self._move_cursor(line, column, keep_anchor=bool(event.modifiers() & Qt.ShiftModifier))
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            line, column = self._position_at(event.pos())
+            self._move_cursor(line, column, keep_anchor=True)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        keep_anchor = bool(event.modifiers() & Qt.ShiftModifier)
+        page = self._visible_line_count()
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+        elif key == Qt.Key_Up:
+            self._move_cursor(self.cursor_line - 1, keep_anchor=keep_anchor)
+        elif key == Qt.Key_Down:
+            self._move_cursor(self.cursor_line + 1, keep_anchor=keep_anchor)
+        elif key == Qt.Key_PageUp:
+            self._move_cursor(self.cursor_line - page, keep_anchor=keep_anchor)
+        elif key == Qt.Key_PageDown:
+            self._move_cursor(self.cursor_line + page, keep_anchor=keep_anchor)
+        elif key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            self._move_cursor(0, keep_anchor=keep_anchor)
+        elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            self._move_cursor(self.document.line_count() - 1, keep_anchor=keep_anchor)
+        else:
+            super().keyPressEvent(event)
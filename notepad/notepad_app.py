@@ -1,14 +1,27 @@
 import os
+import uuid
 from PyQt5.QtWidgets import (
-    QMainWindow, QApplication, QAction, QTextEdit, QTabWidget,
-    QFileDialog, QMessageBox, QFontDialog, QWidget, QVBoxLayout, QLabel
+    QMainWindow, QApplication, QAction, QPlainTextEdit, QTabWidget,
+    QFileDialog, QMessageBox, QFontDialog, QWidget, QVBoxLayout, QLabel,
+    QProgressBar, QPushButton
 )
-from PyQt5.QtGui import QIcon, QTextCursor
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon, QTextCursor, QFont
+from PyQt5.QtCore import Qt, QEventLoop, QTimer
+from large_file import LargeFileViewer, LARGE_FILE_THRESHOLD
+from file_io import FileLoadThread, FileSaveThread
+from edit_tracking import UpdateScheduler, ModifiedTracker
+from search import SearchPanel, buffer_index
+from session import SessionStore, AUTOSAVE_INTERVAL
+from highlighter import ViewportHighlighter, language_for_path
 
 class NotepadApp(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.io_threads = [] # Background load/save threads that are still running
+        self.dirty_editors = set() # Editors whose modified state needs rechecking
+        self.update_scheduler = UpdateScheduler(self.apply_pending_updates, parent=self)
+        self.session_store = SessionStore()
+        self.restoring_session = False
         self.initUI()
 
     def initUI(self):
@@ -18,14 +31,23 @@ class NotepadApp(QMainWindow):
         self.tab_widget = QTabWidget()
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
-        self.tab_widget.currentChanged.connect(self.update_status_bar)
+        self.tab_widget.currentChanged.connect(self.update_scheduler.schedule)
+        self.tab_widget.currentChanged.connect(self.ensure_tab_loaded)
         self.setCentralWidget(self.tab_widget)
 
+        self.search_panel = SearchPanel(self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.search_panel)
+        self.search_panel.hide()
+
         self.create_actions()
         self.create_menu_bar()
         self.create_status_bar()
 
-        self.new_tab() # Start with one new tab
+        self.restore_session()
+
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.save_session)
+        self.autosave_timer.start(AUTOSAVE_INTERVAL)
 
     def create_actions(self):
         # File actions
@@ -75,6 +97,23 @@ class NotepadApp(QMainWindow):
         self.paste_action.setShortcut('Ctrl+V')
         self.paste_action.triggered.connect(lambda: self.current_text_edit().paste())
 
+        self.find_action = QAction('찾기', self)
+        self.find_action.setShortcut('Ctrl+F')
+        self.find_action.setStatusTip('찾기 창 열기')
+        self.find_action.triggered.connect(self.search_panel.show_find)
+
+        self.find_next_action = QAction('다음 찾기', self)
+        self.find_next_action.setShortcut('F3')
+        self.find_next_action.triggered.connect(self.search_panel.find_next)
+
+        self.replace_action = QAction('바꾸기', self)
+        self.replace_action.setShortcut('Ctrl+H')
+        self.replace_action.triggered.connect(self.show_replace)
+
+        self.find_all_tabs_action = QAction('모든 탭에서 찾기', self)
+        self.find_all_tabs_action.setShortcut('Ctrl+Shift+F')
+        self.find_all_tabs_action.triggered.connect(self.show_find_in_all_tabs)
+
         # Format actions
         self.font_action = QAction('글꼴', self)
         self.font_action.setStatusTip('글꼴 설정')
@@ -103,6 +142,11 @@ class NotepadApp(QMainWindow):
         edit_menu.addAction(self.cut_action)
         edit_menu.addAction(self.copy_action)
         edit_menu.addAction(self.paste_action)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.find_action)
+        edit_menu.addAction(self.find_next_action)
+        edit_menu.addAction(self.replace_action)
+        edit_menu.addAction(self.find_all_tabs_action)
 
         format_menu = menubar.addMenu('서식')
         format_menu.addAction(self.font_action)
@@ -110,18 +154,36 @@ class NotepadApp(QMainWindow):
 
     def create_status_bar(self):
         self.statusBar()
+        self.io_progress_bar = QProgressBar()
+        self.io_progress_bar.setMaximumWidth(150)
+        self.io_progress_bar.hide()
+        self.io_cancel_button = QPushButton("취소")
+        self.io_cancel_button.clicked.connect(self.cancel_io)
+        self.io_cancel_button.hide()
         self.cursor_pos_label = QLabel("줄: 1, 열: 1")
+        self.statusBar().addPermanentWidget(self.io_progress_bar)
+        self.statusBar().addPermanentWidget(self.io_cancel_button)
         self.statusBar().addPermanentWidget(self.cursor_pos_label)
 
     def new_tab(self, file_path=None, content=""):
-        text_edit = QTextEdit()
+        text_edit = QPlainTextEdit()
         text_edit.textChanged.connect(lambda: self.handle_text_changed(text_edit))
-        text_edit.cursorPositionChanged.connect(self.update_status_bar)
+        text_edit.cursorPositionChanged.connect(self.update_scheduler.schedule)
 
         # Store file path and modified status directly on the text_edit widget
         text_edit.file_path = file_path
         text_edit.modified = False
+        text_edit.io_thread = None
+        text_edit.session_key = uuid.uuid4().hex
+        text_edit.session_entry = None # Set while the tab waits to be restored
+        text_edit.snapshot_revision = None
+        text_edit.restore_position = None
+        text_edit.highlighter = None
+        text_edit.modified_tracker = ModifiedTracker()
         text_edit.setPlainText(content)
+        text_edit.modified_tracker.mark_document_saved(text_edit.document())
+        self.dirty_editors.discard(text_edit)
+        text_edit.modified = False # setPlainText() itself emits textChanged
 
         # Ensure title is a string before passing to os.path.basename
         tab_title = "새 파일"
@@ -132,14 +194,64 @@ class NotepadApp(QMainWindow):
         self.tab_widget.setCurrentIndex(tab_index)
         self.update_tab_title(text_edit)
         self.update_status_bar()
+        if content:
+            self.attach_highlighter(text_edit)
+        return text_edit
+
+    def attach_highlighter(self, text_edit):
+        # Called once the content is in place, so loading never tokenizes chunk by chunk
+        language = language_for_path(text_edit.file_path)
+        highlighter = text_edit.highlighter
+        if highlighter is not None and highlighter.language == language:
+            return
+        if highlighter is not None:
+            highlighter.detach()
+            text_edit.highlighter = None
+        if language:
+            text_edit.highlighter = ViewportHighlighter(text_edit, language, buffer_index(text_edit))
 
     def current_text_edit(self):
         return self.tab_widget.currentWidget()
 
+    def go_to_editor(self, text_edit):
+        index = self.tab_widget.indexOf(text_edit)
+        if index != -1:
+            self.tab_widget.setCurrentIndex(index)
+
+    def select_range(self, text_edit, line, column, length):
+        if isinstance(text_edit, LargeFileViewer):
+            text_edit.go_to_line(line, column)
+        else:
+            block = text_edit.document().findBlockByNumber(line)
+            cursor = QTextCursor(block)
+            cursor.setPosition(block.position() + column)
+            cursor.setPosition(block.position() + column + length, QTextCursor.KeepAnchor)
+            text_edit.setTextCursor(cursor)
+        text_edit.setFocus()
+
+    def show_replace(self):
+        self.search_panel.show_find()
+        self.search_panel.replace_input.setFocus()
+
+    def show_find_in_all_tabs(self):
+        self.search_panel.show_find()
+        self.search_panel.find_in_all_tabs() # Does nothing until there is text to find
+
     def handle_text_changed(self, text_edit):
-        if not text_edit.modified:
-            text_edit.modified = True
-            self.update_tab_title(text_edit)
+        if isinstance(text_edit.io_thread, FileLoadThread):
+            return # Text arriving from the loader is not a user edit
+        # The actual check runs at most once per frame in apply_pending_updates
+        self.dirty_editors.add(text_edit)
+        self.update_scheduler.schedule()
+
+    def apply_pending_updates(self):
+        for text_edit in self.dirty_editors:
+            modified = text_edit.modified_tracker.is_modified(text_edit.document())
+            if modified != text_edit.modified:
+                text_edit.modified = modified
+                self.update_tab_title(text_edit)
+        self.dirty_editors.clear()
+        self.update_status_bar()
 
     def update_tab_title(self, text_edit):
         index = self.tab_widget.indexOf(text_edit)
@@ -151,7 +263,10 @@ class NotepadApp(QMainWindow):
 
     def update_status_bar(self):
         text_edit = self.current_text_edit()
-        if text_edit:
+        if isinstance(text_edit, LargeFileViewer):
+            line, col = text_edit.cursor_position()
+            self.cursor_pos_label.setText(f"줄: {line + 1}, 열: {col + 1}")
+        elif text_edit:
             cursor = text_edit.textCursor()
             line = cursor.blockNumber() + 1
             col = cursor.columnNumber() + 1
@@ -163,16 +278,112 @@ class NotepadApp(QMainWindow):
         file_path, _ = QFileDialog.getOpenFileName(self, "파일 열기", "", "모든 파일 (*);;텍스트 파일 (*.txt)")
         if file_path:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.new_tab(file_path, content)
+                if os.path.getsize(file_path) >= LARGE_FILE_THRESHOLD:
+                    self.open_large_file(file_path)
+                else:
+                    self.load_file(file_path)
             except Exception as e:
                 QMessageBox.critical(self, "오류", f"파일을 열 수 없습니다: {e}")
 
+    def load_file(self, file_path, text_edit=None):
+        # The file is decoded in chunks on a worker thread and appended as it arrives
+        if text_edit is None:
+            text_edit = self.new_tab(file_path)
+        text_edit.setReadOnly(True)
+        text_edit.setUndoRedoEnabled(False)
+        thread = FileLoadThread(file_path)
+        thread.chunk_signal.connect(lambda chunk: self.append_loaded_text(text_edit, chunk))
+        thread.error_signal.connect(lambda message: self.handle_load_error(text_edit, message))
+        thread.finished.connect(lambda: self.finish_load(text_edit))
+        self.start_io_thread(text_edit, thread, f"'{os.path.basename(file_path)}' 여는 중...")
+        return text_edit
+
+    def append_loaded_text(self, text_edit, chunk):
+        cursor = QTextCursor(text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(chunk)
+
+    def handle_load_error(self, text_edit, message):
+        QMessageBox.critical(self, "오류", f"파일을 열 수 없습니다: {message}")
+        index = self.tab_widget.indexOf(text_edit)
+        if index != -1:
+            self.tab_widget.removeTab(index)
+
+    def finish_load(self, text_edit):
+        cancelled = text_edit.io_thread.isInterruptionRequested()
+        text_edit.setUndoRedoEnabled(True)
+        text_edit.setReadOnly(False)
+        text_edit.moveCursor(QTextCursor.Start)
+        if text_edit.restore_position is not None:
+            self.restore_cursor(text_edit, text_edit.restore_position)
+            text_edit.restore_position = None
+        text_edit.modified_tracker.mark_document_saved(text_edit.document())
+        self.finish_io_thread(text_edit)
+        index = self.tab_widget.indexOf(text_edit)
+        if cancelled and index != -1:
+            # A partially loaded tab must never be saved over the original file
+            self.tab_widget.removeTab(index)
+        elif not cancelled:
+            self.attach_highlighter(text_edit)
+
+    def start_io_thread(self, text_edit, thread, message):
+        text_edit.io_thread = thread
+        self.io_threads.append(thread)
+        thread.progress_signal.connect(self.io_progress_bar.setValue)
+        self.io_progress_bar.setValue(0)
+        self.io_progress_bar.show()
+        self.io_cancel_button.show()
+        self.statusBar().showMessage(message)
+        thread.start()
+
+    def finish_io_thread(self, text_edit):
+        thread = text_edit.io_thread
+        text_edit.io_thread = None
+        if thread in self.io_threads:
+            self.io_threads.remove(thread)
+        if not self.io_threads:
+            self.io_progress_bar.hide()
+            self.io_cancel_button.hide()
+            self.statusBar().clearMessage()
+
+    def cancel_io(self):
+        for thread in self.io_threads:
+            thread.requestInterruption()
+        self.statusBar().showMessage("작업이 취소되었습니다", 2000)
+
+    def wait_for_io(self, text_edit):
+        # Keep the event loop running until the tab's load or save completes
+        thread = text_edit.io_thread
+        if thread is not None:
+            loop = QEventLoop()
+            thread.finished.connect(loop.quit)
+            if thread.isRunning():
+                loop.exec_()
+            QApplication.processEvents() # Deliver the thread's queued results
+
+    def open_large_file(self, file_path, index=-1):
+        # Large files are memory-mapped and shown read-only, one screen at a time
+        viewer = LargeFileViewer(file_path)
+        viewer.cursorPositionChanged.connect(self.update_scheduler.schedule)
+        viewer.index_progress.connect(self.update_index_progress)
+        tab_index = self.tab_widget.insertTab(index, viewer, os.path.basename(file_path))
+        self.tab_widget.setCurrentIndex(tab_index)
+        self.update_status_bar()
+        return viewer
+
+    def update_index_progress(self, indexed_bytes, total_bytes):
+        if indexed_bytes >= total_bytes:
+            self.statusBar().showMessage("줄 인덱스 생성 완료", 2000)
+        else:
+            self.statusBar().showMessage(f"줄 인덱스 생성 중... {indexed_bytes * 100 // total_bytes}%")
+
     def save_file(self):
         text_edit = self.current_text_edit()
         if not text_edit:
             return
+        if isinstance(text_edit, LargeFileViewer):
+            self.statusBar().showMessage("대용량 파일은 읽기 전용으로 열립니다", 2000)
+            return
 
         if text_edit.file_path:
             self._save_to_path(text_edit.file_path, text_edit)
@@ -181,7 +392,7 @@ class NotepadApp(QMainWindow):
 
     def save_file_as(self):
         text_edit = self.current_text_edit()
-        if not text_edit:
+        if not text_edit or isinstance(text_edit, LargeFileViewer):
             return
 
         file_path, _ = QFileDialog.getSaveFileName(self, "다른 이름으로 저장", "", "모든 파일 (*);;텍스트 파일 (*.txt)")
@@ -189,18 +400,138 @@ class NotepadApp(QMainWindow):
             self._save_to_path(file_path, text_edit)
 
     def _save_to_path(self, file_path, text_edit):
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(text_edit.toPlainText())
-            text_edit.file_path = file_path
-            text_edit.modified = False
+        if text_edit.io_thread is not None:
+            self.statusBar().showMessage("이 탭은 다른 파일 작업이 진행 중입니다", 2000)
+            return
+        # The worker encodes a snapshot, so edits made during the save keep the tab modified
+        thread = FileSaveThread(text_edit.document().clone(), file_path)
+        thread.saved_signal.connect(lambda path: self.handle_saved(text_edit, path, thread))
+        thread.error_signal.connect(lambda message: QMessageBox.critical(self, "오류", f"파일을 저장할 수 없습니다: {message}"))
+        thread.finished.connect(lambda: self.finish_io_thread(text_edit))
+        self.start_io_thread(text_edit, thread, f"'{os.path.basename(file_path)}' 저장 중...")
+
+    def handle_saved(self, text_edit, file_path, thread):
+        text_edit.file_path = file_path
+        text_edit.modified_tracker.mark_saved(thread.content_length, thread.content_hash)
+        text_edit.modified = text_edit.modified_tracker.is_modified(text_edit.document())
+        self.update_tab_title(text_edit)
+        self.attach_highlighter(text_edit) # Save As may have changed the file type
+        self.statusBar().showMessage(f"'{os.path.basename(file_path)}' 저장됨", 2000)
+
+    def restore_session(self):
+        # Tabs are created empty right away; their content is loaded on first activation
+        entries, current = self.session_store.load()
+        self.restoring_session = True
+        for entry in entries:
+            text_edit = self.new_tab(entry.get('file_path'))
+            text_edit.session_entry = entry
+            text_edit.modified = bool(entry.get('snapshot'))
+            if entry.get('font'):
+                font = QFont()
+                font.fromString(entry['font'])
+                text_edit.setFont(font)
+            self.update_tab_title(text_edit)
+        self.restoring_session = False
+        if not entries:
+            self.new_tab() # Start with one new tab
+        self.tab_widget.setCurrentIndex(min(current, self.tab_widget.count() - 1))
+        self.ensure_tab_loaded(self.tab_widget.currentIndex())
+
+    def ensure_tab_loaded(self, index):
+        text_edit = self.tab_widget.widget(index)
+        if self.restoring_session or text_edit is None or getattr(text_edit, 'session_entry', None) is None:
+            return
+        entry = text_edit.session_entry
+        text_edit.session_entry = None
+        file_path = entry.get('file_path')
+        if entry.get('snapshot'):
+            text_edit.setPlainText(self.session_store.read_snapshot(entry['snapshot']))
+            text_edit.session_key = os.path.splitext(entry['snapshot'])[0]
+            text_edit.snapshot_revision = text_edit.document().revision()
+            tracker = text_edit.modified_tracker
+            tracker.mark_saved(entry['saved_length'], bytes.fromhex(entry['saved_hash']))
+            text_edit.modified = tracker.is_modified(text_edit.document())
             self.update_tab_title(text_edit)
-            self.statusBar().showMessage(f"'{os.path.basename(file_path)}' 저장됨", 2000)
-        except Exception as e:
-            QMessageBox.critical(self, "오류", f"파일을 저장할 수 없습니다: {e}")
+            self.restore_cursor(text_edit, entry.get('cursor', 0))
+            self.attach_highlighter(text_edit)
+        elif file_path and os.path.exists(file_path):
+            if entry.get('large'):
+                # Swap in the viewer with signals blocked: removing the current tab makes
+                # its neighbour current, which would load that one too
+                current = self.tab_widget.currentIndex()
+                blocked = self.tab_widget.blockSignals(True)
+                self.tab_widget.removeTab(index)
+                viewer = self.open_large_file(file_path, index)
+                self.tab_widget.setCurrentIndex(current)
+                self.tab_widget.blockSignals(blocked)
+                viewer.setFont(text_edit.font())
+                viewer.go_to_line(entry.get('line', 0))
+                text_edit.deleteLater()
+            else:
+                text_edit.restore_position = entry.get('cursor', 0)
+                self.load_file(file_path, text_edit)
+        else:
+            self.statusBar().showMessage(f"'{file_path}' 파일을 찾을 수 없어 탭을 닫습니다", 3000)
+            QTimer.singleShot(0, lambda: self.remove_tab_widget(text_edit))
+
+    def remove_tab_widget(self, widget):
+        index = self.tab_widget.indexOf(widget)
+        if index != -1:
+            self.tab_widget.removeTab(index)
+
+    def restore_cursor(self, text_edit, position):
+        cursor = text_edit.textCursor()
+        cursor.setPosition(min(position, text_edit.document().characterCount() - 1))
+        text_edit.setTextCursor(cursor)
+
+    def save_session(self):
+        self.apply_pending_updates()
+        entries = []
+        current = 0
+        for i in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(i)
+            if i == self.tab_widget.currentIndex():
+                current = len(entries)
+            if isinstance(widget, LargeFileViewer):
+                entries.append({'file_path': widget.file_path, 'large': True,
+                                'line': widget.cursor_line, 'font': widget.font().toString()})
+            elif widget.session_entry is not None:
+                entries.append(widget.session_entry) # Never activated since it was restored
+            elif widget.modified and widget.io_thread is None:
+                entries.append(self._snapshot_entry(widget))
+            elif widget.file_path:
+                entries.append({'file_path': widget.file_path, 'cursor': widget.textCursor().position(),
+                                'font': widget.font().toString()})
+        try:
+            self.session_store.save(entries, current)
+        except OSError as e:
+            self.statusBar().showMessage(f"세션을 저장할 수 없습니다: {e}", 3000)
+
+    def _snapshot_entry(self, text_edit):
+        # Unsaved text is written again only if it changed since the last snapshot
+        document = text_edit.document()
+        name = text_edit.session_key + '.z'
+        if text_edit.snapshot_revision != document.revision():
+            name = self.session_store.write_snapshot(text_edit.session_key, document.toPlainText())
+            text_edit.snapshot_revision = document.revision()
+        tracker = text_edit.modified_tracker
+        return {'file_path': text_edit.file_path, 'cursor': text_edit.textCursor().position(),
+                'font': text_edit.font().toString(), 'snapshot': name,
+                'saved_length': tracker.saved_length, 'saved_hash': tracker.saved_hash.hex()}
+
+    def load_all_tabs(self):
+        for i in range(self.tab_widget.count()):
+            self.ensure_tab_loaded(i)
+            widget = self.tab_widget.widget(i)
+            if not isinstance(widget, LargeFileViewer):
+                self.wait_for_io(widget)
 
     def close_tab(self, index):
+        self.apply_pending_updates()
         text_edit = self.tab_widget.widget(index)
+        entry = getattr(text_edit, 'session_entry', None)
+        if entry is not None and entry.get('snapshot'):
+            self.ensure_tab_loaded(index) # Unsaved text must be loaded before it can be saved
         if text_edit.modified:
             reply = QMessageBox.question(self, '저장 확인',
                                          f"'{self.tab_widget.tabText(index).replace('*', '')}' 파일이 변경되었습니다. 저장하시겠습니까?",
@@ -209,30 +540,43 @@ class NotepadApp(QMainWindow):
             if reply == QMessageBox.Save:
                 self.tab_widget.setCurrentIndex(index) # Switch to the tab to save it
                 self.save_file()
+                self.wait_for_io(text_edit)
                 if text_edit.modified: # If save failed or user cancelled save dialog
                     return
             elif reply == QMessageBox.Cancel:
                 return
+        if isinstance(text_edit, LargeFileViewer):
+            # Searches may still be reading the mapped file
+            self.search_panel.engine.cancel()
+            self.search_panel.engine.wait()
+            text_edit.close_document()
+        else:
+            if text_edit.io_thread is not None:
+                text_edit.io_thread.requestInterruption()
+                self.wait_for_io(text_edit)
+            if text_edit.highlighter is not None:
+                text_edit.highlighter.stop()
+        self.dirty_editors.discard(text_edit)
         self.tab_widget.removeTab(index)
         self.update_status_bar() # Update status bar after tab is closed
 
     def closeEvent(self, event):
+        # Unsaved tabs are kept in the session instead of prompting for each one
+        self.save_session()
+        self.search_panel.engine.cancel()
+        self.search_panel.engine.wait()
         for i in range(self.tab_widget.count()):
-            text_edit = self.tab_widget.widget(i)
-            if text_edit.modified:
-                self.tab_widget.setCurrentIndex(i) # Switch to the tab to prompt for save
-                reply = QMessageBox.question(self, '저장 확인',
-                                             f"'{self.tab_widget.tabText(i).replace('*', '')}' 파일이 변경되었습니다. 저장하시겠습니까?",
-                                             QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel,
-                                             QMessageBox.Save)
-                if reply == QMessageBox.Save:
-                    self.save_file()
-                    if text_edit.modified: # If save failed or user cancelled save dialog
-                        event.ignore() # Prevent closing if save was cancelled
-                        return
-                elif reply == QMessageBox.Cancel:
-                    event.ignore() # Prevent closing
-                    return
+            widget = self.tab_widget.widget(i)
+            if isinstance(widget, LargeFileViewer):
+                widget.close_document()
+                continue
+            if widget.io_thread is not None:
+                # Unfinished loads are dropped, pending saves are allowed to complete
+                if isinstance(widget.io_thread, FileLoadThread):
+                    widget.io_thread.requestInterruption()
+                widget.io_thread.wait()
+            if widget.highlighter is not None:
+                widget.highlighter.stop()
         event.accept()
 
     def set_font(self):
@@ -246,6 +590,6 @@ class NotepadApp(QMainWindow):
         text_edit = self.current_text_edit()
         if text_edit:
             if self.word_wrap_action.isChecked():
-                text_edit.setWordWrapMode(QTextEdit.WidgetWidth)
+                text_edit.setLineWrapMode(QPlainTextEdit.WidgetWidth)
             else:
-                text_edit.setWordWrapMode(QTextEdit.NoWrap)
+                text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
@@ -0,0 +1,412 @@
+import re
+import threading
+
+from PyQt5.QtWidgets import (
+    QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
+    QCheckBox, QTreeWidget, QTreeWidgetItem, QLabel
+)
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from large_file import LargeFileViewer
+
+HIT_BATCH_SIZE = 500 # Hits sent to the results panel per signal
+MAX_RESULTS = 10000 # A search stops once this many hits were found
+MAPPED_CHUNK_SIZE = 4 * 1024 * 1024 # Bytes of a memory-mapped file searched at once
+MAX_PREVIEW_LENGTH = 200
+
+
+def compile_pattern(text, regex=False, case_sensitive=False, binary=False):
+    """Compile the search text, as bytes for memory-mapped files."""
+    source = text if regex else re.escape(text)
+    if binary:
+        source = source.encode('utf-8')
+    return re.compile(source, 0 if case_sensitive else re.IGNORECASE)
+
+
+class BufferIndex:
+    """Line list of an editor's document, kept current from contentsChange.
+
+    Searches run on a cheap copy of this list instead of toPlainText(), and an
+    edit only replaces the lines of the blocks it touched.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.lines = document.toPlainText().split('\n')
+        document.contentsChange.connect(self._on_contents_change)
+
+    def _on_contents_change(self, position, removed, added):
+        doc = self.document
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + added).blockNumber()
+        if first == -1:
+            first = doc.blockCount() - 1
+        if last == -1:
+            last = doc.blockCount() - 1
+        delta = doc.blockCount() - len(self.lines)
+        block = doc.findBlockByNumber(first)
+        new_lines = []
+        for _ in range(last - first + 1):
+            new_lines.append(block.text())
+            block = block.next()
+        self.lines[first:last + 1 - delta] = new_lines
+
+    def snapshot(self):
+        return self.lines[:], self.document.revision()
+
+
+def buffer_index(editor):
+    """Return the editor's BufferIndex, creating it on first use."""
+    if getattr(editor, 'search_index', None) is None:
+        editor.search_index = BufferIndex(editor.document())
+    return editor.search_index
+
+
+class SearchSignals(QObject):
+    hits_found = pyqtSignal(object, int, list) # editor, generation, [(line, column, length, preview)]
+    search_done = pyqtSignal(object, int, int) # editor, generation, hit count
+    replace_ready = pyqtSignal(object, int, int, int, int, str, int) # editor, generation, revision, first, last, text, count
+
+
+class SearchTask(QRunnable):
+    def __init__(self, editor, generation, source, pattern, signals, cancelled):
+        super().__init__()
+        self.editor = editor
+        self.generation = generation
+        self.source = source # list of lines, or a LargeFileDocument
+        self.pattern = pattern
+        self.signals = signals
+        self.cancelled = cancelled
+        self.count = 0
+        self.batch = []
+
+    def run(self):
+        if isinstance(self.source, list):
+            self._search_lines()
+        else:
+            self._search_mapped()
+        self._flush()
+        self.signals.search_done.emit(self.editor, self.generation, self.count)
+
+    def _add_hit(self, line, column, length, text):
+        self.batch.append((line, column, length, text[:MAX_PREVIEW_LENGTH]))
+        self.count += 1
+        if len(self.batch) >= HIT_BATCH_SIZE:
+            self._flush()
+        return self.count < MAX_RESULTS and not self.cancelled.is_set()
+
+    def _flush(self):
+        if self.batch:
+            self.signals.hits_found.emit(self.editor, self.generation, self.batch)
+            self.batch = []
+
+    def _search_lines(self):
+        search = self.pattern.finditer
+        for number, line in enumerate(self.source):
+            for match in search(line):
+                if not self._add_hit(number, match.start(), match.end() - match.start(), line):
+                    return
+            if number % 10000 == 0 and self.cancelled.is_set():
+                return
+
+    def _search_mapped(self):
+        # Chunks end on a line boundary, and line numbers come from counting
+        # newlines between hits, so the line index does not need to be ready
+        doc = self.source
+        pos = 0
+        line = 0
+        while pos < doc.size and not self.cancelled.is_set():
+            end = min(pos + MAPPED_CHUNK_SIZE, doc.size)
+            if end < doc.size:
+                newline = doc.mm.rfind(b'\n', pos, end)
+                if newline == -1: # A single line longer than a chunk
+                    newline = doc.mm.find(b'\n', end)
+                end = newline + 1 if newline != -1 else doc.size
+            chunk = doc.mm[pos:end]
+            counted = 0
+            for match in self.pattern.finditer(chunk):
+                line += chunk.count(b'\n', counted, match.start())
+                counted = match.start()
+                line_start = chunk.rfind(b'\n', 0, match.start()) + 1
+                line_end = chunk.find(b'\n', match.end())
+                text = chunk[line_start:line_end if line_end != -1 else len(chunk)].decode('utf-8', errors='replace')
+                column = len(chunk[line_start:match.start()].decode('utf-8', errors='replace'))
+                length = len(match.group().decode('utf-8', errors='replace'))
+                if not self._add_hit(line, column, length, text.rstrip('\r')):
+                    return
+            line += chunk.count(b'\n', counted)
+            pos = end
+
+
+class ReplaceTask(QRunnable):
+    """Computes a replace-all as one replacement of the changed line range."""
+
+    def __init__(self, editor, generation, lines, revision, pattern, replacement, regex, signals):
+        super().__init__()
+        self.editor = editor
+        self.generation = generation
+        self.lines = lines
+        self.revision = revision
+        self.pattern = pattern
+        # Outside regex mode the replacement is literal text, not a template
+        self.replacement = replacement if regex else (lambda match: replacement)
+        self.signals = signals
+
+    def run(self):
+        first = last = -1
+        count = 0
+        new_lines = {}
+        for number, line in enumerate(self.lines):
+            new_line, replaced = self.pattern.subn(self.replacement, line)
+            if replaced:
+                new_lines[number] = new_line
+                count += replaced
+                if first == -1:
+                    first = number
+                last = number
+        text = ''
+        if count:
+            text = '\n'.join(new_lines.get(n, self.lines[n]) for n in range(first, last + 1))
+        self.signals.replace_ready.emit(self.editor, self.generation, self.revision, first, last, text, count)
+
+
+class SearchEngine(QObject):
+    """Runs searches on a thread pool and drops results of superseded searches."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.signals = SearchSignals()
+        self.generation = 0
+        self.cancelled = threading.Event()
+
+    def index_for(self, editor):
+        return buffer_index(editor)
+
+    def cancel(self):
+        self.cancelled.set()
+        self.generation += 1
+
+    def wait(self):
+        self.pool.waitForDone()
+
+    def search(self, editors, pattern_text, regex=False, case_sensitive=False):
+        """Start one task per editor; returns the generation of the new search."""
+        self.cancel()
+        self.cancelled = threading.Event()
+        text_pattern = compile_pattern(pattern_text, regex, case_sensitive)
+        bytes_pattern = None
+        for editor in editors:
+            if not isinstance(editor, LargeFileViewer):
+                source = self.index_for(editor).snapshot()[0]
+                pattern = text_pattern
+            else:
+                source = editor.document # Large-file viewers are searched in the mapped file
+                if bytes_pattern is None:
+                    bytes_pattern = compile_pattern(pattern_text, regex, case_sensitive, binary=True)
+                pattern = bytes_pattern
+            self.pool.start(SearchTask(editor, self.generation, source, pattern, self.signals, self.cancelled))
+        return self.generation
+
+    def replace_all(self, editor, pattern_text, replacement, regex=False, case_sensitive=False):
+        self.cancel()
+        self.cancelled = threading.Event()
+        lines, revision = self.index_for(editor).snapshot()
+        pattern = compile_pattern(pattern_text, regex, case_sensitive)
+        self.pool.start(ReplaceTask(editor, self.generation, lines, revision, pattern, replacement, regex, self.signals))
+        return self.generation
+
+    def find_next(self, editor, pattern_text, regex=False, case_sensitive=False):
+        """Return (line, column, length) of the next match after the cursor, wrapping around."""
+        lines = self.index_for(editor).lines
+        pattern = compile_pattern(pattern_text, regex, case_sensitive)
+        cursor = editor.textCursor()
+        start_line = cursor.blockNumber()
+        start_column = cursor.positionInBlock()
+        for offset in range(len(lines) + 1):
+            number = (start_line + offset) % len(lines)
+            match = pattern.search(lines[number], start_column if offset == 0 else 0)
+            if match and (match.end() > match.start() or offset > 0):
+                return number, match.start(), match.end() - match.start()
+        return None
+
+
+class SearchPanel(QDockWidget):
+    """Find/replace controls with a results tree that fills as hits stream in."""
+
+    def __init__(self, notepad):
+        super().__init__("찾기", notepad)
+        self.notepad = notepad
+        self.engine = SearchEngine(self)
+        self.engine.signals.hits_found.connect(self.add_hits)
+        self.engine.signals.search_done.connect(self.finish_search)
+        self.engine.signals.replace_ready.connect(self.apply_replace)
+        self.tab_items = {}
+        self.pending = 0
+        self.total = 0
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        find_layout = QHBoxLayout()
+        self.find_input = QLineEdit()
+        self.find_input.setPlaceholderText("찾을 내용")
+        self.find_input.returnPressed.connect(self.find_next)
+        self.regex_check = QCheckBox("정규식")
+        self.case_check = QCheckBox("대/소문자 구분")
+        find_layout.addWidget(self.find_input)
+        find_layout.addWidget(self.regex_check)
+        find_layout.addWidget(self.case_check)
+
+        replace_layout = QHBoxLayout()
+        self.replace_input = QLineEdit()
+        self.replace_input.setPlaceholderText("바꿀 내용")
+        replace_layout.addWidget(self.replace_input)
+
+        button_layout = QHBoxLayout()
+        for title, slot in (("다음 찾기", self.find_next), ("모두 찾기", self.find_in_current_tab),
+                            ("모든 탭에서 찾기", self.find_in_all_tabs), ("모두 바꾸기", self.replace_all)):
+            button = QPushButton(title)
+            button.clicked.connect(slot)
+            button_layout.addWidget(button)
+        self.result_label = QLabel()
+        button_layout.addWidget(self.result_label, 1)
+
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["위치", "내용"])
+        self.results_tree.setUniformRowHeights(True)
+        self.results_tree.itemActivated.connect(self.go_to_result)
+        self.results_tree.itemClicked.connect(self.go_to_result)
+
+        layout.addLayout(find_layout)
+        layout.addLayout(replace_layout)
+        layout.addLayout(button_layout)
+        layout.addWidget(self.results_tree)
+        self.setWidget(widget)
+
+    def show_find(self):
+        self.show()
+        self.find_input.setFocus()
+        self.find_input.selectAll()
+
+    def _options(self):
+        return self.regex_check.isChecked(), self.case_check.isChecked()
+
+    def _valid_pattern(self):
+        text = self.find_input.text()
+        if not text:
+            return None
+        try:
+            compile_pattern(text, *self._options())
+        except re.error as e:
+            self.result_label.setText(f"잘못된 정규식: {e}")
+            return None
+        return text
+
+    def find_next(self):
+        editor = self.notepad.current_text_edit()
+        text = self._valid_pattern()
+        if text is None or editor is None:
+            return
+        if isinstance(editor, LargeFileViewer):
+            self.find_in_current_tab() # Large-file viewers only support full searches
+            return
+        hit = self.engine.find_next(editor, text, *self._options())
+        if hit is None:
+            self.result_label.setText("찾을 수 없습니다")
+        else:
+            self.result_label.clear()
+            self.notepad.select_range(editor, *hit)
+
+    def find_in_current_tab(self):
+        editor = self.notepad.current_text_edit()
+        if editor is not None:
+            self._start_search([editor])
+
+    def find_in_all_tabs(self):
+        self.notepad.load_all_tabs() # Restored tabs are loaded lazily
+        tab_widget = self.notepad.tab_widget
+        self._start_search([tab_widget.widget(i) for i in range(tab_widget.count())])
+
+    def _start_search(self, editors):
+        text = self._valid_pattern()
+        if text is None:
+            return
+        self.results_tree.clear()
+        self.tab_items = {}
+        self.total = 0
+        self.pending = len(editors)
+        self.result_label.setText("검색 중...")
+        self.engine.search(editors, text, *self._options())
+
+    def add_hits(self, editor, generation, hits):
+        if generation != self.engine.generation or self.notepad.tab_widget.indexOf(editor) == -1:
+            return
+        top_item = self.tab_items.get(editor)
+        if top_item is None:
+            top_item = QTreeWidgetItem([self.notepad.tab_widget.tabText(self.notepad.tab_widget.indexOf(editor)), ""])
+            top_item.editor = editor
+            self.results_tree.addTopLevelItem(top_item)
+            top_item.setExpanded(True)
+            self.tab_items[editor] = top_item
+        self.results_tree.setUpdatesEnabled(False)
+        for line, column, length, preview in hits:
+            item = QTreeWidgetItem([f"{line + 1}:{column + 1}", preview])
+            item.hit = (line, column, length)
+            top_item.addChild(item)
+        self.results_tree.setUpdatesEnabled(True)
+        self.total += len(hits)
+        self.result_label.setText(f"검색 중... {self.total}개")
+
+    def finish_search(self, editor, generation, count):
+        if generation != self.engine.generation:
+            return
+        self.pending -= 1
+        if self.pending <= 0:
+            suffix = " (결과가 너무 많아 일부만 표시)" if self.total >= MAX_RESULTS else ""
+            self.result_label.setText(f"{self.total}개 찾음{suffix}")
+
+    def go_to_result(self, item, column=0):
+        parent = item.parent()
+        if parent is not None:
+            self.notepad.go_to_editor(parent.editor)
+            self.notepad.select_range(parent.editor, *item.hit)
+
+    def replace_all(self):
+        editor = self.notepad.current_text_edit()
+        text = self._valid_pattern()
+        if text is None or editor is None:
+            return
+        if isinstance(editor, LargeFileViewer):
+            self.result_label.setText("대용량 파일은 읽기 전용입니다")
+            return
+        replacement = self.replace_input.text()
+        if self.regex_check.isChecked():
+            # Check the template here: an error on the pool thread would leave the panel waiting
+            try:
+                compile_pattern(text, *self._options()).sub(replacement, '')
+            except (re.error, IndexError) as e: # IndexError for an unknown group name before Python 3.12
+                self.result_label.setText(f"잘못된 바꿀 내용: {e}")
+                return
+        self.result_label.setText("바꾸는 중...")
+        self.engine.replace_all(editor, text, replacement, *self._options())
+
+    def apply_replace(self, editor, generation, revision, first, last, text, count):
+        if generation != self.engine.generation or self.notepad.tab_widget.indexOf(editor) == -1:
+            return
+        if count == 0:
+            self.result_label.setText("찾을 수 없습니다")
+            return
+        document = editor.document()
+        if document.revision() != revision:
+            self.result_label.setText("문서가 변경되었습니다. 다시 시도하세요")
+            return
+        # The changed line range is replaced by one insertText, a single undo step
+        cursor = editor.textCursor()
+        start = document.findBlockByNumber(first)
+        end = document.findBlockByNumber(last)
+        cursor.beginEditBlock()
+        cursor.setPosition(start.position())
+        cursor.setPosition(end.position() + end.length() - 1, cursor.KeepAnchor)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+        self.result_label.setText(f"{count}개 바꿈")
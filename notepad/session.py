@@ -0,0 +1,65 @@
+import json
+import os
+import zlib
+
+SESSION_DIR = os.path.join(os.path.expanduser('~'), '.notepad_session')
+AUTOSAVE_INTERVAL = 30 * 1000 # ms between automatic session saves
+
+
+class SessionStore:
+    """Open tabs and unsaved buffers of the notepad, kept between runs.
+
+    session.json lists one entry per tab. The text of unsaved tabs is stored
+    next to it as a zlib-compressed snapshot, so the JSON stays small and a
+    snapshot is only rewritten when its tab changed. Other notepad windows
+    share the folder, so only snapshots this instance wrote or restored are
+    ever removed.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or SESSION_DIR
+        self.session_file = os.path.join(self.directory, 'session.json')
+        self.snapshot_dir = os.path.join(self.directory, 'snapshots')
+        self.owned = set() # Snapshot names this instance may remove once its session no longer lists them
+
+    def load(self):
+        try:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return [], 0
+        entries = data.get('tabs', [])
+        self.owned.update(entry['snapshot'] for entry in entries if entry.get('snapshot'))
+        return entries, data.get('current', 0)
+
+    def save(self, entries, current):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.session_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'tabs': entries, 'current': current}, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.session_file)
+        self._remove_unused_snapshots({entry['snapshot'] for entry in entries if entry.get('snapshot')})
+
+    def write_snapshot(self, key, text):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        name = key + '.z'
+        path = os.path.join(self.snapshot_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(zlib.compress(text.encode('utf-8', 'surrogatepass'), 1))
+        os.replace(path + '.tmp', path)
+        self.owned.add(name)
+        return name
+
+    def read_snapshot(self, name):
+        with open(os.path.join(self.snapshot_dir, name), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8', 'surrogatepass')
+
+    def _remove_unused_snapshots(self, used):
+        for name in self.owned - used:
+            try:
+                os.remove(os.path.join(self.snapshot_dir, name))
+            except FileNotFoundError:
+                pass
+        self.owned &= used
@@ -1,9 +1,16 @@
+import os
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget, QFileDialog
-from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import Qt
-import cv2
-from ultralytics import YOLO
+import time
+from collections import deque
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget, QFileDialog,
+                             QSpinBox, QComboBox, QProgressBar, QMessageBox)
+from PyQt5.QtGui import QPixmap, QPainter, QColor
+from PyQt5.QtCore import Qt, QRect
+from batch_detection import folder_images, BATCH_SIZE, CHECKPOINT_FILE, RESULTS_FILES, ANNOTATED_DIR
+from detection_worker import DetectionWorker, BatchDetectionThread
+from video_stream import VideoReader, VIDEO_EXTENSIONS, CAMERA_INDEX
+
+STREAM_FPS_FRAMES = 30 # Frames the shown FPS is averaged over
 
 class ObjectDetectionApp(QMainWindow):
     def __init__(self):
@@ -27,54 +34,269 @@ class ObjectDetectionApp(QMainWindow):
         self.button_layout = QHBoxLayout()
         self.load_image_button = QPushButton("Load Image")
         self.detect_objects_button = QPushButton("Detect Objects")
+        self.detect_folder_button = QPushButton("Detect Folder")
+        self.batch_size_box = QSpinBox() # Images per model call in folder mode
+        self.batch_size_box.setRange(1, 64)
+        self.batch_size_box.setValue(BATCH_SIZE)
+        self.batch_size_box.setPrefix("Batch: ")
+        self.results_format_box = QComboBox()
+        self.results_format_box.addItems(list(RESULTS_FILES))
         self.button_layout.addWidget(self.load_image_button)
         self.button_layout.addWidget(self.detect_objects_button)
+        self.button_layout.addWidget(self.detect_folder_button)
+        self.button_layout.addWidget(self.batch_size_box)
+        self.button_layout.addWidget(self.results_format_box)
         self.main_layout.addLayout(self.button_layout)
 
+        # Video buttons
+        self.stream_layout = QHBoxLayout()
+        self.open_video_button = QPushButton("Open Video")
+        self.camera_button = QPushButton("Camera")
+        self.stop_stream_button = QPushButton("Stop")
+        self.stop_stream_button.setEnabled(False)
+        self.stream_layout.addWidget(self.open_video_button)
+        self.stream_layout.addWidget(self.camera_button)
+        self.stream_layout.addWidget(self.stop_stream_button)
+        self.main_layout.addLayout(self.stream_layout)
+
+        # Folder progress
+        self.batch_progress_bar = QProgressBar()
+        self.batch_progress_bar.setMaximumWidth(200)
+        self.batch_progress_bar.hide()
+        self.batch_cancel_button = QPushButton("Cancel")
+        self.batch_cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.batch_progress_bar)
+        self.statusBar().addPermanentWidget(self.batch_cancel_button)
+        self.cache_label = QLabel() # Result cache hit rate and inference time saved
+        self.statusBar().addPermanentWidget(self.cache_label)
+
         # Connect buttons to functions
         self.load_image_button.clicked.connect(self.load_image)
         self.detect_objects_button.clicked.connect(self.detect_objects)
+        self.detect_folder_button.clicked.connect(self.detect_folder)
+        self.batch_cancel_button.clicked.connect(self.cancel_batch)
+        self.open_video_button.clicked.connect(self.open_video)
+        self.camera_button.clicked.connect(lambda: self.start_stream(CAMERA_INDEX))
+        self.stop_stream_button.clicked.connect(self.stop_stream)
 
         self.current_image_path = None
-        self.yolo_model = YOLO('yolov8n.pt') # Load a pretrained YOLOv8n model
+        self.batch_thread = None
+        self.detection_request = None # Id of the request whose result should be shown
+        self.video_reader = None
+        self.stream_first_request = None # Results of requests from this id on are video frames to show
+        self.stream_frame_times = deque(maxlen=STREAM_FPS_FRAMES)
+        self.stream_dropped = 0 # The worker's dropped count when the stream started
+        self.stream_shown = 0
+        for button in (self.detect_folder_button, self.open_video_button, self.camera_button):
+            button.setEnabled(False) # Until the model is loaded
+
+        # The model loads on the worker thread while the window is already up
+        self.detection_worker = DetectionWorker()
+        self.detection_worker.model_loaded_signal.connect(self.on_model_loaded)
+        self.detection_worker.result_signal.connect(self.on_detection_result)
+        self.detection_worker.error_signal.connect(self.on_detection_error)
+        self.detection_worker.start()
+        self.statusBar().showMessage("Loading model...")
 
     def load_image(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Load Image", "",
                                                    "Image Files (*.png *.jpg *.jpeg *.bmp *.gif)", options=options)
         if file_path:
+            self.stop_stream()
             self.current_image_path = file_path
+            self.detection_request = None # A result for the previous image must not replace this one
             pixmap = QPixmap(file_path)
             self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
             self.image_label.setText("") # Clear text when image is loaded
 
     def detect_objects(self):
         if self.current_image_path:
-            # Perform object detection
-            results = self.yolo_model(self.current_image_path)
-
-            # Draw bounding boxes and labels
-            image = cv2.imread(self.current_image_path)
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    conf = round(float(box.conf[0]), 2)
-                    cls = int(box.cls[0])
-                    label = self.yolo_model.names[cls]
-
-                    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(image, f"{label} {conf}", (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            # Convert OpenCV image to QPixmap and display
-            h, w, ch = image.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(image.data, w, h, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-            pixmap = QPixmap.fromImage(convert_to_Qt_format)
-            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            # Detection runs on the worker; the result arrives in on_detection_result
+            self.detection_request = self.detection_worker.request(self.current_image_path)
+            if self.detection_worker.detector.model is None:
+                self.statusBar().showMessage("Loading model... detection starts once it is ready")
+            else:
+                self.statusBar().showMessage("Detecting objects...")
         else:
             self.image_label.setText("Please load an image first!")
 
+    def on_model_loaded(self, seconds):
+        self.update_buttons()
+        self.update_cache_stats()
+        loaded = f"Model loaded in {seconds:.1f} s ({self.detection_worker.detector.backend})"
+        if self.detection_request is None:
+            self.statusBar().showMessage(loaded, 3000)
+        else:
+            self.statusBar().showMessage(f"{loaded}, detecting objects...")
+
+    def on_detection_result(self, request_id, image, detections, timings):
+        if self.stream_first_request is not None and request_id >= self.stream_first_request:
+            self.show_stream_frame(image, detections, timings)
+            return
+        if request_id != self.detection_request:
+            return # Another image was loaded or detected since
+        self.detection_request = None
+        pixmap = QPixmap.fromImage(image)
+        self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        stages = ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in timings.items())
+        cached = "" if 'inference' in timings else ", from the cache"
+        self.statusBar().showMessage(f"{len(detections)} objects{cached} ({stages})")
+        self.update_cache_stats()
+
+    def update_cache_stats(self):
+        if self.detection_worker.detector.cache is not None:
+            self.cache_label.setText(self.detection_worker.detector.cache.stats())
+
+    def on_detection_error(self, request_id, message):
+        if request_id == 0:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, "Error", f"Cannot load the model: {message}")
+        elif request_id == self.detection_request:
+            self.detection_request = None
+            self.statusBar().showMessage(f"Detection failed: {message}", 5000)
+
+    def open_video(self):
+        patterns = " ".join("*" + extension for extension in VIDEO_EXTENSIONS)
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Video", "", f"Video Files ({patterns})")
+        if file_path:
+            self.start_stream(file_path)
+
+    def start_stream(self, source, realtime=True):
+        """Shows detections on the frames of a video file path or camera index as they come."""
+        self.stop_stream()
+        self.current_image_path = None
+        self.detection_request = None
+        self.stream_first_request = self.detection_worker.last_id + 1
+        self.stream_frame_times.clear()
+        self.stream_dropped = self.detection_worker.dropped
+        self.stream_shown = 0
+        reader = VideoReader(source, self.detection_worker, realtime)
+        reader.ended_signal.connect(self.on_stream_ended)
+        reader.error_signal.connect(lambda message: self.statusBar().showMessage(message, 5000))
+        reader.finished.connect(lambda: self.finish_stream(reader))
+        self.video_reader = reader
+        reader.start()
+        self.update_buttons()
+        self.statusBar().showMessage("Streaming...")
+
+    def stop_stream(self):
+        if self.video_reader is not None:
+            self.video_reader.requestInterruption()
+            self.video_reader.wait()
+            self.finish_stream(self.video_reader)
+        self.stream_first_request = None # Frames still in the worker are not shown any more
+
+    def show_stream_frame(self, image, detections, timings):
+        # Scaled without smoothing and with the overlay painted on the scaled copy, to keep up with the video
+        now = time.perf_counter()
+        self.stream_frame_times.append(now)
+        self.stream_shown += 1
+        times = self.stream_frame_times
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0
+        dropped = self.detection_worker.dropped - self.stream_dropped
+        pixmap = QPixmap.fromImage(image).scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.FastTransformation)
+        lines = [f"{fps:.1f} FPS, {len(detections)} objects, {dropped} frames dropped"]
+        lines += [f"{stage} {ms:.1f} ms" for stage, ms in timings.items()]
+        painter = QPainter(pixmap)
+        box = QRect(0, 0, 220, 18 * len(lines) + 8)
+        painter.fillRect(box, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.white)
+        painter.drawText(box.adjusted(6, 4, 0, 0), Qt.AlignLeft | Qt.AlignTop, "\n".join(lines))
+        painter.end()
+        self.image_label.setPixmap(pixmap)
+
+    def on_stream_ended(self, frames_read):
+        dropped = self.detection_worker.dropped - self.stream_dropped
+        self.statusBar().showMessage(f"Video ended: {frames_read} frames read, {dropped} dropped")
+
+    def finish_stream(self, reader):
+        if reader is self.video_reader: # Not a stream stopped earlier whose finished signal comes late
+            self.video_reader = None
+            self.update_buttons()
+
+    def update_buttons(self):
+        # The model serves one mode at a time: single images and video through the worker, folders directly
+        loaded = self.detection_worker.detector.model is not None
+        streaming = self.video_reader is not None
+        batching = self.batch_thread is not None
+        self.detect_objects_button.setEnabled(not streaming and not batching)
+        self.detect_folder_button.setEnabled(loaded and not streaming and not batching)
+        self.open_video_button.setEnabled(loaded and not batching)
+        self.camera_button.setEnabled(loaded and not batching)
+        self.stop_stream_button.setEnabled(streaming)
+
+    def detect_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Image Folder")
+        if not folder:
+            return
+        paths = folder_images(folder)
+        if not paths:
+            self.statusBar().showMessage("No images in this folder", 3000)
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if not output_dir:
+            return
+        if not self.detection_worker.idle():
+            self.statusBar().showMessage("Wait for the current detection to finish", 3000)
+            return
+        resume = False
+        if os.path.exists(os.path.join(output_dir, CHECKPOINT_FILE)):
+            reply = QMessageBox.question(self, "Resume",
+                                         "This output folder has an unfinished run. Resume it? (No starts over)",
+                                         QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes)
+            if reply == QMessageBox.Cancel:
+                return
+            resume = reply == QMessageBox.Yes
+
+        self.batch_thread = BatchDetectionThread(self.detection_worker.detector, paths, output_dir,
+                                                 self.batch_size_box.value(), self.results_format_box.currentText(), resume)
+        self.batch_thread.progress_signal.connect(self.on_batch_progress)
+        self.batch_thread.done_signal.connect(lambda count, elapsed: self.on_batch_done(output_dir, count, elapsed))
+        self.batch_thread.error_signal.connect(
+            lambda message: QMessageBox.critical(self, "Error", f"Folder detection failed: {message}"))
+        self.batch_thread.finished.connect(self.finish_batch)
+        self.update_buttons() # The model is busy with the folder until it finishes
+        self.batch_progress_bar.setRange(0, len(paths))
+        self.batch_progress_bar.setValue(0)
+        self.batch_progress_bar.show()
+        self.batch_cancel_button.show()
+        self.statusBar().showMessage(f"Detecting objects in {len(paths)} images...")
+        self.batch_thread.start()
+
+    def on_batch_progress(self, done, total, images_per_second):
+        self.batch_progress_bar.setValue(done)
+        self.statusBar().showMessage(f"Detecting objects: {done}/{total} images, {images_per_second:.1f} images/s")
+        self.update_cache_stats()
+
+    def on_batch_done(self, output_dir, count, elapsed):
+        rate = count / elapsed if elapsed else 0
+        if self.batch_thread.isInterruptionRequested():
+            self.statusBar().showMessage(f"Cancelled after {count} images ({rate:.1f} images/s); "
+                                         f"run the same folders again to resume")
+        else:
+            self.statusBar().showMessage(f"{count} images in {elapsed:.1f} s ({rate:.1f} images/s), "
+                                         f"annotated images in {os.path.join(output_dir, ANNOTATED_DIR)}")
+
+    def cancel_batch(self):
+        if self.batch_thread is not None:
+            self.batch_thread.requestInterruption()
+            self.statusBar().showMessage("Cancelling after the current batch...")
+
+    def finish_batch(self):
+        self.batch_thread = None
+        self.batch_progress_bar.hide()
+        self.batch_cancel_button.hide()
+        self.update_buttons()
+
+    def closeEvent(self, event):
+        self.stop_stream()
+        if self.batch_thread is not None:
+            self.batch_thread.requestInterruption()
+            self.batch_thread.wait()
+        self.detection_worker.stop()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = ObjectDetectionApp()
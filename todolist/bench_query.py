@@ -0,0 +1,104 @@
+"""Benchmark filtering a large todo list from the query bar.
+
+Usage: python bench_query.py [--todos 100000] [--text "todo number 4242"]
+
+Types the search text into TodoApp's query bar one character at a time and
+reports the latency of each keystroke (query plus view update), then times
+the other filters and sort orders, and edits made while a filter is active.
+Every latency is compared against FRAME_BUDGET_MS. Building the index on the
+first query is reported separately.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+FRAME_BUDGET_MS = 16
+
+
+def timed(app, action):
+    start = time.perf_counter()
+    action()
+    app.processEvents()
+    return (time.perf_counter() - start) * 1000
+
+
+def report(name, elapsed):
+    verdict = "OK" if elapsed <= FRAME_BUDGET_MS else "over budget"
+    print(f"  {name:40} {elapsed:7.2f} ms ({verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--todos', type=int, default=100000, help='number of todos in the list')
+    parser.add_argument('--text', default='todo number 4242', help='search text typed key by key')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QDate
+    app = QApplication(sys.argv)
+    import data_manager
+    from todo_app import TodoApp
+
+    work_dir = tempfile.mkdtemp(prefix='todo_query_bench_')
+    data_manager.DATA_FILE = os.path.join(work_dir, 'todos.json') # Keep the real todos.json untouched
+    random.seed(0)
+    words = ['report', 'meeting', 'groceries', 'call', 'review', 'deploy', 'invoice', 'backup']
+    data_manager.save_todos([{
+        'id': i + 1,
+        'text': f"todo number {i} {' '.join(random.sample(words, 2))}",
+        'completed': i % 3 == 0,
+        'start_datetime': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00",
+        'end_datetime': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T18:00:00",
+    } for i in range(args.todos)])
+
+    window = TodoApp()
+    window.show()
+    app.processEvents()
+    model = window.model
+
+    print(f"{args.todos} todos")
+    elapsed = timed(app, lambda: window.search_input.setText(args.text[0]))
+    print(f"  {'first query, including index build':40} {elapsed:7.1f} ms")
+    window.search_input.clear()
+    app.processEvents()
+    for length in range(1, len(args.text) + 1):
+        text = args.text[:length]
+        elapsed = timed(app, lambda: window.search_input.setText(text))
+        report(f"typed '{text}' ({len(model.row_ids)} rows)", elapsed)
+    for length in range(len(args.text) - 1, -1, -1):
+        text = args.text[:length]
+        elapsed = timed(app, lambda: window.search_input.setText(text))
+    report(f"cleared ({len(model.row_ids)} rows)", elapsed)
+
+    report("hide completed", timed(app, lambda: window.hide_completed_checkbox.setChecked(True)))
+    report("overdue", timed(app, lambda: window.overdue_checkbox.setChecked(True)))
+    window.overdue_checkbox.setChecked(False)
+    window.hide_completed_checkbox.setChecked(False)
+    window.date_from_input.setDate(QDate(2025, 3, 1))
+    window.date_to_input.setDate(QDate(2025, 3, 14))
+    report("start between", timed(app, lambda: window.date_field_combo.setCurrentIndex(1)))
+    report("end between", timed(app, lambda: window.date_field_combo.setCurrentIndex(2)))
+    window.date_field_combo.setCurrentIndex(0)
+    for index in range(1, window.sort_combo.count()):
+        report(window.sort_combo.itemText(index), timed(app, lambda: window.sort_combo.setCurrentIndex(index)))
+
+    window.search_input.setText('review')
+    window.hide_completed_checkbox.setChecked(True)
+    app.processEvents()
+    todo_id = model.todo_id(0)
+    report("complete a shown todo", timed(app, lambda: model.update_todo(todo_id, {'completed': True})))
+    report("rename it back into the view", timed(app, lambda: model.update_todo(todo_id, {
+        'text': 'review renamed', 'completed': False})))
+    report("add a matching todo", timed(app, lambda: model.add_todo({
+        'text': 'review new', 'completed': False,
+        'start_datetime': "2025-01-01T09:00:00", 'end_datetime': "2025-01-01T18:00:00"})))
+    report("delete it", timed(app, lambda: model.delete_todos([model.todo_id(0)])))
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark TodoApp startup and list scrolling with a large todo list.
+
+Usage: python bench_startup.py [--todos 100000] [--backend journal] [--widget]
+
+Writes the given number of todos into a temporary todos.json, then measures
+how long TodoApp takes until its first paint (against STARTUP_TARGET_MS), how
+responsive the view stays while scrolling fetches the rest of the list, and
+how long toggling a todo takes. --widget also times the old approach of
+creating one QListWidgetItem per todo.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+STARTUP_TARGET_MS = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--todos', type=int, default=100000, help='number of todos in the list')
+    parser.add_argument('--backend', default='journal', help='storage backend: json, journal or sqlite')
+    parser.add_argument('--widget', action='store_true', help='also time one QListWidgetItem per todo')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    app = QApplication(sys.argv)
+    import data_manager
+    from todo_app import TodoApp
+
+    work_dir = tempfile.mkdtemp(prefix='todo_startup_bench_')
+    data_manager.DATA_FILE = os.path.join(work_dir, 'todos.json') # Keep the real todos.json untouched
+    data_manager.STORAGE_BACKEND = args.backend
+    todos = [{
+        'id': i + 1,
+        'text': f"todo number {i}",
+        'completed': i % 3 == 0,
+        'start_datetime': f"2025-07-{1 + i % 28:02d}T09:00:00",
+        'end_datetime': f"2025-07-{1 + i % 28:02d}T18:00:00",
+    } for i in range(args.todos)]
+    data_manager.save_todos(todos)
+    if args.backend == 'sqlite':
+        data_manager.open_storage().close() # Migrate outside the measurement
+
+    start = time.perf_counter()
+    window = TodoApp()
+    window.show()
+    window.repaint()
+    startup = (time.perf_counter() - start) * 1000
+    verdict = "OK" if startup <= STARTUP_TARGET_MS else "over target"
+    print(f"startup with {args.todos} todos ({args.backend}): {startup:.1f} ms "
+          f"(target {STARTUP_TARGET_MS} ms, {verdict})")
+
+    view = window.todo_list_view
+    scroll_bar = view.verticalScrollBar()
+    latencies = []
+    start = time.perf_counter()
+    while window.model.canFetchMore(view.rootIndex()):
+        # Holding the scroll bar at the end makes the view fetch batch after batch
+        step_start = time.perf_counter()
+        scroll_bar.setValue(scroll_bar.maximum())
+        app.processEvents()
+        latencies.append((time.perf_counter() - step_start) * 1000)
+    view.repaint()
+    latencies.sort()
+    print(f"holding the scroll bar at the end until all {window.model.rowCount()} rows are fetched: "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms, event loop pass p95 "
+          f"{latencies[int(len(latencies) * 0.95)]:.2f} ms, max {latencies[-1]:.2f} ms")
+
+    index = window.model.index(window.model.rowCount() - 1)
+    start = time.perf_counter()
+    window.model.setData(index, Qt.Checked, Qt.CheckStateRole)
+    view.repaint()
+    print(f"toggling the last todo: {(time.perf_counter() - start) * 1000:.2f} ms")
+    window.close()
+
+    if args.widget:
+        from PyQt5.QtWidgets import QListWidget, QListWidgetItem
+        from PyQt5.QtCore import QDateTime
+        list_widget = QListWidget()
+        start = time.perf_counter()
+        for todo in todos:
+            start_dt = QDateTime.fromString(todo['start_datetime'], Qt.ISODate).toString("yyyy-MM-dd HH:mm")
+            end_dt = QDateTime.fromString(todo['end_datetime'], Qt.ISODate).toString("yyyy-MM-dd HH:mm")
+            item = QListWidgetItem(f"{todo['text']} (시작: {start_dt}, 끝: {end_dt})")
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if todo['completed'] else Qt.Unchecked)
+            if todo['completed']:
+                font = item.font()
+                font.setStrikeOut(True)
+                item.setFont(font)
+            list_widget.addItem(item)
+        list_widget.show()
+        list_widget.repaint()
+        print(f"one QListWidgetItem per todo: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark todo storage backends: full JSON rewrite, operation journal and SQLite.
+
+Usage: python bench_storage.py [--sizes 1000,10000,100000] [--ops 100]
+
+For each list size, every backend starts from the same snapshot (SQLite
+migrates it into a fresh database on first open, timed separately from a
+second open) and then runs the given number of adds, checkbox toggles and
+deletes. Latency is measured
+per operation; bytes written are read from /proc/self/io (Linux only), so
+they include everything the process passed to write(). The journal's
+compaction is reported separately together with its cost amortized over the
+operations that trigger it.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import data_manager
+
+
+def bytes_written():
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def make_todos(count):
+    return [{
+        'id': i + 1,
+        'text': f"todo number {i} with some description",
+        'completed': i % 3 == 0,
+        'start_datetime': "2025-07-04T09:00:00",
+        'end_datetime': "2025-07-05T18:00:00",
+    } for i in range(count)]
+
+
+def run_operations(storage, ops):
+    random.seed(0)
+    todo_ids = list(storage.ids())
+    results = {}
+    for name in ('add', 'toggle', 'delete'):
+        latencies = []
+        written = bytes_written()
+        for i in range(ops):
+            if name != 'add':
+                todo_id = todo_ids.pop(random.randrange(len(todo_ids))) if name == 'delete' else random.choice(todo_ids)
+            start = time.perf_counter()
+            if name == 'add':
+                todo_ids.append(storage.add({'text': f"new todo {i}", 'completed': False,
+                                             'start_datetime': "2025-07-04T09:00:00",
+                                             'end_datetime': "2025-07-05T18:00:00"}))
+            elif name == 'toggle':
+                storage.update(todo_id, {'completed': not storage.get(todo_id)['completed']})
+            else:
+                storage.delete([todo_id])
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        results[name] = (latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)],
+                         (bytes_written() - written) / ops)
+    storage.sync()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated list sizes')
+    parser.add_argument('--ops', type=int, default=100, help='operations of each kind per size')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='todo_storage_bench_')
+    # Keep compaction out of the per-operation numbers; it is measured on its own below
+    data_manager.COMPACT_MIN_OPS = 10 ** 9
+    try:
+        for size in (int(size) for size in args.sizes.split(',')):
+            print(f"{size} todos")
+            for backend in ('json', 'journal', 'sqlite'):
+                file_path = os.path.join(work_dir, f"{backend}_{size}.json")
+                data_manager.save_todos(make_todos(size), file_path)
+                if backend == 'sqlite':
+                    start = time.perf_counter()
+                    data_manager.open_storage(file_path, backend).close()
+                    print(f"  {backend:8} migrate {(time.perf_counter() - start) * 1000:.1f} ms")
+                start = time.perf_counter()
+                storage = data_manager.open_storage(file_path, backend)
+                print(f"  {backend:8} open    {(time.perf_counter() - start) * 1000:.1f} ms")
+                for name, (p50, p95, per_op) in run_operations(storage, args.ops).items():
+                    print(f"  {backend:8} {name:7} p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  {per_op:12.0f} bytes/op")
+                if backend == 'journal':
+                    written = bytes_written()
+                    start = time.perf_counter()
+                    storage.compact()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    amortized = max(size, 1000)
+                    print(f"  {backend:8} compact {elapsed:.1f} ms, {bytes_written() - written} bytes "
+                          f"(runs every {amortized} ops: {(bytes_written() - written) / amortized:.0f} bytes/op amortized)")
+                storage.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,716 @@
 import json
+import os
+import sqlite3
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
 
-DATA_FILE = "todos.json"
+# Next to this module, so every instance started from any directory shares one file
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "todos.json")
+STORAGE_BACKEND = "journal" # "journal", "json" or "sqlite"
+FSYNC_INTERVAL = 1.0 # Seconds an appended operation may stay unsynced
+FSYNC_BATCH = 64 # Pending operations that force an fsync
+COMPACT_MIN_OPS = 1000 # Journal length before compaction is considered
+FETCH_PAGE_SIZE = 100 # Records read ahead per query from the SQLite store, about one screen
+LOCK_TIMEOUT = 30.0 # Seconds to wait for another process's SQLite transaction
+TODO_FIELDS = ("text", "completed", "start_datetime", "end_datetime")
 
-def load_todos():
+def load_todos(file_path=None):
+    file_path = file_path or DATA_FILE
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
+        with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError:
         return []
 
-def save_todos(todos):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
+def save_todos(todos, file_path=None):
+    file_path = file_path or DATA_FILE
+    with open(file_path, "w", encoding="utf-8") as f:
         json.dump(todos, f, ensure_ascii=False, indent=4)
+
+def _write_atomic(file_path, data):
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+def _snapshot_hash(data):
+    return blake2b(data, digest_size=16).hexdigest()
+
+def _file_stamp(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _index_todos(todos):
+    """Map todos by their "id", giving new ids to todos that have none (or a duplicate one)."""
+    records = {}
+    unnumbered = []
+    for todo in todos:
+        todo.setdefault("version", 1)
+        if isinstance(todo.get("id"), int) and todo["id"] not in records:
+            records[todo["id"]] = todo
+        else:
+            unnumbered.append(todo)
+    records = dict(sorted(records.items())) # List order is id order, which views rely on
+    next_id = max(records, default=0) + 1
+    for todo in unnumbered:
+        todo["id"] = next_id
+        records[next_id] = todo
+        next_id += 1
+    return records, next_id, bool(unnumbered)
+
+def _apply_operation(records, operation, changes=None):
+    """Apply one add/update/delete, noting the ids it touched in `changes` if given."""
+    kind = operation["op"]
+    if "index" in operation or "indexes" in operation:
+        # Journals written before todos had ids address them by list position
+        order = list(records)
+        if "index" in operation:
+            operation["id"] = order[operation["index"]]
+        else:
+            operation["ids"] = [order[index] for index in operation["indexes"]]
+    if kind == "add":
+        todo = operation["todo"]
+        todo.setdefault("version", 1)
+        records[todo["id"]] = todo
+        if changes is not None:
+            changes.add(todo["id"])
+    elif kind == "update":
+        todo = records.get(operation["id"])
+        if todo is None:
+            return # Deleted by another process before this update reached the file
+        todo.update(operation["fields"])
+        todo["version"] = operation.get("version", todo.get("version", 1) + 1)
+        if changes is not None:
+            changes.update(todo["id"])
+    elif kind == "delete":
+        for todo_id in operation["ids"]:
+            if records.pop(todo_id, None) is not None and changes is not None:
+                changes.delete(todo_id)
+
+def _diff_records(old, new, changes):
+    """Note in `changes` how `new` differs from `old`, comparing version stamps."""
+    for todo_id, todo in new.items():
+        previous = old.get(todo_id)
+        if previous is None:
+            changes.add(todo_id)
+        elif previous.get("version") != todo.get("version"):
+            changes.update(todo_id)
+    for todo_id in old:
+        if todo_id not in new:
+            changes.delete(todo_id)
+
+
+class TodoChanges:
+    """Ids added, updated and deleted by other processes since the view last looked."""
+
+    def __init__(self):
+        self.added = set()
+        self.updated = set()
+        self.deleted = set()
+
+    def __len__(self):
+        return len(self.added) + len(self.updated) + len(self.deleted)
+
+    def add(self, todo_id):
+        self.added.add(todo_id) # Ids are never reused, so it cannot be in `deleted`
+
+    def update(self, todo_id):
+        if todo_id not in self.added and todo_id not in self.deleted:
+            self.updated.add(todo_id)
+
+    def delete(self, todo_id):
+        self.updated.discard(todo_id)
+        if todo_id in self.added:
+            self.added.discard(todo_id) # Never shown, so there is nothing to remove
+        else:
+            self.deleted.add(todo_id)
+
+
+class FileLock:
+    """Exclusive lock shared by every process using the same todos file.
+
+    The lock is taken on a separate `.lock` file, because the data files
+    themselves are replaced on compaction. It is reentrant within a process.
+    The file also holds the next free todo id, so no process hands out the
+    id of a deleted todo again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.depth = 0
+
+    def __enter__(self):
+        if self.depth == 0:
+            if self.file is None:
+                self.file = open(os.open(self.path, os.O_RDWR | os.O_CREAT), "r+b")
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError: # LK_LOCK gives up after 10 seconds
+                        pass
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def next_id(self, known_next_id):
+        """Claim an id at or above `known_next_id`. The lock must be held."""
+        self.file.seek(0)
+        stored = self.file.read().strip()
+        todo_id = max(known_next_id, int(stored) if stored else 0)
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(b"%d" % (todo_id + 1))
+        self.file.flush()
+        return todo_id
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class JsonStorage:
+    """Keeps todos in DATA_FILE and rewrites the whole file on every change.
+
+    Every todo carries a stable "id". `records` maps ids to todos in list
+    order, so looking up, editing and deleting a todo do not depend on where
+    it is shown.
+
+    Several processes may share the file. Every write holds a FileLock and
+    first catches up with what other processes wrote, so ids stay unique
+    and no change is overwritten. Updates only carry the fields they change
+    and bump the todo's "version", so concurrent edits of different fields
+    merge. Ids touched by other processes collect in `changes`; refresh()
+    catches up without writing and hands them over for the view to apply.
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or DATA_FILE
+        self.records = {}
+        self.next_id = 1
+        self.lock = FileLock(self.file_path + ".lock")
+        self.changes = TodoChanges()
+        self.file_stamp = None # Stamp of DATA_FILE when we last read or wrote it
+
+    def load(self):
+        with self.lock:
+            self.file_stamp = _file_stamp(self.file_path)
+            self.records, self.next_id, renumbered = _index_todos(load_todos(self.file_path))
+            if renumbered:
+                self._write()
+
+    def _catch_up(self):
+        """Apply what other processes wrote since we last looked. The lock must be held."""
+        if _file_stamp(self.file_path) == self.file_stamp:
+            return
+        old = self.records
+        self.file_stamp = _file_stamp(self.file_path)
+        self.records, next_id, _ = _index_todos(load_todos(self.file_path))
+        self.next_id = max(self.next_id, next_id)
+        _diff_records(old, self.records, self.changes)
+
+    def refresh(self):
+        """Catch up with other processes and return the changes not yet handed out."""
+        with self.lock:
+            self._catch_up()
+        return self.take_changes()
+
+    def take_changes(self):
+        changes, self.changes = self.changes, TodoChanges()
+        return changes
+
+    def watch_paths(self):
+        """Files that change when another process writes todos."""
+        return [self.file_path]
+
+    def ids(self):
+        return list(self.records)
+
+    def get(self, todo_id):
+        return self.records[todo_id]
+
+    def iter_todos(self):
+        return iter(self.records.values())
+
+    def count(self):
+        return len(self.records)
+
+    def add(self, todo):
+        with self.lock:
+            self._catch_up()
+            todo["id"] = self.lock.next_id(self.next_id)
+            todo["version"] = 1
+            self.next_id = todo["id"] + 1
+            self._commit({"op": "add", "todo": todo})
+        return todo["id"]
+
+    def update(self, todo_id, fields):
+        """Set fields of a todo; False if another process deleted it."""
+        with self.lock:
+            self._catch_up()
+            todo = self.records.get(todo_id)
+            if todo is not None and fields: # Nothing edited: no new version for other processes to pick up
+                self._commit({"op": "update", "id": todo_id, "fields": fields, "version": todo["version"] + 1})
+        return todo is not None
+
+    def delete(self, todo_ids):
+        with self.lock:
+            self._catch_up()
+            todo_ids = [todo_id for todo_id in todo_ids if todo_id in self.records]
+            if todo_ids:
+                self._commit({"op": "delete", "ids": todo_ids})
+
+    def _commit(self, operation):
+        _apply_operation(self.records, operation)
+        self._write()
+
+    def _write(self):
+        save_todos(list(self.records.values()), self.file_path)
+        self.file_stamp = _file_stamp(self.file_path)
+
+    def find(self, completed=None, start_from=None, end_before=None):
+        """Return the ids of todos matching all given conditions, in list order."""
+        return [todo_id for todo_id, todo in self.records.items()
+                if (completed is None or todo["completed"] == completed)
+                and (start_from is None or todo.get("start_datetime", "") >= start_from)
+                and (end_before is None or todo.get("end_datetime", "") < end_before)]
+
+    def sync(self):
+        pass
+
+    def close(self):
+        self.lock.close()
+
+
+class JournalStorage(JsonStorage):
+    """Appends each change as one line to a journal next to DATA_FILE.
+
+    DATA_FILE stays a plain JSON snapshot, so it is still the import/export
+    format. The first journal line names the hash of the snapshot it applies
+    to, and every operation line carries a CRC32 of its JSON. On load, a
+    journal whose header does not match the snapshot was already folded in by
+    a compaction that crashed before replacing it, and a torn last line from a
+    crash mid-append is cut off. Appends are fsynced in batches: after
+    FSYNC_BATCH operations, when FSYNC_INTERVAL has passed, or on sync().
+
+    Other processes' appends are read from `journal_end` onward before each
+    write. A journal replaced by another process's compaction (a new inode)
+    means reloading both files and diffing them against `records`.
+    """
+
+    def __init__(self, file_path=None):
+        super().__init__(file_path)
+        self.journal_path = self.file_path + ".journal"
+        self.journal = None
+        self.journal_inode = None
+        self.journal_end = 0 # Everything before this offset is applied to `records`
+        self.journal_ops = 0
+        self.pending_ops = 0
+        self.last_sync = time.monotonic()
+
+    def load(self):
+        with self.lock:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.file_path, "rb") as f:
+                snapshot = f.read()
+        except FileNotFoundError:
+            snapshot = b""
+        todos = json.loads(snapshot) if snapshot.strip() else []
+        self.records, self.next_id, renumbered = _index_todos(todos)
+        header = json.dumps({"snapshot_hash": _snapshot_hash(snapshot)}).encode("utf-8") + b"\n"
+        valid_end = self._replay(header)
+        if valid_end is None:
+            # Missing or stale journal: start a fresh one for this snapshot
+            _write_atomic(self.journal_path, header)
+            valid_end = len(header)
+            self.journal_ops = 0
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_path, "r+b")
+        self.journal.truncate(valid_end) # Drop a torn tail so new appends start on a clean line
+        self.journal.seek(valid_end)
+        self.journal_inode = os.fstat(self.journal.fileno()).st_ino
+        self.journal_end = valid_end
+        if renumbered or self.journal_ops >= max(COMPACT_MIN_OPS, len(self.records)):
+            self.compact() # Also writes ids given to todos from an older snapshot
+
+    def _replay(self, header):
+        """Apply the journal to self.records and return the end of its last valid line."""
+        try:
+            with open(self.journal_path, "rb") as f:
+                if f.readline() != header:
+                    return None
+                self.journal_ops = 0
+                return self._apply_lines(f, f.tell())
+        except FileNotFoundError:
+            return None
+
+    def _apply_lines(self, f, valid_end, changes=None):
+        """Apply the intact lines read from f and return the end of the last one."""
+        for line in f:
+            checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+            if not line.endswith(b"\n") or checksum != b"%08x" % zlib.crc32(payload):
+                break
+            operation = json.loads(payload)
+            if operation["op"] == "add":
+                todo = operation["todo"]
+                if "id" not in todo:
+                    todo["id"] = self.next_id
+                self.next_id = max(self.next_id, todo["id"] + 1)
+            _apply_operation(self.records, operation, changes)
+            self.journal_ops += 1
+            valid_end += len(line)
+        return valid_end
+
+    def _catch_up(self):
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != self.journal_inode:
+            # Another process compacted: reload everything and diff
+            old = self.records
+            self._load()
+            _diff_records(old, self.records, self.changes)
+        elif stat.st_size != self.journal_end:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self.journal_end)
+                valid_end = self._apply_lines(f, self.journal_end, self.changes)
+            if valid_end < stat.st_size:
+                # Writes happen under the lock, so a torn line is left by a crashed process
+                self.journal.truncate(valid_end)
+            self.journal_end = valid_end
+
+    def watch_paths(self):
+        return [self.journal_path] # A compaction replaces the snapshot and then the journal
+
+    def _commit(self, operation):
+        _apply_operation(self.records, operation)
+        self._append(operation)
+
+    def _append(self, operation):
+        payload = json.dumps(operation, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        line = b"%08x %s\n" % (zlib.crc32(payload), payload)
+        self.journal.seek(self.journal_end) # Other processes may have appended since our last write
+        self.journal.write(line)
+        self.journal.flush()
+        self.journal_end += len(line)
+        self.journal_ops += 1
+        self.pending_ops += 1
+        if self.journal_ops >= max(COMPACT_MIN_OPS, len(self.records)):
+            self.compact()
+        elif self.pending_ops >= FSYNC_BATCH or time.monotonic() - self.last_sync >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self.pending_ops:
+            os.fsync(self.journal.fileno())
+            self.pending_ops = 0
+        self.last_sync = time.monotonic()
+
+    def compact(self):
+        """Fold the journal into a new snapshot and start an empty journal."""
+        with self.lock:
+            self._catch_up()
+            snapshot = json.dumps(list(self.records.values()), ensure_ascii=False, indent=4).encode("utf-8")
+            _write_atomic(self.file_path, snapshot)
+            header = json.dumps({"snapshot_hash": _snapshot_hash(snapshot)}).encode("utf-8") + b"\n"
+            self.journal.close()
+            _write_atomic(self.journal_path, header)
+            self.journal = open(self.journal_path, "r+b")
+            self.journal.seek(0, os.SEEK_END)
+            self.journal_inode = os.fstat(self.journal.fileno()).st_ino
+            self.journal_end = len(header)
+            self.journal_ops = 0
+            self.pending_ops = 0
+            self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.journal is not None:
+            self.sync()
+            self.journal.close()
+            self.journal = None
+        super().close()
+
+
+class SqliteStorage:
+    """Keeps todos in an SQLite database next to DATA_FILE (todos.db).
+
+    Records stay on disk and are read by id, the table's primary key; only
+    the ids, in order, are held in memory. Reads fill a cache with the
+    following FETCH_PAGE_SIZE records, so a view painting rows in id order
+    does one query per page. The database runs in WAL mode with
+    synchronous=NORMAL, so committing each add, update or delete on its own
+    is cheap; it holds the write lock only while it runs, and other instances
+    see it at once. A new database is filled once, in one transaction, from
+    DATA_FILE and its journal, which are left in place as the JSON export.
+
+    SQLite itself serializes writers from several processes, and updates
+    only set the fields they change and bump the row's version. Every write
+    also takes the next number of a counter in `meta` and stamps it on the
+    rows it adds or updates (the `changed` column), or on a row of
+    `deleted` for the ids it deletes. Commits by other processes show up in
+    PRAGMA data_version; refresh() then reads only the rows stamped after
+    `seen`, the counter as of our last look.
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or DATA_FILE
+        self.db_path = os.path.splitext(self.file_path)[0] + ".db"
+        self.connection = None
+        self.known_ids = array("q") # Ids as of our last look at the database, ascending
+        self.cache = {}
+        self.seen = 0 # Value of the change counter as of our last look
+        self.data_version = None
+
+    def load(self):
+        self.connection = sqlite3.connect(self.db_path, isolation_level=None, timeout=LOCK_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS todos (
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                start_datetime TEXT,
+                end_datetime TEXT,
+                version INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS todos_start ON todos(start_datetime);
+            CREATE INDEX IF NOT EXISTS todos_end ON todos(end_datetime);
+            CREATE INDEX IF NOT EXISTS todos_completed ON todos(completed);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(todos)")]
+        for column in ("version INTEGER NOT NULL DEFAULT 1", "changed INTEGER NOT NULL DEFAULT 0"):
+            if column.split()[0] not in columns:
+                try:
+                    self.connection.execute("ALTER TABLE todos ADD COLUMN " + column)
+                except sqlite3.OperationalError: # Another process added it first
+                    pass
+        self.connection.executescript("""
+            CREATE INDEX IF NOT EXISTS todos_changed ON todos(changed);
+            CREATE TABLE IF NOT EXISTS deleted (id INTEGER PRIMARY KEY, changed INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS deleted_changed ON deleted(changed);
+        """)
+        self.connection.execute("BEGIN IMMEDIATE") # Only one process migrates
+        if self.connection.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is None:
+            self._migrate()
+        # Ids come from a counter, as SQLite would reuse the id of a deleted last row
+        self.connection.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('next_id', (SELECT COALESCE(MAX(id), 0) + 1 FROM todos))")
+        self.connection.execute("INSERT OR IGNORE INTO meta VALUES ('changed', 0)")
+        self.connection.execute("COMMIT")
+        self.connection.execute("BEGIN") # The ids and the counter from one snapshot
+        self.seen = self._counter()
+        self.known_ids = array("q", (row[0] for row in self.connection.execute("SELECT id FROM todos ORDER BY id")))
+        self.connection.execute("COMMIT")
+        self.data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _migrate(self):
+        """Copy the JSON todos, with their ids, into the new database inside load()'s transaction."""
+        todos = []
+        if os.path.exists(self.file_path):
+            journal = JournalStorage(self.file_path)
+            journal.load()
+            journal.close()
+            todos = journal.iter_todos()
+        self.connection.executemany(
+            "INSERT INTO todos (id, text, completed, start_datetime, end_datetime, version) VALUES (?, ?, ?, ?, ?, ?)",
+            ((todo["id"], *self._values(todo), todo.get("version", 1)) for todo in todos))
+        self.connection.execute("INSERT INTO meta VALUES ('migrated', ?)", (self.file_path,))
+
+    @staticmethod
+    def _values(todo):
+        return (todo["text"], int(todo.get("completed", False)),
+                todo.get("start_datetime"), todo.get("end_datetime"))
+
+    @staticmethod
+    def _record(row):
+        return {"id": row[0], "text": row[1], "completed": bool(row[2]),
+                "start_datetime": row[3], "end_datetime": row[4], "version": row[5]}
+
+    def _counter(self):
+        return int(self.connection.execute("SELECT value FROM meta WHERE key = 'changed'").fetchone()[0])
+
+    def _stamp(self):
+        """Take the next number of the change counter for a write, inside its transaction."""
+        stamp = int(self.connection.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'changed' RETURNING value").fetchone()[0])
+        if stamp == self.seen + 1:
+            self.seen = stamp # Nobody else wrote since our last look, so there is nothing to catch up on
+        return stamp
+
+    def _is_known(self, todo_id):
+        index = bisect_left(self.known_ids, todo_id)
+        return index < len(self.known_ids) and self.known_ids[index] == todo_id
+
+    def _forget(self, todo_id):
+        index = bisect_left(self.known_ids, todo_id)
+        if index < len(self.known_ids) and self.known_ids[index] == todo_id:
+            del self.known_ids[index]
+
+    def refresh(self):
+        """Return the ids other processes changed since the last refresh."""
+        changes = TodoChanges()
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return changes
+        self.data_version = data_version
+        self.cache.clear()
+        # Read first: rows stamped after it are seen now and again next time, which only repeats an update
+        counter = self._counter()
+        for (todo_id,) in self.connection.execute("SELECT id FROM deleted WHERE changed > ?", (self.seen,)):
+            if self._is_known(todo_id):
+                self._forget(todo_id)
+                changes.delete(todo_id)
+        for (todo_id,) in self.connection.execute("SELECT id FROM todos WHERE changed > ?", (self.seen,)):
+            if self._is_known(todo_id):
+                changes.update(todo_id)
+            else:
+                self.known_ids.insert(bisect_left(self.known_ids, todo_id), todo_id)
+                changes.add(todo_id)
+        self.seen = counter
+        return changes
+
+    def take_changes(self):
+        return TodoChanges() # Writes only touch the rows they name, so they never see others' changes
+
+    def watch_paths(self):
+        return [self.db_path, self.db_path + "-wal"]
+
+    def ids(self):
+        # A copy of `known_ids`, so rows other processes added show up through refresh() only
+        return array("q", self.known_ids)
+
+    def get(self, todo_id):
+        todo = self.cache.get(todo_id)
+        if todo is None:
+            if len(self.cache) > 4 * FETCH_PAGE_SIZE:
+                self.cache.clear()
+            rows = self.connection.execute(
+                "SELECT id, text, completed, start_datetime, end_datetime, version FROM todos WHERE id >= ? ORDER BY id LIMIT ?",
+                (todo_id, FETCH_PAGE_SIZE))
+            for row in rows:
+                self.cache[row[0]] = self._record(row)
+            todo = self.cache.get(todo_id)
+            if todo is None:
+                raise KeyError(todo_id)
+        return todo
+
+    def iter_todos(self):
+        rows = self.connection.execute("SELECT id, text, completed, start_datetime, end_datetime, version FROM todos ORDER BY id")
+        return (self._record(row) for row in rows if self._is_known(row[0]))
+
+    def count(self):
+        return len(self.known_ids)
+
+    def find(self, completed=None, start_from=None, end_before=None):
+        conditions, values = [], []
+        if completed is not None:
+            conditions.append("completed = ?")
+            values.append(int(completed))
+        if start_from is not None:
+            conditions.append("start_datetime >= ?")
+            values.append(start_from)
+        if end_before is not None:
+            conditions.append("end_datetime < ?")
+            values.append(end_before)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        # Sorting here keeps SQLite free to pick a datetime index instead of walking the ids
+        return sorted(row[0] for row in self.connection.execute("SELECT id FROM todos" + where, values))
+
+    def add(self, todo):
+        with self._transaction():
+            todo["id"] = int(self.connection.execute(
+                "UPDATE meta SET value = value + 1 WHERE key = 'next_id' RETURNING value - 1").fetchone()[0])
+            self.connection.execute(
+                "INSERT INTO todos (id, text, completed, start_datetime, end_datetime, changed) VALUES (?, ?, ?, ?, ?, ?)",
+                (todo["id"], *self._values(todo), self._stamp()))
+        todo["version"] = 1
+        # The counter hands out ascending ids, but rows other processes added may not be known yet
+        self.known_ids.insert(bisect_left(self.known_ids, todo["id"]), todo["id"])
+        return todo["id"]
+
+    def update(self, todo_id, fields):
+        """Set fields of a todo; False if another process deleted it."""
+        fields = {key: value for key, value in fields.items() if key in TODO_FIELDS}
+        if "completed" in fields:
+            fields["completed"] = int(fields["completed"])
+        if not fields: # Nothing edited: no new version for other instances to pick up
+            row = self.connection.execute("SELECT version FROM todos WHERE id = ?", (todo_id,)).fetchone()
+        else:
+            with self._transaction():
+                row = self.connection.execute(
+                    "UPDATE todos SET " + "".join(f"{key} = ?, " for key in fields) + "version = version + 1, "
+                    "changed = ? WHERE id = ? RETURNING version", (*fields.values(), self._stamp(), todo_id)).fetchone()
+            self.cache.pop(todo_id, None)
+        if row is None:
+            self._forget(todo_id) # Its tombstone is then skipped by refresh()
+        return row is not None
+
+    def delete(self, todo_ids):
+        with self._transaction():
+            stamp = self._stamp()
+            for todo_id in todo_ids:
+                if self.connection.execute("DELETE FROM todos WHERE id = ?", (todo_id,)).rowcount:
+                    self.connection.execute("INSERT OR REPLACE INTO deleted VALUES (?, ?)", (todo_id, stamp))
+        for todo_id in todo_ids:
+            self._forget(todo_id)
+            self.cache.pop(todo_id, None)
+
+    def _transaction(self):
+        """Start a write transaction, committed on leaving the `with` block it is used in, or rolled back on an error."""
+        self.connection.execute("BEGIN IMMEDIATE") # Wait for other writers now, not at the first write
+        return self.connection
+
+    def sync(self):
+        pass # Every operation is committed when it is made
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.execute("PRAGMA optimize") # Refresh planner statistics for the indexes
+            self.connection.close()
+            self.connection = None
+
+
+STORAGE_BACKENDS = {
+    "json": JsonStorage,
+    "journal": JournalStorage,
+    "sqlite": SqliteStorage,
+}
+
+def open_storage(file_path=None, backend=None):
+    storage = STORAGE_BACKENDS[backend or STORAGE_BACKEND](file_path)
+    storage.load()
+    return storage
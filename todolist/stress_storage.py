@@ -0,0 +1,192 @@
+"""Stress one shared todos file with several writer processes.
+
+Usage: python stress_storage.py [--writers 8] [--ops 300] [--backend journal]
+
+Every writer opens the same todos file and, in random order, adds todos,
+toggles and deletes its own, edits a few shared todos that all writers
+edit, and renames todos of other writers, which their owner may have
+deleted meanwhile. A low compaction threshold makes writers compact under each other.
+Writers follow other processes' changes through take_changes()/refresh(),
+the way TodoListModel does. Before the writers, one instance deletes a
+todo that a second one then updates, with and without refreshing first:
+the update must report the todo gone, not raise or bring it back.
+Afterwards the file is loaded fresh and checked:
+- every todo a writer added is there (unless it deleted it), with an id no
+  other writer got;
+- every writer's last toggle of its own todos survived;
+- the shared todos' versions add up to the number of edits made to them,
+  so no edit was lost;
+- every writer's view of the todos, built from the changes it was handed,
+  matches the file.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import data_manager
+
+SHARED_TODOS = 5
+
+
+def writer(number, args, file_path, barrier, results):
+    data_manager.COMPACT_MIN_OPS = args.compact_every
+    storage = data_manager.open_storage(file_path, args.backend)
+    rng = random.Random(number)
+    view = {todo['id']: todo['version'] for todo in storage.iter_todos()} # id -> version, as a model would see it
+    added = []
+    own = {} # id -> completed, as last set by this writer
+    shared_edits = 0
+    gone = 0 # Updates of other writers' todos that found them deleted
+
+    def follow(changes):
+        for todo_id in changes.deleted:
+            view.pop(todo_id, None)
+        for todo_id in changes.added | changes.updated:
+            view[todo_id] = storage.get(todo_id)['version']
+
+    for step in range(args.ops):
+        action = rng.random()
+        if action < 0.3 or not own:
+            todo_id = storage.add({'text': f"writer {number} todo {step}", 'completed': False,
+                                   'start_datetime': "2025-07-04T09:00:00", 'end_datetime': "2025-07-05T18:00:00"})
+            added.append(todo_id)
+            own[todo_id] = False
+            changes = storage.take_changes()
+            changes.add(todo_id)
+        elif action < 0.5:
+            todo_id = rng.choice(list(own))
+            own[todo_id] = not own[todo_id]
+            storage.update(todo_id, {'completed': own[todo_id]})
+            changes = storage.take_changes()
+            changes.update(todo_id)
+        elif action < 0.6:
+            todo_id = rng.choice(list(own))
+            del own[todo_id]
+            storage.delete([todo_id])
+            changes = storage.take_changes()
+            changes.delete(todo_id)
+        elif action < 0.7 and len(view) > SHARED_TODOS + len(own):
+            todo_id = rng.choice([todo_id for todo_id in view if todo_id > SHARED_TODOS and todo_id not in own])
+            updated = storage.update(todo_id, {'text': f"renamed by writer {number} at step {step}"})
+            changes = storage.take_changes()
+            if updated:
+                changes.update(todo_id)
+            else:
+                gone += 1
+                changes.delete(todo_id)
+        else:
+            todo_id = rng.randint(1, SHARED_TODOS)
+            storage.update(todo_id, {'text': f"shared todo {todo_id}, edited by writer {number} at step {step}"})
+            shared_edits += 1
+            changes = storage.take_changes()
+            changes.update(todo_id)
+        follow(changes)
+        if step % 20 == 0:
+            follow(storage.refresh()) # As the file watcher would
+    storage.sync()
+    barrier.wait() # Every writer has written everything
+    follow(storage.refresh())
+    actual = {todo['id']: todo['version'] for todo in storage.iter_todos()}
+    storage.close()
+    results.put((number, added, own, shared_edits, view == actual, gone))
+
+
+def update_after_delete(file_path, backend):
+    """Failures of an update by one instance of a todo another instance deleted."""
+    failures = []
+    first = data_manager.open_storage(file_path, backend)
+    second = data_manager.open_storage(file_path, backend)
+    for refreshed in (False, True):
+        todo_id = first.add({'text': "deleted by another instance", 'completed': False,
+                             'start_datetime': "2025-07-04T09:00:00", 'end_datetime': "2025-07-05T18:00:00"})
+        first.sync()
+        second.refresh()
+        first.delete([todo_id])
+        first.sync()
+        if refreshed:
+            second.refresh()
+        label = "after refresh" if refreshed else "before refresh"
+        try:
+            if second.update(todo_id, {'text': "updated after delete"}):
+                failures.append(f"update after delete {label} reported the todo as updated")
+        except KeyError:
+            failures.append(f"update after delete {label} raised KeyError")
+        second.sync()
+        first.refresh()
+        if any(todo['id'] == todo_id for todo in first.iter_todos()):
+            failures.append(f"update after delete {label} brought the todo back")
+    first.close()
+    second.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8, help='number of writer processes')
+    parser.add_argument('--ops', type=int, default=300, help='operations per writer')
+    parser.add_argument('--backend', default='journal', help='storage backend: json, journal or sqlite')
+    parser.add_argument('--compact-every', type=int, default=50, help='COMPACT_MIN_OPS in the writers')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='todo_stress_')
+    file_path = os.path.join(work_dir, 'todos.json')
+    try:
+        data_manager.save_todos([{'id': i, 'text': f"shared todo {i}", 'completed': False, 'version': 1,
+                                  'start_datetime': "2025-07-04T09:00:00", 'end_datetime': "2025-07-05T18:00:00"}
+                                 for i in range(1, SHARED_TODOS + 1)], file_path)
+        data_manager.open_storage(file_path, args.backend).close() # Migrate before the writers start
+        failures = update_after_delete(file_path, args.backend)
+
+        barrier = multiprocessing.Barrier(args.writers)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer, args=(number, args, file_path, barrier, results))
+                     for number in range(args.writers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        storage = data_manager.open_storage(file_path, args.backend)
+        final = {todo['id']: todo for todo in storage.iter_todos()}
+        storage.close()
+
+        all_added = [todo_id for report in reports for todo_id in report[1]]
+        if len(set(all_added)) != len(all_added):
+            failures.append(f"{len(all_added) - len(set(all_added))} ids were handed to more than one add")
+        for number, added, own, shared_edits, view_matches, _ in sorted(reports):
+            missing = [todo_id for todo_id in own if todo_id not in final]
+            kept = [todo_id for todo_id in added if todo_id not in own and todo_id in final]
+            toggles = [todo_id for todo_id, completed in own.items()
+                       if todo_id in final and final[todo_id]['completed'] != completed]
+            if missing or kept or toggles:
+                failures.append(f"writer {number}: {len(missing)} adds lost, {len(kept)} deletes lost, "
+                                f"{len(toggles)} toggles lost")
+            if not view_matches:
+                failures.append(f"writer {number}: view built from changes differs from the file")
+        shared_edits = sum(report[3] for report in reports)
+        recorded = sum(final[todo_id]['version'] - 1 for todo_id in range(1, SHARED_TODOS + 1))
+        if recorded != shared_edits:
+            failures.append(f"shared todos: {shared_edits} edits made, {recorded} recorded")
+
+        total_ops = args.writers * args.ops
+        print(f"{args.writers} writers x {args.ops} ops ({args.backend}): {elapsed:.2f} s, "
+              f"{total_ops / elapsed:.0f} ops/s, {len(final)} todos, {shared_edits} shared edits, "
+              f"{sum(report[5] for report in reports)} updates of deleted todos")
+        for failure in failures:
+            print(f"  FAILED: {failure}")
+        print("no update lost" if not failures else f"{len(failures)} checks failed")
+        return 1 if failures else 0
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,39 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QListWidget, QListWidgetItem, QDateTimeEdit
-from PyQt5.QtCore import Qt, QDateTime
-from data_manager import load_todos, save_todos
+import os
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QListView, QDateTimeEdit, QDateEdit, QComboBox, QCheckBox
+from PyQt5.QtCore import Qt, QDate, QDateTime, QTimer, QFileSystemWatcher
+from data_manager import open_storage, FSYNC_INTERVAL
+from todo_model import TodoListModel, TodoItemDelegate
+from todo_index import TodoQuery
+
+RELOAD_DELAY_MS = 100 # Collects the file events of one write by another instance into one reload
 
 class TodoApp(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Todo List App")
-        self.setGeometry(100, 100, 550, 400)
+        self.setGeometry(100, 100, 700, 500)
 
-        self.todos = [] # Internal list to store todo data
-        self.selected_todo_index = -1 # -1 means no item is selected for editing
+        self.selected_todo_id = None # Stable id of the todo being edited, None when adding
+        self.selected_todo = None # The todo as it was when clicked, to send only the edited fields
+        self.storage = None
+        self.model = None # TodoListModel over self.storage
         self.init_ui()
         self.load_initial_todos()
 
+        # Journaled changes are fsynced in batches; this bounds how long one can stay unsynced
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.storage.sync)
+        self.sync_timer.start(int(FSYNC_INTERVAL * 1000))
+
+        # Other instances may write the same todos file; show their changes as they land
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(RELOAD_DELAY_MS)
+        self.reload_timer.timeout.connect(self.reload_changes)
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.watch_storage_files()
+
     def init_ui(self):
         main_layout = QVBoxLayout()
 
@@ -45,51 +66,98 @@ class TodoApp(QWidget):
         self.add_update_button.clicked.connect(self.add_or_update_todo)
         input_layout.addWidget(self.add_update_button)
 
+        # Query Bar
+        query_layout = QVBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search todos...")
+        self.search_input.textChanged.connect(self.apply_query)
+        query_layout.addWidget(self.search_input)
+
+        filter_layout = QHBoxLayout()
+        self.date_field_combo = QComboBox()
+        self.date_field_combo.addItem("Any date", None)
+        self.date_field_combo.addItem("Start between", 'start')
+        self.date_field_combo.addItem("End between", 'end')
+        self.date_field_combo.currentIndexChanged.connect(self.apply_query)
+        self.date_from_input = QDateEdit(QDate.currentDate())
+        self.date_to_input = QDateEdit(QDate.currentDate().addDays(7))
+        for date_input in (self.date_from_input, self.date_to_input):
+            date_input.setCalendarPopup(True)
+            date_input.setDisplayFormat("yyyy-MM-dd")
+            date_input.setEnabled(False)
+            date_input.dateChanged.connect(self.apply_query)
+        self.hide_completed_checkbox = QCheckBox("Hide completed")
+        self.hide_completed_checkbox.toggled.connect(self.apply_query)
+        self.overdue_checkbox = QCheckBox("Overdue")
+        self.overdue_checkbox.toggled.connect(self.apply_query)
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItem("Sort: Added", 'id')
+        self.sort_combo.addItem("Sort: Start", 'start_datetime')
+        self.sort_combo.addItem("Sort: End", 'end_datetime')
+        self.sort_combo.addItem("Sort: Text", 'text')
+        self.sort_combo.currentIndexChanged.connect(self.apply_query)
+        for widget in (self.date_field_combo, self.date_from_input, self.date_to_input,
+                       self.hide_completed_checkbox, self.overdue_checkbox, self.sort_combo):
+            filter_layout.addWidget(widget)
+        query_layout.addLayout(filter_layout)
+
         # Todo List
-        self.todo_list_widget = QListWidget()
-        self.todo_list_widget.itemChanged.connect(self.toggle_todo_state)
-        self.todo_list_widget.itemClicked.connect(self.on_todo_item_clicked)
+        self.todo_list_view = QListView()
+        self.todo_list_view.setUniformItemSizes(True) # Lets the view lay out 100k rows without measuring each
+        self.todo_list_view.setLayoutMode(QListView.Batched) # Relayouts after inserts and edits run in slices
+        self.todo_list_view.setItemDelegate(TodoItemDelegate(self.todo_list_view))
+        self.todo_list_view.clicked.connect(self.on_todo_item_clicked)
 
         # Delete Button
         self.delete_button = QPushButton("Delete Selected")
         self.delete_button.clicked.connect(self.delete_todo)
 
         main_layout.addLayout(input_layout)
-        main_layout.addWidget(self.todo_list_widget)
+        main_layout.addLayout(query_layout)
+        main_layout.addWidget(self.todo_list_view)
         main_layout.addWidget(self.delete_button)
 
         self.setLayout(main_layout)
 
     def load_initial_todos(self):
-        self.todos = load_todos()
-        for todo in self.todos:
-            self._add_todo_item_to_list_widget(todo)
-
-    def _add_todo_item_to_list_widget(self, todo_data):
-        start_dt_str = todo_data.get('start_datetime')
-        end_dt_str = todo_data.get('end_datetime')
-
-        formatted_start_datetime = 'N/A'
-        if start_dt_str:
-            start_dt = QDateTime.fromString(start_dt_str, Qt.ISODate)
-            if start_dt.isValid():
-                formatted_start_datetime = start_dt.toString("yyyy-MM-dd HH:mm")
-
-        formatted_end_datetime = 'N/A'
-        if end_dt_str:
-            end_dt = QDateTime.fromString(end_dt_str, Qt.ISODate)
-            if end_dt.isValid():
-                formatted_end_datetime = end_dt.toString("yyyy-MM-dd HH:mm")
-
-        item_text = f"{todo_data['text']} (시작: {formatted_start_datetime}, 끝: {formatted_end_datetime})"
-        item = QListWidgetItem(item_text)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked if todo_data['completed'] else Qt.Unchecked)
-        if todo_data['completed']:
-            font = item.font()
-            font.setStrikeOut(True)
-            item.setFont(font)
-        self.todo_list_widget.addItem(item)
+        self.storage = open_storage()
+        self.model = TodoListModel(self.storage, self)
+        self.todo_list_view.setModel(self.model)
+
+    def watch_storage_files(self):
+        # A compaction replaces the files, which drops them from the watcher
+        watched = self.file_watcher.files()
+        missing = [path for path in self.storage.watch_paths() if path not in watched and os.path.exists(path)]
+        if missing:
+            self.file_watcher.addPaths(missing)
+
+    def on_file_changed(self, path):
+        self.reload_timer.start()
+
+    def reload_changes(self):
+        changes = self.storage.refresh()
+        if self.selected_todo_id in changes.deleted:
+            # Another instance deleted the todo being edited; what was typed can still be added as a new one
+            self.selected_todo_id = None
+            self.selected_todo = None
+            self.add_update_button.setText("Add Todo")
+        self.model.apply_changes(changes)
+        self.watch_storage_files()
+
+    def apply_query(self):
+        date_field = self.date_field_combo.currentData()
+        self.date_from_input.setEnabled(date_field is not None)
+        self.date_to_input.setEnabled(date_field is not None)
+        date_range = {}
+        if date_field is not None:
+            # The "to" date is inclusive in the UI and exclusive in the query
+            date_range[date_field + '_from'] = self.date_from_input.date().toString(Qt.ISODate)
+            date_range[date_field + '_to'] = self.date_to_input.date().addDays(1).toString(Qt.ISODate)
+        self.model.apply_query(TodoQuery(self.search_input.text(),
+                                         hide_completed=self.hide_completed_checkbox.isChecked(),
+                                         overdue=self.overdue_checkbox.isChecked(),
+                                         sort=self.sort_combo.currentData(),
+                                         **date_range))
 
     def add_or_update_todo(self):
         todo_text = self.todo_input.text().strip()
@@ -102,21 +170,18 @@ class TodoApp(QWidget):
         start_dt_str = start_dt_obj.toString(Qt.ISODate)
         end_dt_str = end_dt_obj.toString(Qt.ISODate)
 
-        if self.selected_todo_index != -1:
-            # Update existing todo
-            self.todos[self.selected_todo_index]['text'] = todo_text
-            self.todos[self.selected_todo_index]['start_datetime'] = start_dt_str
-            self.todos[self.selected_todo_index]['end_datetime'] = end_dt_str
-            
-            # Update the QListWidgetItem text
-            item = self.todo_list_widget.item(self.selected_todo_index)
-            formatted_start_datetime = start_dt_obj.toString("yyyy-MM-dd HH:mm")
-            formatted_end_datetime = end_dt_obj.toString("yyyy-MM-dd HH:mm")
-            item_text = f"{todo_text} (시작: {formatted_start_datetime}, 끝: {formatted_end_datetime})"
-            item.setText(item_text)
-
-            self.selected_todo_index = -1 # Deselect after update
-            self.add_update_button.setText("Add Todo")
+        if self.selected_todo_id is not None:
+            # Update existing todo; the view repaints the row from the model.
+            # Fields left as they were are not sent, so edits another instance
+            # made to them in the meantime are kept.
+            fields = {
+                'text': todo_text,
+                'start_datetime': start_dt_str,
+                'end_datetime': end_dt_str
+            }
+            # If another instance deleted it meanwhile, the edit is dropped with its row
+            self.model.update_todo(self.selected_todo_id, {key: value for key, value in fields.items()
+                                                           if value != self.selected_todo.get(key)})
         else:
             # Add new todo
             new_todo = {
@@ -125,54 +190,31 @@ class TodoApp(QWidget):
                 'start_datetime': start_dt_str,
                 'end_datetime': end_dt_str
             }
-            self.todos.append(new_todo)
-            self._add_todo_item_to_list_widget(new_todo)
+            self.model.add_todo(new_todo)
+
+        self.clear_selection() # Deselect after update, and empty the inputs
 
+    def clear_selection(self):
+        """Go back to adding, with empty inputs."""
+        self.selected_todo_id = None
+        self.selected_todo = None
+        self.add_update_button.setText("Add Todo")
         self.todo_input.clear()
         self.start_datetime_input.setDateTime(QDateTime.currentDateTime())
         self.end_datetime_input.setDateTime(QDateTime.currentDateTime().addDays(1))
-        save_todos(self.todos)
 
     def delete_todo(self):
-        selected_rows = sorted([item.row() for item in self.todo_list_widget.selectedItems()], reverse=True)
-        if not selected_rows:
+        selected_ids = [self.model.todo_id(index.row()) for index in self.todo_list_view.selectionModel().selectedRows()]
+        if not selected_ids:
             return
-        
-        for row in selected_rows:
-            self.todo_list_widget.takeItem(row)
-            del self.todos[row]
-            
-        save_todos(self.todos)
-        self.selected_todo_index = -1 # Deselect if deleted
-        self.add_update_button.setText("Add Todo")
-        self.todo_input.clear()
-        self.start_datetime_input.setDateTime(QDateTime.currentDateTime())
-        self.end_datetime_input.setDateTime(QDateTime.currentDateTime().addDays(1))
 
-    def toggle_todo_state(self, item):
-        # Disconnect to prevent recursive calls during text update
-        self.todo_list_widget.itemChanged.disconnect(self.toggle_todo_state)
-
-        row = self.todo_list_widget.row(item)
-        if 0 <= row < len(self.todos):
-            is_completed = item.checkState() == Qt.Checked
-            self.todos[row]['completed'] = is_completed
-            
-            font = item.font()
-            font.setStrikeOut(is_completed)
-            item.setFont(font)
-            
-            # Update the displayed text to reflect completion status if needed
-            # (already handled by font strike-out, but good to keep in mind for more complex displays)
-
-            save_todos(self.todos)
-        
-        # Reconnect after changes
-        self.todo_list_widget.itemChanged.connect(self.toggle_todo_state)
-
-    def on_todo_item_clicked(self, item):
-        self.selected_todo_index = self.todo_list_widget.row(item)
-        selected_todo_data = self.todos[self.selected_todo_index]
+        self.model.delete_todos(selected_ids)
+        self.clear_selection() # Deselect if deleted
+
+    def on_todo_item_clicked(self, index):
+        self.selected_todo_id = self.model.todo_id(index.row())
+        selected_todo_data = self.model.todo(index.row())
+        self.selected_todo = dict(selected_todo_data)
 
         self.todo_input.setText(selected_todo_data['text'])
         self.start_datetime_input.setDateTime(QDateTime.fromString(selected_todo_data.get('start_datetime', QDateTime.currentDateTime().toString(Qt.ISODate)), Qt.ISODate))
@@ -180,5 +222,5 @@ class TodoApp(QWidget):
         self.add_update_button.setText("Update Todo")
 
     def closeEvent(self, event):
-        save_todos(self.todos)
+        self.storage.close()
         event.accept()
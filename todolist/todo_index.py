@@ -0,0 +1,236 @@
+import re
+from bisect import bisect_left, insort
+from datetime import datetime
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+
+def now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class TodoQuery:
+    """What the query bar asks for. Dates are ISO strings; `*_to` bounds are exclusive."""
+
+    def __init__(self, text="", start_from=None, start_to=None, end_from=None, end_to=None,
+                 hide_completed=False, overdue=False, sort="id"):
+        self.terms = sorted(tokenize(text))
+        self.start_from = start_from
+        self.start_to = start_to
+        self.end_from = end_from
+        self.end_to = end_to
+        self.hide_completed = hide_completed
+        self.overdue = overdue
+        self.sort = sort
+        self.now = now_iso() # Overdue is judged against the time the query was made
+
+    def is_empty(self):
+        return not (self.terms or self.start_from or self.start_to or self.end_from or self.end_to
+                    or self.hide_completed or self.overdue)
+
+    def matches(self, todo):
+        """Check one todo the same way TodoIndex.search does, for incremental updates."""
+        if self.terms:
+            tokens = tokenize(todo["text"])
+            if not all(any(token.startswith(term) for token in tokens) for term in self.terms):
+                return False
+        start = todo.get("start_datetime") or ""
+        end = todo.get("end_datetime") or ""
+        if (self.start_from and start < self.start_from) or (self.start_to and start >= self.start_to):
+            return False
+        if (self.end_from and end < self.end_from) or (self.end_to and end >= self.end_to):
+            return False
+        if (self.hide_completed or self.overdue) and todo["completed"]:
+            return False
+        return not self.overdue or end < self.now
+
+
+class SortedIndex:
+    """(key, id) pairs kept sorted, for range lookups and ordered output."""
+
+    def __init__(self, pairs):
+        self.entries = sorted(pairs)
+
+    def add(self, key, todo_id):
+        insort(self.entries, (key, todo_id))
+
+    def remove(self, key, todo_id):
+        del self.entries[bisect_left(self.entries, (key, todo_id))]
+
+    def range_bounds(self, low=None, high=None):
+        """Positions of the entries with low <= key < high."""
+        start = bisect_left(self.entries, (low,)) if low else 0
+        end = bisect_left(self.entries, (high,)) if high else len(self.entries)
+        return start, end
+
+    def range_ids(self, start, end):
+        return [entry[1] for entry in self.entries[start:end]]
+
+    def ordered_ids(self):
+        return [entry[1] for entry in self.entries]
+
+
+class TodoIndex:
+    """Inverted token index and sorted datetime/text indexes over all todos.
+
+    Built once from the storage, then kept current through add/update/remove
+    as the model changes todos. search() starts from the smallest candidate
+    set the query allows (token postings, then a datetime range, then all
+    todos) and checks the remaining conditions per id.
+    """
+
+    def __init__(self, storage):
+        self.postings = {} # token -> set of ids
+        self.vocabulary = [] # sorted tokens, for prefix lookups
+        self.fields = {} # id -> (text, start, end), in id order unless `unordered`
+        self.completed = set()
+        self.last_id = 0 # Largest id added; a smaller one added later leaves `fields` unordered
+        self.unordered = False
+        for todo in storage.iter_todos():
+            self._note_id(todo["id"])
+            self._set_fields(todo)
+            for token in tokenize(todo["text"]):
+                self.postings.setdefault(token, set()).add(todo["id"])
+        self.vocabulary = sorted(self.postings)
+        self.sorted = {
+            "start_datetime": SortedIndex((fields[1], todo_id) for todo_id, fields in self.fields.items()),
+            "end_datetime": SortedIndex((fields[2], todo_id) for todo_id, fields in self.fields.items()),
+            "text": SortedIndex((fields[0].lower(), todo_id) for todo_id, fields in self.fields.items()),
+        }
+
+    def _note_id(self, todo_id):
+        if todo_id < self.last_id:
+            self.unordered = True
+        else:
+            self.last_id = todo_id
+
+    def _set_fields(self, todo):
+        self.fields[todo["id"]] = (todo["text"], todo.get("start_datetime") or "", todo.get("end_datetime") or "")
+        if todo["completed"]:
+            self.completed.add(todo["id"])
+        else:
+            self.completed.discard(todo["id"])
+
+    def _add_tokens(self, todo_id, tokens):
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                insort(self.vocabulary, token)
+            ids.add(todo_id)
+
+    def _remove_tokens(self, todo_id, tokens):
+        for token in tokens:
+            ids = self.postings[token]
+            ids.discard(todo_id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def _add_sorted(self, todo_id, fields):
+        self.sorted["text"].add(fields[0].lower(), todo_id)
+        self.sorted["start_datetime"].add(fields[1], todo_id)
+        self.sorted["end_datetime"].add(fields[2], todo_id)
+
+    def _remove_sorted(self, todo_id, fields):
+        self.sorted["text"].remove(fields[0].lower(), todo_id)
+        self.sorted["start_datetime"].remove(fields[1], todo_id)
+        self.sorted["end_datetime"].remove(fields[2], todo_id)
+
+    def add(self, todo):
+        # Another instance sharing the file can take a smaller id that only arrives now
+        self._note_id(todo["id"])
+        self._set_fields(todo)
+        fields = self.fields[todo["id"]]
+        self._add_tokens(todo["id"], tokenize(fields[0]))
+        self._add_sorted(todo["id"], fields)
+
+    def update(self, todo):
+        old = self.fields[todo["id"]]
+        self._set_fields(todo)
+        new = self.fields[todo["id"]]
+        if old == new:
+            return # Only the completed flag changed
+        old_tokens, new_tokens = tokenize(old[0]), tokenize(new[0])
+        self._remove_tokens(todo["id"], old_tokens - new_tokens)
+        self._add_tokens(todo["id"], new_tokens - old_tokens)
+        self._remove_sorted(todo["id"], old)
+        self._add_sorted(todo["id"], new)
+
+    def remove(self, todo_id):
+        fields = self.fields.pop(todo_id)
+        self.completed.discard(todo_id)
+        self._remove_tokens(todo_id, tokenize(fields[0]))
+        self._remove_sorted(todo_id, fields)
+
+    def term_ids(self, term):
+        """Ids of todos with a token starting with `term`. The result must not be modified."""
+        vocabulary = self.vocabulary
+        first = position = bisect_left(vocabulary, term)
+        while position < len(vocabulary) and vocabulary[position].startswith(term):
+            position += 1
+        if position - first == 1:
+            return self.postings[vocabulary[first]] # Shared, not copied
+        return set().union(*(self.postings[token] for token in vocabulary[first:position]))
+
+    def search(self, query):
+        """Ids matching the query, ordered by query.sort."""
+        fields = self.fields
+        end_to = query.end_to
+        if query.overdue:
+            end_to = min(end_to, query.now) if end_to else query.now
+        ranges = []
+        for name, low, high, column in (("start_datetime", query.start_from, query.start_to, 1),
+                                        ("end_datetime", query.end_from, end_to, 2)):
+            if low or high:
+                start, end = self.sorted[name].range_bounds(low, high)
+                if end - start < len(fields): # A range holding every todo filters nothing
+                    ranges.append((end - start, name, start, end, column, low, high))
+
+        candidates = None
+        for ids in sorted((self.term_ids(term) for term in query.terms), key=len):
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        for size, name, start, end, column, low, high in sorted(ranges):
+            if candidates is None or size <= len(candidates):
+                ids = set(self.sorted[name].range_ids(start, end))
+                candidates = ids if candidates is None else candidates & ids
+            else:
+                # Fewer candidates than todos in the range: check their dates directly
+                candidates = {todo_id for todo_id in candidates
+                              if (not low or fields[todo_id][column] >= low)
+                              and (not high or fields[todo_id][column] < high)}
+        hide_completed = query.hide_completed or query.overdue
+
+        if candidates is None:
+            # Nothing narrower than all todos: walk them already in the requested order
+            if query.sort == "id" and self.unordered:
+                self.fields = fields = dict(sorted(fields.items())) # Once, until an id arrives late again
+                self.unordered = False
+            ordered = fields if query.sort == "id" else self.sorted[query.sort].ordered_ids()
+            if not hide_completed:
+                return list(ordered)
+            completed = self.completed
+            return [todo_id for todo_id in ordered if todo_id not in completed]
+        if hide_completed:
+            candidates = candidates - self.completed
+        if query.sort == "id":
+            return sorted(candidates)
+        if len(candidates) * 16 > len(fields):
+            # Filtering the ordered ids is cheaper than sorting this many matches by key
+            return [todo_id for todo_id in self.sorted[query.sort].ordered_ids() if todo_id in candidates]
+        return sorted(candidates, key=lambda todo_id: self.sort_key(todo_id, query.sort))
+
+    def sort_key(self, todo_id, sort):
+        """Key that orders ids the same way as the sorted index for `sort`."""
+        if sort == "id":
+            return (todo_id,)
+        text, start, end = self.fields[todo_id]
+        if sort == "text":
+            return (text.lower(), todo_id)
+        return (start if sort == "start_datetime" else end, todo_id)
@@ -0,0 +1,256 @@
+from bisect import bisect_left
+from functools import lru_cache
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QDateTime
+from PyQt5.QtWidgets import QStyledItemDelegate
+from todo_index import TodoIndex, TodoQuery
+
+FETCH_BATCH = 1000 # Rows added to the model each time the view scrolls to its end
+
+
+@lru_cache(maxsize=4096)
+def format_datetime(iso_string):
+    """ISO datetime as shown in the list; many todos share the same times."""
+    if iso_string:
+        date_time = QDateTime.fromString(iso_string, Qt.ISODate)
+        if date_time.isValid():
+            return date_time.toString("yyyy-MM-dd HH:mm")
+    return 'N/A'
+
+
+class TodoListModel(QAbstractListModel):
+    """List model over a data_manager storage.
+
+    The model shows the todos whose ids are in `row_ids`, in that order, so
+    the view can be sorted or filtered by replacing the ids without touching
+    the storage. While the rows are in id order (the storage order) a row is
+    found by bisection; otherwise `id_rows` maps ids to rows and is rebuilt
+    lazily from the first row that moved.
+
+    apply_query() fills `row_ids` from a TodoIndex, built on first use and
+    then kept current by every add, update and delete. Changed todos enter,
+    leave or move within the filtered view without re-running the query.
+
+    Rows are exposed FETCH_BATCH at a time through canFetchMore/fetchMore, and
+    nothing is formatted until the view asks for a row's data while painting.
+    Every change goes through the storage first and is then announced with
+    the matching model signal, so the view never rebuilds its items.
+    Changes other processes made to a shared file arrive through
+    apply_changes() and take the same path as the model's own.
+    """
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.row_ids = storage.ids()
+        self.in_id_order = True
+        self.id_rows = {}
+        self.mapped_rows = 0 # id_rows is correct for rows below this
+        self.loaded_rows = 0
+        self.todo_index = None
+        self.query = None # TodoQuery the rows were filtered by, None when showing all
+
+    def todo(self, row):
+        return self.storage.get(self.row_ids[row])
+
+    def todo_id(self, row):
+        return self.row_ids[row]
+
+    def row_of(self, todo_id):
+        """Row of a todo in the model, or -1 if it is not shown."""
+        if self.in_id_order:
+            row = bisect_left(self.row_ids, todo_id)
+            return row if row < len(self.row_ids) and self.row_ids[row] == todo_id else -1
+        # id_rows keeps stale entries for ids that left the view, so check the row
+        row = self.id_rows.get(todo_id, -1)
+        if 0 <= row < self.mapped_rows and self.row_ids[row] == todo_id:
+            return row
+        for row in range(self.mapped_rows, len(self.row_ids)):
+            self.id_rows[self.row_ids[row]] = row
+        self.mapped_rows = len(self.row_ids)
+        row = self.id_rows.get(todo_id, -1)
+        return row if 0 <= row < len(self.row_ids) and self.row_ids[row] == todo_id else -1
+
+    def set_row_ids(self, row_ids, in_id_order=False):
+        """Show these todos in this order, e.g. after sorting or filtering."""
+        self.beginResetModel()
+        self.row_ids = row_ids
+        self.in_id_order = in_id_order
+        self.id_rows = {}
+        self.mapped_rows = 0
+        self.loaded_rows = 0
+        self.endResetModel()
+
+    def apply_query(self, query):
+        if query.is_empty() and query.sort == "id":
+            self.query = None
+            self.set_row_ids(self.storage.ids(), in_id_order=True)
+            return
+        if self.todo_index is None:
+            self.todo_index = TodoIndex(self.storage)
+        self.query = query
+        self.set_row_ids(self.todo_index.search(query), in_id_order=query.sort == "id")
+
+    def _position_for(self, todo_id):
+        """Row where a todo belongs in the current order."""
+        if self.in_id_order:
+            return bisect_left(self.row_ids, todo_id)
+        sort_key = self.todo_index.sort_key
+        key = sort_key(todo_id, self.query.sort)
+        low, high = 0, len(self.row_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if sort_key(self.row_ids[middle], self.query.sort) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _insert_row(self, row, todo_id):
+        visible = row <= self.loaded_rows
+        if visible:
+            self.beginInsertRows(QModelIndex(), row, row)
+        self.row_ids.insert(row, todo_id)
+        self.mapped_rows = min(self.mapped_rows, row)
+        if visible:
+            self.loaded_rows += 1
+            self.endInsertRows()
+
+    def _remove_row(self, row):
+        visible = row < self.loaded_rows
+        if visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+        del self.row_ids[row]
+        self.mapped_rows = min(self.mapped_rows, row)
+        if visible:
+            self.loaded_rows -= 1
+            self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded_rows
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded_rows < len(self.row_ids)
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self.row_ids) - self.loaded_rows)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded_rows, self.loaded_rows + count - 1)
+        self.loaded_rows += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (Qt.DisplayRole, Qt.CheckStateRole):
+            return None
+        try:
+            todo = self.todo(index.row())
+        except KeyError:
+            return None # Deleted by another process; the row goes at the next refresh
+        if role == Qt.DisplayRole:
+            return (f"{todo['text']} (시작: {format_datetime(todo.get('start_datetime'))}, "
+                    f"끝: {format_datetime(todo.get('end_datetime'))})")
+        return Qt.Checked if todo['completed'] else Qt.Unchecked
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        self.update_todo(self.row_ids[index.row()], {'completed': value == Qt.Checked})
+        return True
+
+    def add_todo(self, todo):
+        todo_id = self.storage.add(todo)
+        changes = self.storage.take_changes() # What other processes wrote before our add
+        changes.add(todo_id)
+        self.apply_changes(changes)
+        return todo_id
+
+    def update_todo(self, todo_id, fields):
+        """Update a todo and its row; False if another process deleted it, and the row goes instead."""
+        updated = self.storage.update(todo_id, fields)
+        changes = self.storage.take_changes()
+        if updated:
+            changes.update(todo_id)
+        else:
+            changes.delete(todo_id)
+        self.apply_changes(changes)
+        return updated
+
+    def delete_todos(self, todo_ids):
+        self.storage.delete(todo_ids)
+        changes = self.storage.take_changes()
+        for todo_id in todo_ids:
+            changes.delete(todo_id)
+        self.apply_changes(changes)
+
+    def apply_changes(self, changes):
+        """Show added, updated and deleted todos, touching only their rows."""
+        if len(changes) > FETCH_BATCH:
+            # Cheaper to rebuild than to move this many rows one by one
+            self.todo_index = None
+            self.apply_query(self.query or TodoQuery())
+            return
+        self._remove_todos(changes.deleted)
+        for todo_id in sorted(changes.added):
+            todo = self.storage.get(todo_id)
+            if self.todo_index is not None:
+                self.todo_index.add(todo)
+            if self.query is None or self.query.matches(todo):
+                self._insert_row(self._position_for(todo_id), todo_id)
+        for todo_id in changes.updated:
+            self._refresh_row(todo_id)
+
+    def _remove_todos(self, todo_ids):
+        # From the last row up, so rows still to be removed keep their place
+        for row in sorted((self.row_of(todo_id) for todo_id in todo_ids), reverse=True):
+            if row >= 0:
+                self._remove_row(row)
+        if self.todo_index is not None:
+            for todo_id in todo_ids:
+                if todo_id in self.todo_index.fields:
+                    self.todo_index.remove(todo_id)
+
+    def _refresh_row(self, todo_id):
+        query = self.query # Set only once the index exists
+        old_key = self.todo_index.sort_key(todo_id, query.sort) if query is not None else None
+        todo = self.storage.get(todo_id)
+        if self.todo_index is not None:
+            self.todo_index.update(todo)
+        row = self.row_of(todo_id)
+        if query is not None:
+            visible = query.matches(todo)
+            if row >= 0 and (not visible or self.todo_index.sort_key(todo_id, query.sort) != old_key):
+                # Leaves the filtered view, or moves to keep it sorted
+                self._remove_row(row)
+                row = -1
+            if row < 0 and visible:
+                self._insert_row(self._position_for(todo_id), todo_id)
+                return
+        if 0 <= row < self.loaded_rows:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class TodoItemDelegate(QStyledItemDelegate):
+    """Draws completed todos struck out and gives every row the same size."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.row_size = None
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if option.checkState == Qt.Checked:
+            option.font.setStrikeOut(True)
+
+    def sizeHint(self, option, index):
+        # Measured once; with uniform rows the view never asks for more than one
+        if self.row_size is None:
+            self.row_size = super().sizeHint(option, index)
+        return self.row_size
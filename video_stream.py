@@ -0,0 +1,51 @@
+"""Frames from a video file or a camera, fed to a DetectionWorker."""
+import time
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+CAMERA_INDEX = 0 # The default local camera
+
+
+class VideoReader(QThread):
+    """Decodes frames with cv2.VideoCapture and requests detection of each.
+
+    source is a file path or a camera index. With realtime, a file is read
+    at its own frame rate, as a camera delivers it, and frames the worker
+    has no time for are dropped by its one-frame queue, so what is shown
+    is never more than a frame behind. Without it every frame is detected,
+    as fast as the model allows.
+    """
+
+    ended_signal = pyqtSignal(int) # frames read
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, source, worker, realtime=True):
+        super().__init__()
+        self.source = source
+        self.worker = worker
+        self.realtime = realtime
+        self.frames_read = 0
+
+    def run(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            self.error_signal.emit(f"cannot open {self.source}")
+            return
+        fps = capture.get(cv2.CAP_PROP_FPS) if isinstance(self.source, str) else 0 # A camera paces itself
+        interval = 1 / fps if self.realtime and fps > 0 else 0
+        next_frame = time.perf_counter()
+        try:
+            while not self.isInterruptionRequested():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                self.frames_read += 1
+                self.worker.request(frame, block=not self.realtime)
+                if interval:
+                    next_frame = max(next_frame + interval, time.perf_counter() - interval) # No catching up in bursts
+                    time.sleep(max(0, next_frame - time.perf_counter()))
+        finally:
+            capture.release()
+        self.ended_signal.emit(self.frames_read)